@@ -0,0 +1,93 @@
+import functools
+import os
+import pygame
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+WIDTH, HEIGHT = 800, 600
+HANGMAN_STAGES = 7
+# Sounds larger than this are streamed from disk instead of being decoded into memory
+STREAM_THRESHOLD = 256 * 1024
+TEXT_CACHE_SIZE = 512
+
+class LazyFont:
+    # Creates the pygame font on first render, so importing a screen module does not
+    # need pygame.font to be initialized yet
+    def __init__(self, size):
+        self.size = size
+        self.font = None
+
+    def render(self, text, antialias, color):
+        if self.font is None:
+            self.font = pygame.font.Font(None, self.size)
+        return self.font.render(text, antialias, color)
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(font, text, color):
+    # Rendered labels are reused across frames and screens; fonts are keyed by identity,
+    # which is stable because Assets.font hands out one object per size
+    return font.render(text, True, color)
+
+class Assets:
+    # Loads every image, sound and font at most once, on first use. Nothing here touches
+    # pygame until a screen actually needs it.
+    def __init__(self, directory=ASSET_DIR):
+        self.directory = directory
+        self.images = {}
+        self.sounds = {}
+        self.fonts = {}
+        self.mixer_ready = None
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def image(self, name):
+        image = self.images.get(name)
+        if image is None:
+            image = pygame.image.load(self.path(name))
+            # Converting to the display's pixel format once makes every later blit a plain copy
+            if pygame.display.get_surface() is not None:
+                image = image.convert_alpha()
+            self.images[name] = image
+        return image
+
+    def hangman(self, stage):
+        return self.image(f"hangman{min(stage, HANGMAN_STAGES - 1)}.png")
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = LazyFont(size)
+        return font
+
+    def init_mixer(self):
+        if self.mixer_ready is None:
+            try:
+                pygame.mixer.init()
+                self.mixer_ready = True
+            except pygame.error as e:
+                print(f"Sound disabled: {e}")
+                self.mixer_ready = False
+        return self.mixer_ready
+
+    def play(self, name):
+        if not self.init_mixer():
+            return
+        path = self.path(name)
+        sound = self.sounds.get(name)
+        if sound is None:
+            if os.path.getsize(path) > STREAM_THRESHOLD:
+                pygame.mixer.music.load(path)
+                pygame.mixer.music.play()
+                return
+            sound = self.sounds[name] = pygame.mixer.Sound(path)
+        sound.play()
+
+    def open_display(self, caption):
+        # Only the display and font subsystems are started; the mixer waits for the first sound
+        pygame.display.init()
+        pygame.font.init()
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption(caption)
+        return screen
+
+assets = Assets()
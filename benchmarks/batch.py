@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from codec import BINARY_FORMAT, CODECS, JSON_FORMAT
+from delay_proxy import DelayProxy
+from network import NetworkClient
+from protocol import MAX_BATCH_SIZE
+
+HOST = '127.0.0.1'
+PORT = 65470
+
+def start_server(mode, port, limited=False):
+    # Without rate limits unless asked, so the one-request-at-a-time runs are not held back by them
+    command = [sys.executable, os.path.join(ROOT, "server.py"), "--mode", mode, "--port", str(port),
+               "--log-level", "WARNING"]
+    if not limited:
+        command += ["--rate-limit", "0"]
+    proc = subprocess.Popen(command, cwd=ROOT)
+    for _ in range(100):
+        try:
+            socket.create_connection((HOST, port)).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("Server did not start")
+
+def start_proxy(port, target_port, delay):
+    started = threading.Event()
+    proxy = DelayProxy(HOST, target_port, delay)
+    threading.Thread(target=lambda: asyncio.run(proxy.serve(HOST, port, started)), daemon=True).start()
+    started.wait()
+
+def timed(run):
+    start = time.perf_counter()
+    replies = run()
+    elapsed = time.perf_counter() - start
+    assert all(reply['status'] == 'success' for reply in replies), replies
+    return elapsed
+
+def status_reads(client, messages):
+    # The same reads three ways: a round trip each, all pipelined, and as one batch
+    return {
+        'one at a time': timed(lambda: [client.send(message) for message in messages]),
+        'pipelined': timed(lambda: client.send_many(messages)),
+        'batch': timed(lambda: client.batch(messages).result(30)['results'])
+    }
+
+def seat_players(port, lobby_codes):
+    # Puts a player in every lobby: each on a connection of its own, then all of them
+    # as labelled players on one connection
+    def own_connections():
+        return [NetworkClient(HOST, port).send({'action': 'join_lobby', 'lobby_code': lobby_code, 'name': f'guest{i}'})
+                for i, lobby_code in enumerate(lobby_codes)]
+
+    def one_connection():
+        client = NetworkClient(HOST, port)
+        return client.batch({'action': 'join_lobby', 'lobby_code': lobby_code, 'name': f'guest{i}',
+                             'player': f'guest{i}'} for i, lobby_code in enumerate(lobby_codes)).result(30)['results']
+
+    return {'a connection each': timed(own_connections), 'one connection': timed(one_connection)}
+
+def full_batches(port, lobbies):
+    # A batch as large as allowed must be answered in full, under the default rate limits and
+    # however far its reply is over the send buffer limit, in either format
+    client = NetworkClient(HOST, port)
+    lobby_codes = [reply['lobby_code'] for reply in client.batch(
+        {'action': 'create_lobby', 'name': f'host{i}', 'player': f'host{i}'} for i in range(lobbies)).result(30)['results']]
+    sizes = {}
+    for name in (JSON_FORMAT, BINARY_FORMAT):
+        client = NetworkClient(HOST, port, formats=(name,))
+        reply = client.batch({'action': 'check_lobby_status', 'lobby_code': lobby_codes[i % len(lobby_codes)]}
+                             for i in range(MAX_BATCH_SIZE)).result(30)
+        assert reply['status'] == 'success' and len(reply['results']) == MAX_BATCH_SIZE, reply
+        assert all(result['status'] == 'success' for result in reply['results']), reply
+        sizes[name] = len(CODECS[name].encode(reply))
+    return sizes
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare batches with one request per round trip")
+    parser.add_argument('--mode', choices=['threaded', 'asyncio'], default='asyncio')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--lobbies', type=int, default=100)
+    parser.add_argument('--delay-ms', type=float, default=25.0, help="one-way delay added by a proxy")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    server = start_server(args.mode, args.port)
+    proxy_port = args.port + 1
+    start_proxy(proxy_port, args.port, args.delay_ms / 1000)
+    try:
+        print(f"{args.mode} server, {args.requests} reads over {args.lobbies} lobbies")
+        print(f"{'':<28} {'direct ms':>10} {f'+{args.delay_ms:g}ms each way':>20}")
+        rows = {}
+        for column, port in (('direct', args.port), ('delayed', proxy_port)):
+            client = NetworkClient(HOST, port)
+            hosts = client.batch({'action': 'create_lobby', 'name': f'host{i}', 'player': f'host{i}'}
+                                 for i in range(args.lobbies)).result(30)['results']
+            lobby_codes = [reply['lobby_code'] for reply in hosts]
+            messages = [{'action': 'check_lobby_status', 'lobby_code': lobby_codes[i % len(lobby_codes)]}
+                        for i in range(args.requests)]
+            for label, elapsed in status_reads(client, messages).items():
+                rows.setdefault(f'reads, {label}', {})[column] = elapsed
+            for label, elapsed in seat_players(port, lobby_codes).items():
+                rows.setdefault(f'{args.lobbies} joins, {label}', {})[column] = elapsed
+        for label, row in rows.items():
+            print(f"{label:<28} {row['direct'] * 1e3:>10.1f} {row['delayed'] * 1e3:>20.1f}")
+        limited = start_server(args.mode, args.port + 2, limited=True)
+        try:
+            sizes = full_batches(args.port + 2, 10)
+        finally:
+            limited.terminate()
+            limited.wait()
+        print(f"a batch of {MAX_BATCH_SIZE} reads answered in full under the default rate limits: " +
+              ", ".join(f"{name} reply {size / 1024:.0f} KB" for name, size in sizes.items()))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import os
+import random
+import socket
+import statistics
+import string
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = '127.0.0.1'
+INPUT_INTERVAL = 0.002
+GUESS_INTERVAL = 0.05
+
+def key_center(letter):
+    i = string.ascii_uppercase.index(letter)
+    return 100 + (i % 13) * 50 + 20, 400 + (i // 13) * 50 + 20
+
+class FrameTimer:
+    # Times the work each frame does between reading events and presenting, with the
+    # frame cap disabled so only drawing cost is measured
+    def __init__(self):
+        import pygame
+        import render
+        self.times = []
+        self.changed = []
+        self.start = None
+        timer = self
+        original_events, original_present = render.View.events, render.View.present
+        original_update = pygame.display.update
+
+        def events(view):
+            result = original_events(view)
+            timer.start = time.perf_counter()
+            timer.updated = False
+            return result
+
+        def present(view):
+            original_present(view)
+            if timer.start is not None:
+                timer.times.append(time.perf_counter() - timer.start)
+                timer.changed.append(timer.updated)
+                timer.start = None
+
+        def update(*args):
+            timer.updated = True
+            return original_update(*args)
+
+        class Uncapped:
+            def tick(self, fps=0):
+                return 0
+
+        render.View.events, render.View.present = events, present
+        pygame.display.update = update
+        pygame.time.Clock = Uncapped
+
+    def report(self, name):
+        idle = [t for t, changed in zip(self.times, self.changed) if not changed]
+        busy = [t for t, changed in zip(self.times, self.changed) if changed]
+        return {'screen': name, 'frames': len(self.times),
+                'idle_us': statistics.mean(idle) * 1e6 if idle else 0.0,
+                'changed_us': statistics.mean(busy) * 1e6 if busy else 0.0,
+                'changed_frames': len(busy)}
+
+def post_input(stop, letters_for_turn):
+    # Mouse motion keeps frames coming without changing anything; clicks guess letters
+    import pygame
+    next_guess = time.perf_counter()
+    while not stop.is_set():
+        pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=(5, 5), rel=(0, 0), buttons=(0, 0, 0)))
+        if time.perf_counter() >= next_guess:
+            letter = letters_for_turn()
+            if letter is not None:
+                pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=key_center(letter), button=1))
+            next_guess = time.perf_counter() + GUESS_INTERVAL
+        time.sleep(INPUT_INTERVAL)
+
+def child_single(games, seed):
+    import pygame
+    from assets import assets
+    import singleplayer
+    singleplayer.screen = assets.open_display("benchmark")
+    pygame.time.wait = lambda ms: None
+    timer = FrameTimer()
+    rng = random.Random(seed)
+    for _ in range(games):
+        letters = rng.sample(string.ascii_uppercase, 26)
+        stop = threading.Event()
+        threading.Thread(target=post_input, args=(stop, lambda: letters.pop() if letters else None), daemon=True).start()
+        singleplayer.play_game(rng.choice(singleplayer.words.names()))
+        stop.set()
+        pygame.event.clear()
+    return timer.report('single')
+
+def child_multi(games, seed, port):
+    import pygame
+    from assets import assets
+    import client as game_client
+    from network import NetworkClient
+    game_client.screen = assets.open_display("benchmark")
+    pygame.time.wait = lambda ms: None
+    host = game_client.client = NetworkClient(HOST, port)
+    host.notify = game_client.wake
+    guest = NetworkClient(HOST, port)
+    timer = FrameTimer()
+    rng = random.Random(seed)
+    for _ in range(games):
+        lobby_code = host.send({'action': 'create_lobby', 'name': 'host'})['lobby_code']
+        guest.send({'action': 'join_lobby', 'lobby_code': lobby_code, 'name': 'guest'})
+        host.send({'action': 'start_game', 'lobby_code': lobby_code})
+        host.send({'action': 'set_category', 'lobby_code': lobby_code, 'category': rng.choice(game_client.words.names())})
+        letters = rng.sample(string.ascii_uppercase, 26)
+
+        def next_letter():
+            # The host guesses by clicking; the guest guesses over its own connection
+            update = host.poll(lobby_code)
+            if update is None or update['game_state'] is None or update['game_state']['game_over'] or not letters:
+                return None
+            if update['game_state']['current_player_name'] == 'host':
+                return letters.pop()
+            guest.request({'action': 'guess', 'lobby_code': lobby_code, 'letter': letters.pop()})
+            return None
+
+        stop = threading.Event()
+        threading.Thread(target=post_input, args=(stop, next_letter), daemon=True).start()
+        game_client.play_multiplayer_game(lobby_code, 'host')
+        stop.set()
+        pygame.event.clear()
+    return timer.report('multi')
+
+def start_server(port):
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--mode", "asyncio", "--port", str(port)],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection((HOST, port)).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("Server did not start")
+
+def run_child(screen, args):
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    command = [sys.executable, os.path.abspath(__file__), '--child', screen, '--games', str(args.games),
+               '--seed', str(args.seed), '--port', str(args.port)]
+    result = subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True, check=True)
+    return eval(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-frame CPU time of the game screens")
+    parser.add_argument('--games', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--port', type=int, default=65460)
+    parser.add_argument('--child', choices=['single', 'multi'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        os.chdir(ROOT)
+        if args.child == 'single':
+            print(child_single(args.games, args.seed))
+        else:
+            print(child_multi(args.games, args.seed, args.port))
+        return
+
+    server = start_server(args.port)
+    try:
+        print(f"{'screen':<8} {'frames':>8} {'unchanged us':>13} {'changed us':>11} {'changed frames':>15}")
+        for screen in ('single', 'multi'):
+            row = run_child(screen, args)
+            print(f"{row['screen']:<8} {row['frames']:>8} {row['idle_us']:>13.1f} {row['changed_us']:>11.1f} "
+                  f"{row['changed_frames']:>15}")
+    finally:
+        server.kill()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from delay_proxy import DelayProxy
+from network import NetworkClient
+
+HOST = '127.0.0.1'
+
+def start_server(port):
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--mode", "asyncio", "--port", str(port)],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection((HOST, port)).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("Server did not start")
+
+def start_proxy(port, target_port, delay):
+    started = threading.Event()
+    proxy = DelayProxy(HOST, target_port, delay)
+    threading.Thread(target=lambda: asyncio.run(proxy.serve(HOST, port, started)), daemon=True).start()
+    started.wait()
+
+def run_frames(client, lobby_code, frames, request_every, frame_work, blocking):
+    # Each frame does a fixed amount of "rendering" and every request_every-th frame also
+    # makes a request, either waiting for the reply (the old loop) or only queuing it
+    message = {'action': 'check_lobby_status', 'lobby_code': lobby_code}
+    pending = None
+    times = []
+    for frame in range(frames):
+        start = time.perf_counter()
+        client.poll(lobby_code)
+        if frame % request_every == 0:
+            if blocking:
+                client.send(message)
+            elif pending is None or pending.done():
+                pending = client.request(message)
+        time.sleep(frame_work)
+        times.append(time.perf_counter() - start)
+    return sorted(times)
+
+def summary(name, times):
+    mean = sum(times) / len(times)
+    p99 = times[min(len(times) - 1, int(0.99 * len(times)))]
+    return f"{name:<12} {mean * 1000:>9.2f} {p99 * 1000:>9.2f} {times[-1] * 1000:>9.2f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare frame times of blocking and background client requests")
+    parser.add_argument('--delay-ms', type=float, default=50.0, help="one-way latency added by the proxy")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--request-every', type=int, default=10, help="frames between requests")
+    parser.add_argument('--frame-work-ms', type=float, default=2.0, help="simulated rendering time per frame")
+    parser.add_argument('--port', type=int, default=65450)
+    args = parser.parse_args()
+
+    server = start_server(args.port)
+    try:
+        start_proxy(args.port + 1, args.port, args.delay_ms / 1000)
+        client = NetworkClient(HOST, args.port + 1)
+        lobby_code = client.send({'action': 'create_lobby', 'name': 'bench'})['lobby_code']
+        client.send({'action': 'subscribe', 'lobby_code': lobby_code})
+
+        print(f"{args.delay_ms:.0f} ms one-way delay, request every {args.request_every} frames")
+        print(f"{'mode':<12} {'mean ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for name, blocking in (('blocking', True), ('background', False)):
+            times = run_frames(client, lobby_code, args.frames, args.request_every, args.frame_work_ms / 1000, blocking)
+            print(summary(name, times))
+    finally:
+        server.kill()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCREENS = {
+    'menu': ('singleplayer', 'main_menu()'),
+    'game': ('singleplayer', 'play_game("Fruits")'),
+    'client-menu': ('client', 'main_menu()'),
+}
+
+# Leaves one screen running without input and reports the CPU time it used per second
+CHILD = """
+import os
+import sys
+import threading
+import time
+
+module_name, call, duration = sys.argv[1], sys.argv[2], float(sys.argv[3])
+sys.path.insert(0, os.getcwd())
+from assets import assets
+module = __import__(module_name)
+module.screen = assets.open_display("benchmark")
+
+start_wall = time.perf_counter()
+start_cpu = time.process_time()
+
+def stop():
+    print((time.process_time() - start_cpu) / (time.perf_counter() - start_wall), flush=True)
+    os._exit(0)
+
+threading.Timer(duration, stop).start()
+eval(call, vars(module))
+"""
+
+def measure(screen, duration):
+    module_name, call = SCREENS[screen]
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    result = subprocess.run([sys.executable, '-c', CHILD, module_name, call, str(duration)], cwd=ROOT, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True)
+    return float(result.stdout.split()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure client CPU usage while a screen sits idle")
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('screens', nargs='*', default=list(SCREENS), help=f"any of {', '.join(SCREENS)}")
+    args = parser.parse_args()
+
+    print(f"{'screen':<14} {'CPU %':>7}")
+    for screen in args.screens:
+        print(f"{screen:<14} {measure(screen, args.duration) * 100:>7.1f}")
+
+if __name__ == "__main__":
+    main()
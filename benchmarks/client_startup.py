@@ -0,0 +1,61 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs a client script until it presents its first frame, then reports the time spent
+# after pygame itself was imported and the process's memory at that point
+CHILD = """
+import os
+import runpy
+import sys
+import time
+import pygame
+IMPORTED = time.perf_counter()
+
+def memory_kb():
+    values = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(('VmRSS:', 'VmHWM:')):
+                key, value = line.split()[:2]
+                values[key] = int(value)
+    return values['VmRSS:'], values['VmHWM:']
+
+def first_frame(*args):
+    print(time.perf_counter() - IMPORTED, *memory_kb(), flush=True)
+    os._exit(0)
+
+pygame.display.flip = first_frame
+pygame.display.update = first_frame
+sys.argv = [sys.argv[1]]
+runpy.run_path(sys.argv[0], run_name='__main__')
+"""
+
+def run_once(script):
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CHILD, script], cwd=ROOT, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    startup, rss, peak = result.stdout.split()
+    return elapsed, float(startup), int(rss), int(peak)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure client time-to-first-frame and memory")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('scripts', nargs='*', default=['client.py', 'singleplayer.py'])
+    args = parser.parse_args()
+
+    print(f"{'script':<18} {'first frame ms':>15} {'after import ms':>16} {'RSS MB':>8} {'peak MB':>8}")
+    for script in args.scripts:
+        runs = [run_once(script) for _ in range(args.runs)]
+        elapsed, startup, rss, peak = (statistics.median(column) for column in zip(*runs))
+        print(f"{script:<18} {elapsed * 1000:>15.1f} {startup * 1000:>16.1f} {rss / 1024:>8.1f} {peak / 1024:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+
+HOST = '127.0.0.1'
+
+class DelayProxy:
+    # Forwards TCP connections to a target, delaying every chunk by a fixed one-way latency
+    def __init__(self, target_host, target_port, delay):
+        self.target_host = target_host
+        self.target_port = target_port
+        self.delay = delay
+
+    async def pipe(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                # Scheduling the write keeps chunks in order without serializing their delays
+                loop.call_later(self.delay, writer.write, data)
+        finally:
+            loop.call_later(self.delay, writer.close)
+
+    async def handle(self, client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(self.target_host, self.target_port)
+        await asyncio.gather(self.pipe(client_reader, server_writer), self.pipe(server_reader, client_writer))
+
+    async def serve(self, host, port, started=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        if started is not None:
+            started.set()
+        async with server:
+            await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="TCP proxy that adds latency in both directions")
+    parser.add_argument('--port', type=int, default=65440)
+    parser.add_argument('--target-host', default=HOST)
+    parser.add_argument('--target-port', type=int, default=65432)
+    parser.add_argument('--delay-ms', type=float, default=50.0, help="one-way delay")
+    args = parser.parse_args()
+    proxy = DelayProxy(args.target_host, args.target_port, args.delay_ms / 1000)
+    print(f"Proxying {HOST}:{args.port} -> {args.target_host}:{args.target_port} with {args.delay_ms} ms each way")
+    asyncio.run(proxy.serve(HOST, args.port))
+
+if __name__ == "__main__":
+    main()
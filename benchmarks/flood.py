@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from loadgen import Bot, Stats, percentile, run_group, spawn_server
+from protocol import HEADER, encode_frame
+
+HOST = '127.0.0.1'
+PORT = 65460
+CONFIGS = {
+    'off': ['--rate-limit', '0', '--coalesce-window', '0'],
+    'on': []
+}
+
+class Flooder:
+    # Polls one lobby as fast as the server answers, keeping `depth` requests in flight and
+    # ignoring retry_after, like a client stuck in an uncapped loop
+    def __init__(self, depth):
+        self.depth = depth
+        self.replies = 0
+        self.limited = 0
+
+    async def run(self, port, lobby_code, deadline):
+        reader, writer = await asyncio.open_connection(HOST, port)
+        frames = [encode_frame({'action': action, 'lobby_code': lobby_code, 'id': 0})
+                  for action in ('get_game_state', 'check_lobby_status')]
+        writer.write(b''.join(frames[i % 2] for i in range(self.depth)))
+        sent = self.depth
+        try:
+            while time.perf_counter() < deadline:
+                (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if b'retry_after' in await reader.readexactly(length):
+                    self.limited += 1
+                self.replies += 1
+                writer.write(frames[sent % 2])
+                sent += 1
+        finally:
+            writer.close()
+
+async def flooded_lobby(port):
+    # A started game that nobody moves in
+    host = Bot("flood-host", Stats())
+    await host.connect(HOST, port)
+    lobby_code = (await host.request({'action': 'create_lobby', 'name': host.name}))['lobby_code']
+    await host.request({'action': 'add_computer', 'lobby_code': lobby_code})
+    await host.request({'action': 'set_category', 'lobby_code': lobby_code, 'category': 'Animals'})
+    return host, lobby_code
+
+async def measure(args, port):
+    host, lobby_code = await flooded_lobby(port)
+    deadline = time.perf_counter() + args.duration
+    flooders = [Flooder(args.depth) for _ in range(args.flooders)]
+    stats = Stats()
+    group_args = argparse.Namespace(**{**vars(args), 'host': HOST, 'port': port, 'quick_match': False})
+    start = time.perf_counter()
+    await asyncio.gather(*(flooder.run(port, lobby_code, deadline) for flooder in flooders),
+                         *(run_group(group, group_args, stats, deadline) for group in range(args.lobbies)))
+    elapsed = time.perf_counter() - start
+    metrics = (await host.request({'action': 'stats'}))['metrics']
+    await host.close()
+    return stats, flooders, elapsed, metrics
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure normal games while other clients flood the server with reads")
+    parser.add_argument('--mode', choices=['threaded', 'asyncio'], default='asyncio')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--lobbies', type=int, default=50, help="lobbies playing normal games")
+    parser.add_argument('--players', type=int, default=2)
+    parser.add_argument('--flooders', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=32, help="requests each flooder keeps in flight")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    results = {}
+    for offset, (name, extra) in enumerate(CONFIGS.items()):
+        port = args.port + offset
+        server = spawn_server(args.mode, HOST, port, extra)
+        try:
+            stats, flooders, elapsed, metrics = asyncio.run(measure(args, port))
+        finally:
+            server.kill()
+            server.wait()
+        guesses = sorted(stats.latencies.get('guess', []))
+        results[name] = {
+            'games': stats.games,
+            'guess_p50_ms': percentile(guesses, 0.5) * 1e3,
+            'guess_p99_ms': percentile(guesses, 0.99) * 1e3,
+            'flood_replies_per_second': sum(flooder.replies for flooder in flooders) / elapsed,
+            'flood_limited': sum(flooder.limited for flooder in flooders),
+            'requests_limited': metrics['requests_limited'],
+            'requests_coalesced': metrics['requests_coalesced']
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.lobbies} lobbies playing, {args.flooders} flooding clients ({args.depth} in flight each), "
+          f"{args.mode} server, {args.duration:.0f}s")
+    print(f"{'limits':<7} {'games':>6} {'guess p50 ms':>13} {'guess p99 ms':>13} {'flood replies/s':>16} "
+          f"{'limited':>9} {'coalesced':>10}")
+    for name, row in results.items():
+        print(f"{name:<7} {row['games']:>6} {row['guess_p50_ms']:>13.2f} {row['guess_p99_ms']:>13.2f} "
+              f"{row['flood_replies_per_second']:>16.0f} {row['requests_limited']:>9} {row['requests_coalesced']:>10}")
+
+if __name__ == "__main__":
+    main()
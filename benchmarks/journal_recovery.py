@@ -0,0 +1,101 @@
+import argparse
+import contextlib
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from journal import Journal
+from server import Server
+
+# Starts a server on a data directory in a fresh process and reports how long recovery took
+CHILD = """
+import contextlib
+import os
+import sys
+import time
+sys.path.insert(0, {root!r})
+from journal import Journal
+from server import Server
+start = time.perf_counter()
+with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+    server = Server(journal=Journal(sys.argv[1]))
+print(time.perf_counter() - start, len(server.lobbies))
+"""
+
+def play_lobbies(server, count, rng, timings):
+    # Each lobby is created, joined, started and guessed at a few times, as in a real game.
+    # Every request is timed, including the ones that do not change anything.
+    for i in range(count):
+        host = 2 * i + 1
+        start = time.perf_counter()
+        lobby_code = server.process_message({'action': 'create_lobby', 'name': 'host'}, host)['lobby_code']
+        timings.append(time.perf_counter() - start)
+        requests = [
+            (host + 1, {'action': 'join_lobby', 'lobby_code': lobby_code, 'name': 'guest'}),
+            (host, {'action': 'set_category', 'lobby_code': lobby_code, 'category': rng.choice(server.words.names())})
+        ]
+        players = [host, host + 1]
+        for turn, letter in enumerate(rng.sample(string.ascii_uppercase, 6)):
+            requests.append((players[turn % 2], {'action': 'guess', 'lobby_code': lobby_code, 'letter': letter}))
+        for player_id, message in requests:
+            start = time.perf_counter()
+            server.process_message(message, player_id)
+            timings.append(time.perf_counter() - start)
+
+def summarize(timings):
+    timings.sort()
+    return sum(timings) / len(timings) * 1e6, timings[int(0.99 * len(timings))] * 1e6
+
+def recover(directory):
+    output = subprocess.run([sys.executable, '-c', CHILD.format(root=ROOT), directory],
+                            stdout=subprocess.PIPE, text=True, check=True).stdout
+    seconds, lobbies = output.split()
+    return float(seconds), int(lobbies)
+
+def size_mb(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure logging overhead and restart recovery time")
+    parser.add_argument('--lobbies', type=int, default=100_000)
+    parser.add_argument('--tail', type=int, default=10_000, help="lobbies created after the snapshot")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull:
+        rows = []
+        for label, journal in (("no log", None), ("log", Journal(directory))):
+            timings = []
+            with contextlib.redirect_stdout(devnull):
+                server = Server(journal=journal)
+                play_lobbies(server, args.lobbies, random.Random(args.seed), timings)
+            rows.append((label, *summarize(timings)))
+        print(f"{'server':<8} {'mean us':>8} {'p99 us':>8}")
+        for label, mean, p99 in rows:
+            print(f"{label:<8} {mean:>8.1f} {p99:>8.1f}")
+
+        server.journal.sync()
+        print(f"\n{'recovery from':<24} {'lobbies':>8} {'on disk MB':>11} {'seconds':>8}")
+        seconds, lobbies = recover(directory)
+        print(f"{'log only':<24} {lobbies:>8} {size_mb(directory):>11.1f} {seconds:>8.2f}")
+
+        start = time.perf_counter()
+        server.journal.snapshot(server.snapshot_rows)
+        snapshot_seconds = time.perf_counter() - start
+        with contextlib.redirect_stdout(devnull):
+            play_lobbies(server, args.tail, random.Random(args.seed + 1), [])
+        server.journal.sync()
+        seconds, lobbies = recover(directory)
+        print(f"{'snapshot + log tail':<24} {lobbies:>8} {size_mb(directory):>11.1f} {seconds:>8.2f}")
+        print(f"\nsnapshot of {args.lobbies} lobbies written in {snapshot_seconds:.2f}s")
+        server.journal.close()
+
+if __name__ == "__main__":
+    main()
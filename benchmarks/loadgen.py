@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import string
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from protocol import HEADER, apply_game_delta, encode_frame
+
+HOST = '127.0.0.1'
+PORT = 65432
+CATEGORIES = ["Animals", "Countries", "Fruits", "Sports"]
+RSS_SAMPLE_INTERVAL = 0.5
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.pushes = 0
+        self.games = 0
+        self.limited = 0
+        # Seconds from quick_match to being seated, and the server's queue depth over the run
+        self.match_waits = []
+        self.queue_depths = []
+        self.server_match_wait = None
+
+    def record(self, action, seconds, ok):
+        self.latencies.setdefault(action, []).append(seconds)
+        if not ok:
+            self.errors[action] = self.errors.get(action, 0) + 1
+
+    def requests(self):
+        return sum(len(samples) for samples in self.latencies.values())
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))
+    return sorted_samples[index]
+
+class Bot:
+    def __init__(self, name, stats):
+        self.name = name
+        self.stats = stats
+        self.reader = None
+        self.writer = None
+        self.next_id = 0
+        self.pending = {}
+        self.read_task = None
+        # Pushed messages, for bots that act on them
+        self.events = None
+
+    async def connect(self, host, port):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.read_task = asyncio.create_task(self.read_loop())
+
+    async def read_loop(self):
+        try:
+            while True:
+                (length,) = HEADER.unpack(await self.reader.readexactly(HEADER.size))
+                message = json.loads(await self.reader.readexactly(length))
+                future = self.pending.pop(message.get('id'), None)
+                if future is not None:
+                    future.set_result(message)
+                else:
+                    self.stats.pushes += 1
+                    if self.events is not None:
+                        self.events.put_nowait(message)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            for future in self.pending.values():
+                future.set_exception(ConnectionError("Server closed the connection"))
+            self.pending.clear()
+
+    async def request(self, message):
+        start = time.perf_counter()
+        while True:
+            self.next_id += 1
+            future = asyncio.get_running_loop().create_future()
+            self.pending[self.next_id] = future
+            self.writer.write(encode_frame(dict(message, id=self.next_id)))
+            response = await future
+            # Rate limited: back off as asked, and the wait counts towards the latency
+            if 'retry_after' not in response:
+                break
+            self.stats.limited += 1
+            await asyncio.sleep(response['retry_after'])
+        self.stats.record(message['action'], time.perf_counter() - start, response.get('status') == 'success')
+        return response
+
+    async def next_event(self, event, lobby_code=None):
+        # Pushes for other lobbies, or of other kinds, are dropped
+        while True:
+            message = await self.events.get()
+            if message.get('event') == event and (lobby_code is None or message['lobby_code'] == lobby_code):
+                return message
+
+    async def close(self):
+        self.writer.close()
+        self.read_task.cancel()
+
+async def play_games(group, bots, rng, deadline):
+    host = bots[0]
+    by_name = {bot.name: bot for bot in bots}
+    while time.perf_counter() < deadline:
+        lobby_code = (await host.request({'action': 'create_lobby', 'name': host.name}))['lobby_code']
+        for bot in bots[1:]:
+            await bot.request({'action': 'join_lobby', 'lobby_code': lobby_code, 'name': bot.name})
+        for bot in bots:
+            await bot.request({'action': 'subscribe', 'lobby_code': lobby_code})
+        await host.request({'action': 'set_category', 'lobby_code': lobby_code, 'category': rng.choice(CATEGORIES)})
+        state = (await host.request({'action': 'get_game_state', 'lobby_code': lobby_code}))['game_state']
+
+        letters = rng.sample(string.ascii_uppercase, len(string.ascii_uppercase))
+        while not state['game_over']:
+            letter = letters.pop()
+            bot = by_name[state['current_player_name']]
+            response = await bot.request({'action': 'guess', 'lobby_code': lobby_code, 'letter': letter})
+            if response['status'] != 'success':
+                raise RuntimeError(f"Lobby group {group}: guess failed: {response}")
+            state = response['game_state']
+        host.stats.games += 1
+
+        for bot in bots:
+            await bot.request({'action': 'unsubscribe', 'lobby_code': lobby_code})
+
+async def play_quick_matches(bot, rng, deadline):
+    # The bot queues on its own and plays whoever it is matched with, from any group, taking
+    # its turn when a pushed update says so
+    bot.events = asyncio.Queue()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        category = rng.choice(CATEGORIES)
+        match = await bot.request({'action': 'quick_match', 'category': category, 'name': bot.name})
+        if match['status'] != 'success':
+            raise RuntimeError(f"{bot.name}: quick_match failed: {match}")
+        if match['queued']:
+            try:
+                match = await asyncio.wait_for(bot.next_event('match_found'), deadline - time.perf_counter())
+            except asyncio.TimeoutError:
+                # Time is up: leave, unless the match was made first, in which case its push
+                # arrived before this reply
+                if (await bot.request({'action': 'leave_queue', 'category': category}))['status'] == 'success':
+                    return
+                match = await bot.next_event('match_found')
+        bot.stats.match_waits.append(time.perf_counter() - start)
+        lobby_code = match['lobby_code']
+        state = match['update']['game_state']
+
+        letters = rng.sample(string.ascii_uppercase, len(string.ascii_uppercase))
+        while not state['game_over']:
+            if state['current_player_name'] == bot.name:
+                letter = next(letter for letter in letters if letter not in state['guessed_letters'])
+                response = await bot.request({'action': 'guess', 'lobby_code': lobby_code, 'letter': letter})
+                if response['status'] != 'success':
+                    raise RuntimeError(f"{bot.name}: guess failed: {response}")
+                state = response['game_state']
+                continue
+            update = await bot.next_event('lobby_update', lobby_code)
+            if update['version'] <= state['version']:
+                continue
+            if update.get('game_delta') is None:
+                state = update['game_state']
+                continue
+            updated = apply_game_delta(state, update['game_delta'])
+            if updated is None:
+                updated = (await bot.request({'action': 'get_game_state', 'lobby_code': lobby_code}))['game_state']
+            state = updated
+        # Each game is counted once, by its host
+        if match['update']['lobby']['players'][0] == bot.name:
+            bot.stats.games += 1
+        await bot.request({'action': 'unsubscribe', 'lobby_code': lobby_code})
+
+async def run_group(group, args, stats, deadline):
+    # Each lobby group has its own RNG, so the sequence of categories and guesses is reproducible
+    rng = random.Random(args.seed * 1000003 + group)
+    bots = [Bot(f"bot{group}_{i}", stats) for i in range(args.players)]
+    for bot in bots:
+        await bot.connect(args.host, args.port)
+    try:
+        if args.quick_match:
+            await asyncio.gather(*(play_quick_matches(bot, random.Random(rng.random()), deadline) for bot in bots))
+        else:
+            await play_games(group, bots, rng, deadline)
+    finally:
+        for bot in bots:
+            await bot.close()
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+async def sample_rss(pid, samples, stop):
+    while not stop.is_set():
+        value = rss_kb(pid)
+        if value is not None:
+            samples.append(value)
+        try:
+            await asyncio.wait_for(stop.wait(), RSS_SAMPLE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+async def sample_queue(args, stats, stop):
+    # The depth of the server's matchmaking queue, and its own time-to-match figures
+    monitor = Bot("monitor", Stats())
+    await monitor.connect(args.host, args.port)
+    try:
+        while not stop.is_set():
+            matchmaking = (await monitor.request({'action': 'stats'}))['matchmaking']
+            stats.queue_depths.append(matchmaking['queued'])
+            stats.server_match_wait = matchmaking['wait_ms']
+            try:
+                await asyncio.wait_for(stop.wait(), RSS_SAMPLE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await monitor.close()
+
+async def run(args):
+    stats = Stats()
+    rss_samples = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(args.server_pid, rss_samples, stop)) if args.server_pid else None
+    queue_sampler = asyncio.create_task(sample_queue(args, stats, stop)) if args.quick_match else None
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    # Groups start staggered over the ramp-up so connection setup does not dominate the first second
+    async def staggered(group):
+        await asyncio.sleep(args.ramp_up * group / max(1, args.lobbies))
+        await run_group(group, args, stats, deadline)
+    await asyncio.gather(*(staggered(group) for group in range(args.lobbies)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    if sampler is not None:
+        await sampler
+    if queue_sampler is not None:
+        await queue_sampler
+    return stats, elapsed, rss_samples
+
+def report(args, stats, elapsed, rss_samples):
+    result = {
+        'seed': args.seed,
+        'lobbies': args.lobbies,
+        'players': args.lobbies * args.players,
+        'elapsed': elapsed,
+        'games': stats.games,
+        'requests': stats.requests(),
+        'requests_per_second': stats.requests() / elapsed,
+        'pushes': stats.pushes,
+        'rate_limited': stats.limited,
+        'actions': {}
+    }
+    for action, samples in sorted(stats.latencies.items()):
+        samples.sort()
+        result['actions'][action] = {
+            'count': len(samples),
+            'errors': stats.errors.get(action, 0),
+            'p50_ms': percentile(samples, 0.50) * 1000,
+            'p99_ms': percentile(samples, 0.99) * 1000,
+            'p999_ms': percentile(samples, 0.999) * 1000
+        }
+    if rss_samples:
+        result['server_rss_kb'] = {'start': rss_samples[0], 'peak': max(rss_samples), 'end': rss_samples[-1]}
+    if stats.match_waits:
+        waits = sorted(stats.match_waits)
+        result['quick_match'] = {
+            'matches': len(waits),
+            'time_to_match_p50_ms': percentile(waits, 0.50) * 1000,
+            'time_to_match_p99_ms': percentile(waits, 0.99) * 1000,
+            'time_to_match_max_ms': waits[-1] * 1000,
+            'queue_depth_mean': sum(stats.queue_depths) / len(stats.queue_depths) if stats.queue_depths else 0,
+            'queue_depth_max': max(stats.queue_depths, default=0),
+            'server_time_to_match_ms': stats.server_match_wait
+        }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"players {result['players']} in {args.lobbies} lobbies, {elapsed:.1f}s, seed {args.seed}")
+    print(f"games {stats.games}, requests {result['requests']} ({result['requests_per_second']:.0f}/s), "
+          f"pushes received {stats.pushes}, rate limited {stats.limited}")
+    print(f"{'action':<18} {'count':>8} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8} {'p999 ms':>8}")
+    for action, row in result['actions'].items():
+        print(f"{action:<18} {row['count']:>8} {row['errors']:>7} {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['p999_ms']:>8.2f}")
+    if stats.match_waits:
+        match = result['quick_match']
+        print(f"quick matches {match['matches']}: time to match p50 {match['time_to_match_p50_ms']:.2f} ms, "
+              f"p99 {match['time_to_match_p99_ms']:.2f} ms, max {match['time_to_match_max_ms']:.0f} ms; "
+              f"queue depth mean {match['queue_depth_mean']:.1f}, max {match['queue_depth_max']}")
+    if rss_samples:
+        rss = result['server_rss_kb']
+        print(f"server RSS: start {rss['start'] / 1024:.1f} MB, peak {rss['peak'] / 1024:.1f} MB, end {rss['end'] / 1024:.1f} MB")
+
+def spawn_server(mode, host, port, extra_args=()):
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--mode", mode,
+                             "--host", host, "--port", str(port), *extra_args],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection((host, port)).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("Server did not start")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Drive a Hangman server with headless bot players")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--lobbies', type=int, default=500)
+    parser.add_argument('--players', type=int, default=2, help="players per lobby")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds; games in progress finish first")
+    parser.add_argument('--ramp-up', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--server-pid', type=int, help="sample this process's RSS")
+    parser.add_argument('--spawn-server', choices=['threaded', 'asyncio'],
+                        help="start server.py in this mode on --host/--port for the run")
+    parser.add_argument('--quick-match', action='store_true',
+                        help="players queue with quick_match instead of creating and joining lobbies; "
+                             "a spawned server matches --players at a time")
+    parser.add_argument('--json', action='store_true', help="print machine-readable results")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    server = None
+    if args.spawn_server:
+        extra_args = ['--match-size', str(args.players)] if args.quick_match else []
+        server = spawn_server(args.spawn_server, args.host, args.port, extra_args)
+        args.server_pid = server.pid
+    try:
+        stats, elapsed, rss_samples = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.kill()
+            server.wait()
+    report(args, stats, elapsed, rss_samples)
+
+if __name__ == "__main__":
+    main()
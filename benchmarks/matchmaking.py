@@ -0,0 +1,98 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from codec import JSON
+from matchmaking import MATCH_WAIT, Matchmaker, Ticket
+from server import Server
+
+CATEGORIES = ["Animals", "Countries", "Fruits", "Sports"]
+
+class Sink:
+    # Stands in for a connection: counts what the server pushes to it
+    def __init__(self, player_id):
+        self.player_id = player_id
+        self.subscriptions = set()
+        self.lobbies = set()
+        self.codec = JSON
+        self.pushes = 0
+
+    def write(self, data):
+        self.pushes += 1
+
+def percentile(sorted_samples, fraction):
+    return sorted_samples[min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))]
+
+def burst(players, size):
+    # Every player asks for a quick match at once, through the server, so each match also
+    # creates and starts its lobby and pushes it to the players already waiting
+    server = Server(match_size=size)
+    connections = [Sink(player_id) for player_id in range(1, players + 1)]
+    rng = random.Random(1)
+    samples = []
+    start = time.perf_counter()
+    for connection in connections:
+        message = {'action': 'quick_match', 'category': rng.choice(CATEGORIES), 'name': f"p{connection.player_id}"}
+        call_start = time.perf_counter_ns()
+        server.process_message(message, connection.player_id, connection)
+        samples.append(time.perf_counter_ns() - call_start)
+    elapsed = time.perf_counter() - start
+    samples.sort()
+    seated = sum(1 for connection in connections if connection.lobbies)
+    return elapsed, samples, seated, server.matchmaker.counters()
+
+def deep_queue(players, cancel_fraction):
+    # Every player waits alone (a category each), so the whole queue is still there when
+    # their wait runs out: costs with 100k queued, and the sweep that then matches them all
+    now = [0.0]
+    matchmaker = Matchmaker(clock=lambda: now[0])
+    rows = {}
+    start = time.perf_counter_ns()
+    for player_id in range(players):
+        matchmaker.enqueue(Ticket(player_id, "p", player_id, None))
+        if player_id + 1 == players // 10:
+            rows['enqueue, first 10%'] = (time.perf_counter_ns() - start) / (players // 10)
+            start = time.perf_counter_ns()
+        elif player_id + 1 == players:
+            rows['enqueue, last 90%'] = (time.perf_counter_ns() - start) / (players - players // 10)
+    leaving = random.Random(2).sample(range(players), int(players * cancel_fraction))
+    start = time.perf_counter_ns()
+    for player_id in leaving:
+        matchmaker.cancel(player_id)
+    rows['leave'] = (time.perf_counter_ns() - start) / max(1, len(leaving))
+    queued = matchmaker.counters()['queued']
+    now[0] += MATCH_WAIT
+    start = time.perf_counter_ns()
+    matches = matchmaker.due()
+    sweep = (time.perf_counter_ns() - start) / 1e6
+    return rows, queued, len(matches), sweep
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the quick-match queue with many players queued")
+    parser.add_argument('--players', type=int, default=100_000)
+    parser.add_argument('--size', type=int, default=2, help="players per matched lobby")
+    parser.add_argument('--cancel', type=float, default=0.1, help="share of the deep queue that leaves it")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    elapsed, samples, seated, counters = burst(args.players, args.size)
+    print(f"{args.players} players asking for a match at once ({len(CATEGORIES)} categories, {args.size} per lobby)")
+    print(f"  all handled in {elapsed:.2f}s; {seated} seated in {counters['lobbies']} lobbies, "
+          f"{counters['queued']} still queued")
+    print(f"  quick_match: p50 {percentile(samples, 0.5) / 1e3:.1f} µs, p99 {percentile(samples, 0.99) / 1e3:.1f} µs, "
+          f"max {samples[-1] / 1e3:.0f} µs")
+
+    rows, queued, matches, sweep = deep_queue(args.players, args.cancel)
+    print(f"{args.players} players waiting alone, {queued} still queued after {args.cancel:.0%} left")
+    for label, ns in rows.items():
+        print(f"  {label:<20} {ns:>8.0f} ns")
+    print(f"  after {MATCH_WAIT:g}s: {matches} players matched with computers in one sweep of {sweep:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from server import Server, log
+
+def per_call_ns(function, calls):
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter_ns() - start) / calls
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-request cost of metrics and logging")
+    parser.add_argument('--calls', type=int, default=200_000)
+    args = parser.parse_args()
+
+    server = Server()
+    connection = types.SimpleNamespace(player_id=1, subscriptions=set(), lobbies=set())
+    lobby_code = server.process_message({'action': 'create_lobby', 'name': 'host'}, 1)['lobby_code']
+    server.process_message({'action': 'join_lobby', 'lobby_code': lobby_code, 'name': 'guest'}, 2)
+    server.process_message({'action': 'set_category', 'lobby_code': lobby_code, 'category': 'Animals'}, 1)
+    message = {'action': 'get_game_state', 'lobby_code': lobby_code}
+
+    rows = [
+        ("request without metrics", per_call_ns(lambda: server.process_message(message, 1, connection), args.calls)),
+        ("request with metrics", per_call_ns(lambda: server.handle_message(message, connection), args.calls))
+    ]
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        rows.append(("print to stdout", per_call_ns(lambda: print(f"Turn passed to player {1}"), args.calls)))
+    logging.getLogger().setLevel(logging.INFO)
+    rows.append(("disabled log.debug", per_call_ns(lambda: log.debug("Turn passed to player %d", 1), args.calls)))
+
+    for label, ns in rows:
+        print(f"{label:<26} {ns:>8.0f} ns")
+
+if __name__ == "__main__":
+    main()
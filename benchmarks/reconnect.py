@@ -0,0 +1,106 @@
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from network import NetworkClient
+
+HOST = '127.0.0.1'
+PORT = 65450
+
+def start_server(mode, port, data_dir):
+    command = [sys.executable, os.path.join(ROOT, "server.py"), "--mode", mode, "--port", str(port),
+               "--data-dir", data_dir, "--log-level", "WARNING"]
+    proc = subprocess.Popen(command, cwd=ROOT)
+    for _ in range(100):
+        try:
+            socket.create_connection((HOST, port)).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("Server did not start")
+
+def wait_reconnected(client, count):
+    while client.reconnects < count:
+        if client.error is not None:
+            raise RuntimeError(f"Client gave up: {client.error}")
+        time.sleep(0.001)
+
+def resume(host, guest, lobby_code, drop):
+    # Drops the host's connection (or the whole server) on the host's turn, then times the
+    # host's reconnect and its next guess; returns (seconds, whether the seat was kept)
+    reconnects = host.reconnects
+    start = time.perf_counter()
+    drop()
+    wait_reconnected(host, reconnects + 1)
+    reconnected = time.perf_counter() - start
+    state = host.send({'action': 'get_game_state', 'lobby_code': lobby_code})['game_state']
+    kept = state['current_player_name'] == 'host'
+    response = host.send({'action': 'guess', 'lobby_code': lobby_code, 'letter': 'E'})
+    kept = kept and response['status'] == 'success'
+    guessed = time.perf_counter() - start
+    lobby = guest.send({'action': 'check_lobby_status', 'lobby_code': lobby_code})
+    kept = kept and lobby['players'] == ['host', 'guest']
+    return reconnected, guessed, kept
+
+def new_game(host, guest):
+    lobby_code = host.send({'action': 'create_lobby', 'name': 'host'})['lobby_code']
+    guest.send({'action': 'join_lobby', 'lobby_code': lobby_code, 'name': 'guest'})
+    host.subscribe(lobby_code).result(5)
+    host.send({'action': 'set_category', 'lobby_code': lobby_code, 'category': 'Animals'})
+    return lobby_code
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how long a dropped player takes to get their seat back")
+    parser.add_argument('--mode', choices=['threaded', 'asyncio'], default='asyncio')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--restarts', type=int, default=5, help="rounds that restart the server instead")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    data_dir = tempfile.mkdtemp(prefix="hangman-reconnect-")
+    proc = start_server(args.mode, args.port, data_dir)
+    results = {'connection dropped': [], 'server restarted': []}
+    try:
+        host = NetworkClient(HOST, args.port)
+        guest = NetworkClient(HOST, args.port)
+        for _ in range(args.rounds):
+            lobby_code = new_game(host, guest)
+            results['connection dropped'].append(
+                resume(host, guest, lobby_code, lambda: host.socket.shutdown(socket.SHUT_RDWR)))
+
+        def restart():
+            # As in a deploy: SIGTERM, which writes out the lobby log, then a new process
+            nonlocal proc
+            proc.terminate()
+            proc.wait()
+            proc = start_server(args.mode, args.port, data_dir)
+
+        for _ in range(args.restarts):
+            lobby_code = new_game(host, guest)
+            results['server restarted'].append(resume(host, guest, lobby_code, restart))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    print(f"{args.mode} server")
+    print(f"{'':<20} {'rounds':>6} {'reconnect ms':>13} {'next guess ms':>14} {'seat kept':>10}")
+    for label, rows in results.items():
+        if not rows:
+            continue
+        reconnect = sorted(row[0] for row in rows)[len(rows) // 2]
+        guess = sorted(row[1] for row in rows)[len(rows) // 2]
+        kept = sum(row[2] for row in rows)
+        print(f"{label:<20} {len(rows):>6} {reconnect * 1e3:>13.1f} {guess * 1e3:>14.1f} {kept:>6}/{len(rows)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import contextlib
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from codec import put_varint
+from replays import ABANDONED, COMPUTER, HANGED, HIT, SOLVED, GameRecord, ReplayLog
+from server import Server
+
+CATEGORIES = ["Animals", "Countries", "Fruits", "Sports"]
+
+# Reads the records in a fresh process, so its peak memory is the scan's own
+CHILD = """
+import resource
+import sys
+import time
+sys.path.insert(0, {root!r})
+from replays import Analysis, segment_paths
+analysis = Analysis(latency=sys.argv[2] == 'moves')
+start = time.perf_counter()
+for path in segment_paths([sys.argv[1]]):
+    analysis.add_file(path)
+print(time.perf_counter() - start, analysis.games, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def play_games(server, count, rng, timings):
+    # Two players guess random letters until each game is over; every request is timed
+    for i in range(count):
+        host = 2 * i + 1
+        lobby_code = server.process_message({'action': 'create_lobby', 'name': 'host'}, host)['lobby_code']
+        server.process_message({'action': 'join_lobby', 'lobby_code': lobby_code, 'name': 'guest'}, host + 1)
+        category = rng.choice(server.words.names())
+        server.process_message({'action': 'set_category', 'lobby_code': lobby_code, 'category': category}, host)
+        game = server.lobbies.get(lobby_code)
+        for letter in rng.sample(string.ascii_uppercase, 26):
+            if game.is_game_over():
+                break
+            message = {'action': 'guess', 'lobby_code': lobby_code, 'letter': letter}
+            start = time.perf_counter()
+            server.process_message(message, game.players[game.current_player])
+            timings.append(time.perf_counter() - start)
+        server.remove_lobby(lobby_code)
+
+def synthetic_record(rng, word_count):
+    # A two-player game against one computer: people take a couple of seconds a turn,
+    # the computer none
+    record = GameRecord()
+    record.started_at = 1.7e9 + rng.random() * 1e7
+    misses = 0
+    hits = 0
+    length = rng.randint(5, 9)
+    seat = 0
+    while misses < 7 and hits < length:
+        hit = rng.random() < 0.45
+        computer = seat == 2
+        elapsed = 0 if computer else int(rng.lognormvariate(7.5, 0.6))
+        record.moves.append(rng.randrange(26) | (HIT if hit else 0) | (COMPUTER if computer else 0))
+        put_varint(record.moves, elapsed)
+        record.guesses += 1
+        if hit:
+            hits += 1
+        else:
+            misses += 1
+            record.misses += 1
+        if not computer:
+            record.turns += 1
+            record.turn_ms += elapsed
+        seat = (seat + 1) % 3
+    outcome = ABANDONED if rng.random() < 0.05 else SOLVED if hits == length else HANGED
+    return record.encode(rng.choice(CATEGORIES), rng.randrange(word_count), outcome, 3, 1)
+
+def scan(directory, mode):
+    output = subprocess.run([sys.executable, '-c', CHILD.format(root=ROOT), directory, mode],
+                            stdout=subprocess.PIPE, text=True, check=True).stdout
+    seconds, games, peak_kb = output.split()
+    return float(seconds), int(games), int(peak_kb) / 1024
+
+def summarize(timings):
+    timings.sort()
+    return sum(timings) / len(timings) * 1e6, timings[int(0.99 * len(timings))] * 1e6
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure game recording and the analysis of recorded games")
+    parser.add_argument('--lobbies', type=int, default=20_000, help="games played through the server")
+    parser.add_argument('--games', type=int, default=2_000_000, help="synthetic games written and then read")
+    parser.add_argument('--words', type=int, default=50_000, help="distinct words per category in them")
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull:
+        print(f"{'guess':<12} {'mean us':>8} {'p99 us':>8}")
+        for label, replays in (("not recorded", None), ("recorded", ReplayLog(os.path.join(directory, 'server')))):
+            timings = []
+            with contextlib.redirect_stdout(devnull):
+                server = Server(replays=replays)
+                play_games(server, args.lobbies, random.Random(args.seed), timings)
+            server.close()
+            mean, p99 = summarize(timings)
+            print(f"{label:<12} {mean:>8.1f} {p99:>8.1f}")
+
+        rng = random.Random(args.seed)
+        records = os.path.join(directory, 'synthetic')
+        log = ReplayLog(records)
+        encode = 0.0
+        start = time.perf_counter()
+        for _ in range(args.games):
+            encode_start = time.perf_counter()
+            record = synthetic_record(rng, args.words)
+            encode += time.perf_counter() - encode_start
+            log.append(record)
+        log.close()
+        write = time.perf_counter() - start - encode
+        size = sum(os.path.getsize(os.path.join(records, name)) for name in os.listdir(records))
+        print(f"\n{args.games:,} games: {size / 1e6:.0f} MB, {size / args.games:.0f} bytes a game, "
+              f"appended at {write / args.games * 1e9:.0f} ns a game")
+
+        print(f"\n{'scan':<16} {'seconds':>8} {'games/s':>10} {'peak MB':>8}")
+        for label, mode in (("summaries", 'summaries'), ("every move", 'moves')):
+            seconds, games, peak = scan(records, mode)
+            print(f"{label:<16} {seconds:>8.2f} {games / seconds:>10,.0f} {peak:>8.0f}")
+
+if __name__ == "__main__":
+    main()
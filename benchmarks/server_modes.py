@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from protocol import HEADER, MessageStream, encode_frame
+
+HOST = '127.0.0.1'
+
+def rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def start_server(mode, port):
+    # Each client reads as fast as it can, which the default per-connection limit would cap
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--mode", mode, "--port", str(port),
+                             "--rate-limit", "0"],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection((HOST, port)).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+def request(sock, message):
+    stream = MessageStream(sock)
+    stream.send(message)
+    return stream.receive_all()[0]
+
+def measure_idle(pid, port, connections):
+    time.sleep(0.5)
+    baseline = rss_kb(pid)
+    socks = []
+    for i in range(connections):
+        sock = socket.create_connection((HOST, port))
+        # A round trip guarantees the server has a live handler for this connection
+        request(sock, {'action': 'create_lobby', 'name': f"idle{i}"})
+        socks.append(sock)
+    time.sleep(0.5)
+    used = rss_kb(pid) - baseline
+    for sock in socks:
+        sock.close()
+    per_conn_kb = used / connections
+    return per_conn_kb, (1024 * 1024) / per_conn_kb if per_conn_kb > 0 else float('inf')
+
+async def measure_throughput(port, clients, duration):
+    count = 0
+    deadline = time.perf_counter() + duration
+
+    async def receive(reader):
+        (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+        return await reader.readexactly(length)
+
+    async def worker(i):
+        nonlocal count
+        reader, writer = await asyncio.open_connection(HOST, port)
+        writer.write(encode_frame({'action': 'create_lobby', 'name': f"bench{i}"}))
+        lobby_code = json.loads(await receive(reader))['lobby_code']
+        payload = encode_frame({'action': 'check_lobby_status', 'lobby_code': lobby_code})
+        while time.perf_counter() < deadline:
+            writer.write(payload)
+            await receive(reader)
+            count += 1
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(clients)))
+    return count / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare threaded and asyncio server modes")
+    parser.add_argument('--connections', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--port', type=int, default=65500)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'KB/conn':>8} {'conns/GB':>10} {'req/s':>9}")
+    for offset, mode in enumerate(['threaded', 'asyncio']):
+        port = args.port + offset
+        proc = start_server(mode, port)
+        try:
+            per_conn_kb, per_gb = measure_idle(proc.pid, port, args.connections)
+            rps = asyncio.run(measure_throughput(port, args.clients, args.duration))
+        finally:
+            proc.kill()
+            proc.wait()
+        print(f"{mode:<10} {per_conn_kb:>8.1f} {per_gb:>10.0f} {rps:>9.0f}")
+
+if __name__ == "__main__":
+    main()
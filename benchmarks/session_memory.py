@@ -0,0 +1,77 @@
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dictionary import load
+from server import MAX_WRONG_GUESSES, GameSession
+
+def build_sessions(count):
+    words = load()
+    sessions = []
+    for i in range(count):
+        game = GameSession(i * 2)
+        game.add_player(i * 2, "host")
+        game.add_player(i * 2 + 1, "guest")
+        category = random.choice(words.names())
+        game.start_game(category, words.random_word(category))
+        game.guess("A")
+        game.guess("E")
+        sessions.append(game)
+    return sessions
+
+def check_restart():
+    # A game started again after one was lost or won begins from nothing
+    game = GameSession(1)
+    game.add_player(1, "host")
+    game.add_player(2, "guest")
+    for letters in ("QXZJVKWYF"[:MAX_WRONG_GUESSES], "CAT"):
+        game.start_game("Animals", "CAT")
+        for letter in letters:
+            game.play(letter)
+        assert game.is_game_over()
+        game.start_game("Animals", "CAT")
+        assert not game.is_game_over(), game.get_game_state()
+        assert (game.wrong_guesses, game.winner, game.current_player, game.guessed_letters) == (0, None, 0, [])
+
+def time_per_call(sessions, method):
+    start = time.perf_counter()
+    for game in sessions:
+        method(game)
+    return (time.perf_counter() - start) / len(sessions) * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure GameSession memory and state check cost")
+    parser.add_argument('--sessions', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    check_restart()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        sessions = build_sessions(args.sessions)
+        idle = tracemalloc.get_traced_memory()[0] - baseline
+        for game in sessions:
+            game.get_game_state()
+        with_state = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+    print(f"sessions:                  {args.sessions}")
+    print(f"bytes/session:             {idle / args.sessions:.0f}")
+    print(f"bytes/session with state:  {with_state / args.sessions:.0f}")
+    print(f"is_game_over:              {time_per_call(sessions, GameSession.is_game_over):.0f} ns")
+    print(f"get_game_state (cached):   {time_per_call(sessions, GameSession.get_game_state):.0f} ns")
+    for game in sessions:
+        game.mark_changed()
+    print(f"get_game_state (rebuilt):  {time_per_call(sessions, GameSession.get_game_state):.0f} ns")
+
+if __name__ == "__main__":
+    main()
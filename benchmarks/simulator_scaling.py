@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from simulator import STRATEGIES, simulate
+
+def process_counts(most):
+    # 1, 2, 4, ... up to most, and most itself
+    counts = []
+    count = 1
+    while count < most:
+        counts.append(count)
+        count *= 2
+    return counts + [most]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure simulator throughput as processes are added")
+    parser.add_argument('--games', type=int, default=10_000, help="games per word")
+    parser.add_argument('--processes', type=int, default=max(2, os.cpu_count() or 1),
+                        help="most processes to try")
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), action='append',
+                        help="strategies to measure (default: random and frequency)")
+    parser.add_argument('--words', help="word dictionary file (default: built-in lists)")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    print(f"{os.cpu_count()} cores, {args.games} games per word")
+    print(f"{'strategy':<10} {'processes':>9} {'games':>10} {'seconds':>8} {'games/s':>9} {'speedup':>8}")
+    for strategy in args.strategy or ['random', 'frequency']:
+        baseline = None
+        reference = None
+        for processes in process_counts(args.processes):
+            start = time.perf_counter()
+            results, games = simulate(args.words, strategy, args.games, processes)
+            elapsed = time.perf_counter() - start
+            rate = games / elapsed
+            baseline = baseline or rate
+            # Every run must come out the same, however the work was split
+            reference = reference or results
+            assert results == reference
+            print(f"{strategy:<10} {processes:>9} {games:>10,} {elapsed:>8.2f} {rate:>9,.0f} {rate / baseline:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
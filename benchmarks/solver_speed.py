@@ -0,0 +1,93 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import solver
+from dictionary import WordDictionary, write_dictionary
+from server import MAX_WRONG_GUESSES
+
+# Letter weights roughly matching English text, so candidate sets shrink realistically
+FREQUENCIES = {
+    'E': 12.7, 'T': 9.1, 'A': 8.2, 'O': 7.5, 'I': 7.0, 'N': 6.7, 'S': 6.3, 'H': 6.1, 'R': 6.0,
+    'D': 4.3, 'L': 4.0, 'C': 2.8, 'U': 2.8, 'M': 2.4, 'W': 2.4, 'F': 2.2, 'G': 2.0, 'Y': 2.0,
+    'P': 1.9, 'B': 1.5, 'V': 1.0, 'K': 0.8, 'J': 0.2, 'X': 0.2, 'Q': 0.1, 'Z': 0.1
+}
+
+def generate_words(count, rng):
+    letters, weights = zip(*FREQUENCIES.items())
+    for _ in range(count):
+        yield ''.join(rng.choices(letters, weights, k=rng.randint(4, 14)))
+
+def play(words, ai, category, rng, timings):
+    # Plays one game with the solver guessing; records the time of every suggestion
+    word = words.random_word(category, rng)
+    guessed = set()
+    wrong = 0
+    while wrong < MAX_WRONG_GUESSES:
+        mask = ''.join(letter if letter in guessed else '_' for letter in word)
+        if '_' not in mask:
+            return True
+        start = time.perf_counter()
+        letter = ai.best_letter(category, mask, guessed)
+        timings.append(time.perf_counter() - start)
+        guessed.add(letter)
+        if letter not in word:
+            wrong += 1
+    return False
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+def run(words, category, games, seed, label):
+    ai = solver.Solver(words)
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    if solver.np is not None:
+        for length in words.lengths(category):
+            ai.index(category, length)
+    indexed = time.perf_counter() - start
+    timings = []
+    won = sum(play(words, ai, category, rng, timings) for _ in range(games))
+    timings.sort()
+    print(f"{label:<8} {indexed * 1000:>11.1f} {len(timings):>8} {sum(timings) / len(timings) * 1e6:>9.1f} "
+          f"{percentile(timings, 0.5) * 1e6:>8.1f} {percentile(timings, 0.99) * 1e6:>8.1f} "
+          f"{timings[-1] * 1e6:>8.1f} {won / games:>7.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time solver suggestions on a large category")
+    parser.add_argument('--words', type=int, default=1_000_000)
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--python-words', type=int, default=20_000,
+                        help="category size for the pure Python fallback, which is too slow for --words")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.dict')
+        with open(path, 'wb') as out:
+            write_dictionary(out, {'Big': generate_words(args.words, rng),
+                                   'Small': generate_words(args.python_words, rng)})
+        words = WordDictionary.open(path)
+
+        print(f"{'solver':<8} {'index ms':>11} {'calls':>8} {'mean us':>9} {'p50 us':>8} {'p99 us':>8} "
+              f"{'max us':>8} {'won':>7}")
+        if solver.np is not None:
+            run(words, 'Big', args.games, args.seed, "numpy")
+            run(words, 'Small', args.games, args.seed, "numpy")
+        numpy = solver.np
+        solver.np = None
+        try:
+            run(words, 'Small', args.games, args.seed, "python")
+        finally:
+            solver.np = numpy
+        print(f"Big: {words.count('Big')} words, Small: {words.count('Small')} words")
+
+if __name__ == "__main__":
+    main()
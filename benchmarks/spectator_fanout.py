@@ -0,0 +1,189 @@
+import argparse
+import os
+import random
+import selectors
+import socket
+import string
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from network import NetworkClient
+from protocol import HEADER, encode_frame
+
+HOST = '127.0.0.1'
+PORT = 65440
+CATEGORIES = ["Animals", "Countries", "Fruits", "Sports"]
+
+class Spectator:
+    # A raw JSON connection; the stalled ones set a tiny receive buffer and never read
+    def __init__(self, port, stalled):
+        self.sock = socket.socket()
+        if stalled:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+        self.sock.connect((HOST, port))
+        self.sock.setblocking(False)
+        self.stalled = stalled
+        self.buffer = bytearray()
+        self.frames = 0
+        self.arrived = 0.0
+
+    def watch(self, old_code, lobby_code):
+        frames = [{'action': 'spectate', 'lobby_code': lobby_code}]
+        if old_code is not None:
+            frames.insert(0, {'action': 'unsubscribe', 'lobby_code': old_code})
+        try:
+            self.sock.send(b''.join(encode_frame(frame) for frame in frames))
+        except OSError:
+            # Stalled spectators end up dropped by the server
+            pass
+        return len(frames)
+
+    def read(self):
+        data = self.sock.recv(65536)
+        self.buffer += data
+        while len(self.buffer) >= HEADER.size:
+            (length,) = HEADER.unpack_from(self.buffer)
+            if len(self.buffer) < HEADER.size + length:
+                break
+            del self.buffer[:HEADER.size + length]
+            self.frames += 1
+            self.arrived = time.perf_counter()
+        return data
+
+def wait_frames(selector, spectators, count):
+    # Reads until every spectator has `count` more frames; returns their arrival times
+    targets = {spectator: spectator.frames + count for spectator in spectators}
+    waiting = set(spectators)
+    while waiting:
+        events = selector.select(10)
+        if not events:
+            raise RuntimeError(f"{len(waiting)} spectators got no update")
+        for key, _ in events:
+            spectator = key.data
+            if not spectator.read():
+                raise RuntimeError("Server closed a spectator connection")
+            if spectator in waiting and spectator.frames >= targets[spectator]:
+                waiting.discard(spectator)
+    return [spectator.arrived for spectator in spectators]
+
+def start_server(mode, port, send_buffer):
+    command = [sys.executable, os.path.join(ROOT, "server.py"), "--mode", mode, "--port", str(port),
+               "--log-level", "WARNING"]
+    if send_buffer:
+        command += ["--send-buffer", str(send_buffer)]
+    proc = subprocess.Popen(command, cwd=ROOT)
+    for _ in range(100):
+        try:
+            socket.create_connection((HOST, port)).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("Server did not start")
+
+def play_game(host, guest, rng, on_guess=None):
+    # A fresh lobby played to the end; returns its code and the guess round trips
+    lobby_code = host.send({'action': 'create_lobby', 'name': 'host'})['lobby_code']
+    guest.send({'action': 'join_lobby', 'lobby_code': lobby_code, 'name': 'guest'})
+    if on_guess is not None:
+        on_guess(lobby_code, None)
+    host.send({'action': 'set_category', 'lobby_code': lobby_code, 'category': rng.choice(CATEGORIES)})
+    if on_guess is not None:
+        on_guess(lobby_code, None)
+    players = {'host': host, 'guest': guest}
+    current = 'host'
+    timings = []
+    for letter in rng.sample(string.ascii_uppercase, 26):
+        start = time.perf_counter()
+        response = players[current].send({'action': 'guess', 'lobby_code': lobby_code, 'letter': letter})
+        timings.append(time.perf_counter() - start)
+        if on_guess is not None:
+            on_guess(lobby_code, start)
+        state = response['game_state']
+        if state['game_over']:
+            break
+        current = state['current_player_name']
+    return lobby_code, timings
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))] if samples else 0.0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure pushing one lobby's updates to many spectators")
+    parser.add_argument('--mode', choices=['threaded', 'asyncio'], default='asyncio')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--spectators', type=int, default=10_000)
+    parser.add_argument('--stalled', type=int, default=20, help="spectators that never read")
+    parser.add_argument('--games', type=int, default=20, help="games, each in a new lobby the spectators move to")
+    parser.add_argument('--send-buffer', type=int, default=16 * 1024,
+                        help="server.py's limit; below its default so stalled spectators reach it within a run")
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    proc = start_server(args.mode, args.port, args.send_buffer)
+    try:
+        rng = random.Random(args.seed)
+        host = NetworkClient(HOST, args.port)
+        guest = NetworkClient(HOST, args.port)
+        _, baseline = play_game(host, guest, rng)
+
+        spectators = [Spectator(args.port, i < args.stalled) for i in range(args.spectators)]
+        readers = [spectator for spectator in spectators if not spectator.stalled]
+        selector = selectors.DefaultSelector()
+        for spectator in readers:
+            selector.register(spectator.sock, selectors.EVENT_READ, spectator)
+
+        timings = []
+        delivery = []
+        last_delivery = []
+        previous = None
+
+        def on_guess(lobby_code, start):
+            nonlocal previous
+            if start is None:
+                # Lobby created (or started): move every spectator to it, or take the update
+                if previous != lobby_code:
+                    counts = [spectator.watch(previous, lobby_code) for spectator in spectators]
+                    previous = lobby_code
+                    wait_frames(selector, readers, counts[-1])
+                else:
+                    wait_frames(selector, readers, 1)
+                return
+            arrivals = wait_frames(selector, readers, 1)
+            delivery.extend(arrived - start for arrived in arrivals)
+            last_delivery.append(max(arrivals) - start)
+
+        start = time.perf_counter()
+        for _ in range(args.games):
+            _, game_timings = play_game(host, guest, rng, on_guess)
+            timings.extend(game_timings)
+        elapsed = time.perf_counter() - start
+        metrics = host.send({'action': 'stats'})['metrics']
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    print(f"{args.spectators} spectators ({args.stalled} stalled) on one lobby, {args.mode} server, "
+          f"{args.games} games in {elapsed:.1f}s")
+    print(f"{'':<34} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    rows = [
+        ("guess round trip, no spectators", baseline),
+        ("guess round trip, with spectators", timings),
+        ("update reaching a spectator", delivery),
+        ("update reaching every spectator", last_delivery)
+    ]
+    for label, samples in rows:
+        print(f"{label:<34} {percentile(samples, 0.5) * 1e3:>8.1f} {percentile(samples, 0.99) * 1e3:>8.1f} "
+              f"{max(samples) * 1e3:>8.1f}")
+    # Stalled spectators that stop being read never reach the next lobby, so most are held back rather than dropped
+    print(f"updates pushed: {len(last_delivery)}, stalled spectators dropped: {metrics['connections_dropped']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from codec import CODECS
+from protocol import apply_game_delta, diff_game_state
+from server import GameSession, Server
+
+def per_call_us(function, calls, rounds=5):
+    # Best of a few rounds, as the slower ones mostly measure other work on the machine
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls // rounds):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return best / (calls // rounds) * 1e6
+
+def sample_messages():
+    # A lobby part way through a game, and the messages a client sees most often in one
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        server = Server()
+        lobby_code = server.process_message({'action': 'create_lobby', 'name': 'host'}, 1)['lobby_code']
+        server.process_message({'action': 'join_lobby', 'lobby_code': lobby_code, 'name': 'guest'}, 2)
+        server.process_message({'action': 'set_category', 'lobby_code': lobby_code, 'category': 'Animals'}, 1)
+        state_request = {'action': 'get_game_state', 'lobby_code': lobby_code, 'id': 41}
+        base = server.process_message(state_request, 1)['game_state']
+        players = [1, 2]
+        for turn, letter in enumerate('EAR'):
+            server.process_message({'action': 'guess', 'lobby_code': lobby_code, 'letter': letter}, players[turn % 2])
+        state = server.process_message(state_request, 1)
+    state['id'] = 41
+    update = {
+        'event': 'lobby_update', 'lobby_code': lobby_code,
+        'lobby': {'player_count': 2, 'players': ['host', 'guest'], 'ready_to_start': True, 'game_started': True},
+        'game_delta': diff_game_state(base, state['game_state'])
+    }
+    guess = {'action': 'guess', 'lobby_code': lobby_code, 'letter': 'S', 'id': 42}
+    return [("get_game_state reply", state), ("lobby_update push", update), ("guess request", guess)]
+
+def check_deltas():
+    # A client applying every delta must end up with the server's state, through guesses
+    # and through restarts that clear them, with a word of the same length and another
+    game = GameSession(1)
+    game.add_player(1, 'host')
+    game.add_player(2, 'guest')
+    client = None
+    for word, letters in (('TIGER', 'EAQR'), ('HORSE', 'SZ'), ('ZEBRA', 'B')):
+        game.start_game('Animals', word)
+        for letter in [None, *letters]:
+            if letter is not None:
+                game.play(letter)
+            state = game.get_game_state()
+            delta = game.get_state_delta(client['version']) if client is not None else None
+            client = apply_game_delta(client, delta) if delta is not None else dict(state)
+            assert client == state, (client, state)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare message size and encode/decode cost of the wire formats")
+    parser.add_argument('--calls', type=int, default=100_000)
+    args = parser.parse_args()
+    check_deltas()
+
+    print(f"{'message':<22} {'format':<7} {'bytes':>6} {'encode us':>10} {'decode us':>10}")
+    for label, message in sample_messages():
+        for name, codec in CODECS.items():
+            payload = codec.encode(message)
+            encode = per_call_us(lambda: codec.encode(message), args.calls)
+            decode = per_call_us(lambda: codec.decode(payload), args.calls)
+            print(f"{label:<22} {name:<7} {len(payload):>6} {encode:>10.2f} {decode:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dictionary import read_words, write_dictionary
+
+# Opens a word list one way, then picks random words. Reports open time, pick time and
+# memory growth: all of it after opening, then split into private (anonymous) memory and
+# page cache mapped from the file after the picks
+CHILD = """
+import os
+import random
+import sys
+import time
+sys.path.insert(0, {root!r})
+
+def rss_kb():
+    values = {{}}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(('RssAnon:', 'RssFile:')):
+                key, value = line.split()[:2]
+                values[key] = int(value)
+    return values['RssAnon:'], values['RssFile:']
+
+kind, path, category, picks = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+before = rss_kb()
+start = time.perf_counter()
+if kind == 'lists':
+    with open(path) as f:
+        words = {{category: [line.strip().upper() for line in f]}}
+    pick = lambda: random.choice(words[category])
+else:
+    from dictionary import WordDictionary
+    words = WordDictionary.open(path)
+    pick = lambda: words.random_word(category)
+opened = time.perf_counter() - start
+after_open = rss_kb()
+start = time.perf_counter()
+for _ in range(picks):
+    pick()
+per_pick = (time.perf_counter() - start) / picks
+after_picks = rss_kb()
+print(opened, per_pick, sum(after_open) - sum(before), after_picks[0] - before[0], after_picks[1] - before[1])
+"""
+
+def generate(path, count, seed):
+    rng = random.Random(seed)
+    letters = string.ascii_lowercase
+    with open(path, 'w') as f:
+        for _ in range(count):
+            f.write(''.join(rng.choices(letters, k=rng.randint(4, 14))))
+            f.write('\n')
+
+def drop_cache(path):
+    # Evicts the file from the page cache so the next open reads from disk
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+def measure(kind, path, category, picks):
+    drop_cache(path)
+    output = subprocess.run([sys.executable, '-c', CHILD.format(root=ROOT), kind, path, category, str(picks)],
+                            stdout=subprocess.PIPE, text=True, check=True).stdout
+    opened, per_pick, *memory = output.split()
+    return (float(opened), float(per_pick), *map(int, memory))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare plain word lists with the memory-mapped dictionary")
+    parser.add_argument('--words', type=int, default=5_000_000)
+    parser.add_argument('--picks', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        text_path = os.path.join(directory, 'Huge.txt')
+        dict_path = os.path.join(directory, 'huge.dict')
+        generate(text_path, args.words, args.seed)
+        start = time.perf_counter()
+        with open(dict_path, 'wb') as out:
+            write_dictionary(out, {'Huge': read_words(text_path)})
+        built = time.perf_counter() - start
+
+        print(f"{args.words} words: text {os.path.getsize(text_path) / 1e6:.1f} MB, "
+              f"dictionary {os.path.getsize(dict_path) / 1e6:.1f} MB, built in {built:.1f}s")
+        print(f"{'format':<12} {'cold open ms':>13} {'pick us':>8} {'open RSS MB':>12} "
+              f"{'private MB':>11} {'file cache MB':>14}")
+        for kind, path in (('lists', text_path), ('dictionary', dict_path)):
+            opened, per_pick, open_rss, private, cached = measure(kind, path, 'Huge', args.picks)
+            print(f"{kind:<12} {opened * 1000:>13.1f} {per_pick * 1e6:>8.2f} {open_rss / 1024:>12.1f} "
+                  f"{private / 1024:>11.1f} {cached / 1024:>14.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,81 +1,28 @@
 import pygame
 import sys
-import random
-import string
-import socket
-import json
-import threading
+from assets import assets
 from singleplayer import *
+from network import NetworkClient
+from render import View, wake
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
-
-# Set up display
-WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Multiplayer Hangman")
-
-# Colors
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-GRAY = (200, 200, 200)
-RED = (255, 0, 0)
-GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 
-# Fonts
-font = pygame.font.Font(None, 36)
-large_font = pygame.font.Font(None, 48)
-
-# Load hangman images
-hangman_images = [pygame.image.load(f"hangman{i}.png") for i in range(7)]
-
-# Load sounds
-correct_sound = pygame.mixer.Sound("correct.wav")
-wrong_sound = pygame.mixer.Sound("wrong.wav")
-win_sound = pygame.mixer.Sound("win.wav")
-lose_sound = pygame.mixer.Sound("lose.wav")
-
-# Network setup
-HOST = '127.0.0.1'
-PORT = 65432
-
-class Button:
-    def __init__(self, x, y, width, height, text, color, text_color):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.text = text
-        self.color = color
-        self.text_color = text_color
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, self.color, self.rect)
-        text_surface = font.render(self.text, True, self.text_color)
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        surface.blit(text_surface, text_rect)
-
-    def is_clicked(self, pos):
-        return self.rect.collidepoint(pos)
-
-class NetworkClient:
-    def __init__(self):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.connect((HOST, PORT))
-
-    def send(self, data):
-        self.socket.sendall(json.dumps(data).encode())
-        return json.loads(self.socket.recv(1024).decode())
-
+# Connects on the first request, from the network thread
 client = NetworkClient()
+# Replies and pushed updates wake an idle screen so it redraws straight away
+client.notify = wake
 
 def main_menu():
     play_button = Button(300, 150, 200, 50, "Play", WHITE, BLACK)
     create_lobby_button = Button(300, 225, 200, 50, "Create Lobby", WHITE, BLACK)
     join_lobby_button = Button(300, 300, 200, 50, "Join Lobby", WHITE, BLACK)
-    exit_button = Button(300, 375, 200, 50, "Exit", WHITE, BLACK)
+    watch_lobby_button = Button(300, 375, 200, 50, "Watch Lobby", WHITE, BLACK)
+    quick_match_button = Button(300, 450, 200, 50, "Quick Match", WHITE, BLACK)
+    exit_button = Button(300, 525, 200, 50, "Exit", WHITE, BLACK)
+    view = View(screen, BLACK)
 
     while True:
-        for event in pygame.event.get():
+        for event in view.events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -86,86 +33,95 @@ def main_menu():
                     create_lobby()
                 elif join_lobby_button.is_clicked(event.pos):
                     join_lobby()
+                elif watch_lobby_button.is_clicked(event.pos):
+                    watch_lobby()
+                elif quick_match_button.is_clicked(event.pos):
+                    quick_match()
                 elif exit_button.is_clicked(event.pos):
                     pygame.quit()
                     sys.exit()
 
-        screen.fill(BLACK)
-        play_button.draw(screen)
-        create_lobby_button.draw(screen)
-        join_lobby_button.draw(screen)
-        exit_button.draw(screen)
-        pygame.display.flip()
+        if client.error is not None:
+            view.text("error", font, "Cannot reach the server", RED, (260, 90))
+        view.button(play_button)
+        view.button(create_lobby_button)
+        view.button(join_lobby_button)
+        view.button(watch_lobby_button)
+        view.button(quick_match_button)
+        view.button(exit_button)
+        view.present()
 
 def play_single_player():
     category = choose_category()
-    word = random.choice(word_categories[category])
+    word = words.random_word(category)
     guessed_letters = set()
     wrong_guesses = 0
+    hint_letter = None
 
-    keyboard = create_keyboard()
+    keyboard = Keyboard()
+    hint_button = Button(650, 20, 120, 40, "Hint", GRAY, BLACK)
+    view = View(screen, WHITE)
 
     while True:
-        for event in pygame.event.get():
+        for event in view.events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
-                for key in keyboard:
-                    if key.is_clicked(event.pos) and key.text not in guessed_letters:
-                        letter = key.text
-                        guessed_letters.add(letter)
-                        if letter not in word:
-                            wrong_guesses += 1
-                            wrong_sound.play()
-                        else:
-                            correct_sound.play()
-
-        screen.fill(WHITE)
-        
+                if hint_button.is_clicked(event.pos):
+                    hint_letter = hint(words, category, word, guessed_letters)
+                letter = keyboard.letter_at(event.pos)
+                if letter is not None and letter not in guessed_letters:
+                    guessed_letters.add(letter)
+                    hint_letter = None
+                    if letter not in word:
+                        wrong_guesses += 1
+                        assets.play("wrong.wav")
+                    else:
+                        assets.play("correct.wav")
+
         # Draw hangman
-        screen.blit(hangman_images[min(wrong_guesses, MAX_WRONG_GUESSES)], (50, 50))
+        view.image("hangman", assets.hangman(wrong_guesses), (50, 50))
 
         # Draw word
-        word_surface = large_font.render(" ".join(letter if letter in guessed_letters else "_" for letter in word), True, BLACK)
-        screen.blit(word_surface, (300, 300))
+        view.text("word", large_font, " ".join(letter if letter in guessed_letters else "_" for letter in word), BLACK, (300, 300))
 
         # Draw keyboard
-        for key in keyboard:
-            if key.text in guessed_letters:
-                key.color = GRAY
-            key.draw(screen)
+        keyboard.update(guessed_letters)
+        view.item("keyboard", keyboard.guessed, keyboard.rect, keyboard.draw)
 
         # Draw category
-        category_surface = font.render(f"Category: {category}", True, BLACK)
-        screen.blit(category_surface, (50, 20))
+        view.text("category", font, f"Category: {category}", BLACK, (50, 20))
+
+        view.button(hint_button)
+        if hint_letter is not None:
+            view.text("hint", font, f"Hint: {hint_letter}", BLACK, (650, 70))
 
         # Check win/lose conditions
         if all(letter in guessed_letters for letter in word):
-            win_surface = large_font.render("You Win!", True, GREEN)
-            screen.blit(win_surface, (300, 200))
-            win_sound.play()
-            pygame.display.flip()
+            view.text("result", large_font, "You Win!", GREEN, (300, 200))
+            assets.play("win.wav")
+            view.present()
             pygame.time.wait(3000)
             break
         elif wrong_guesses >= MAX_WRONG_GUESSES:
-            lose_surface = large_font.render(f"You Lose! The word was {word}", True, RED)
-            screen.blit(lose_surface, (200, 200))
-            lose_sound.play()
-            pygame.display.flip()
+            view.text("result", large_font, f"You Lose! The word was {word}", RED, (200, 200))
+            assets.play("lose.wav")
+            view.present()
             pygame.time.wait(3000)
             break
 
-        pygame.display.flip()
+        view.present()
 
 def choose_category():
-    categories = list(word_categories.keys())
+    categories = words.names()
     buttons = []
     for i, category in enumerate(categories):
         buttons.append(Button(300, 150 + i * 75, 200, 50, category, WHITE, BLACK))
+    view = View(screen, BLACK)
 
     while True:
-        for event in pygame.event.get():
+        for event in view.events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -174,195 +130,260 @@ def choose_category():
                     if button.is_clicked(event.pos):
                         return button.text
 
-        screen.fill(BLACK)
         for button in buttons:
-            button.draw(screen)
-        pygame.display.flip()
+            view.button(button)
+        view.present()
 
 def create_lobby():
     player_name = get_player_name()
-    response = client.send({'action': 'create_lobby', 'name': player_name})
-    if response['status'] == 'success':
-        lobby_code = response['lobby_code']
-        host_waiting_room(lobby_code, player_name)
+    host_waiting_room(client.request({'action': 'create_lobby', 'name': player_name}), player_name)
 
-def host_waiting_room(lobby_code, player_name):
-    clock = pygame.time.Clock()
+def host_waiting_room(create_request, player_name):
     start_button = Button(300, 400, 200, 50, "Start Game", WHITE, BLACK)
+    computer_button = Button(300, 470, 200, 50, "Add Computer", WHITE, BLACK)
+    lobby_code = None
+    start_request = None
+    view = View(screen, BLACK)
 
     while True:
-        for event in pygame.event.get():
+        for event in view.events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
-                if start_button.is_clicked(event.pos):
-                    response = client.send({'action': 'start_game', 'lobby_code': lobby_code})
-                    if response['status'] == 'success':
-                        category = choose_category()
-                        client.send({'action': 'set_category', 'lobby_code': lobby_code, 'category': category})
-                        play_multiplayer_game(lobby_code, player_name)
-                        return
-
-        response = client.send({'action': 'check_lobby_status', 'lobby_code': lobby_code})
-        if response['status'] == 'success':
-            player_count = response['player_count']
-            players = response['players']
-
-            screen.fill(BLACK)
-            code_surface = large_font.render(f"Lobby Code: {lobby_code}", True, WHITE)
-            screen.blit(code_surface, (250, 100))
-            count_surface = font.render(f"Players: {player_count}", True, WHITE)
-            screen.blit(count_surface, (350, 150))
+                if lobby_code is not None and start_request is None and start_button.is_clicked(event.pos):
+                    start_request = client.request({'action': 'start_game', 'lobby_code': lobby_code})
+                elif lobby_code is not None and computer_button.is_clicked(event.pos):
+                    client.request({'action': 'add_computer', 'lobby_code': lobby_code})
+
+        # Requests complete in the background; each frame only checks whether they are done
+        if lobby_code is None and create_request.done():
+            # The server may not be reachable; the connection is only opened by this request
+            if create_request.exception() is not None or create_request.result()['status'] != 'success':
+                return
+            response = create_request.result()
+            lobby_code = response['lobby_code']
+            client.subscribe(lobby_code)
+
+        if start_request is not None and start_request.done():
+            if start_request.exception() is None and start_request.result()['status'] == 'success':
+                category = choose_category()
+                client.request({'action': 'set_category', 'lobby_code': lobby_code, 'category': category})
+                play_multiplayer_game(lobby_code, player_name)
+                return
+            start_request = None
+
+        if lobby_code is not None and client.is_closed(lobby_code):
+            return
+        try:
+            update = client.poll(lobby_code) if lobby_code is not None else None
+        except ConnectionError:
+            # The client has given up reconnecting; the menu says so
+            return
+
+        if update is None:
+            view.text("creating", font, "Creating lobby...", WHITE, (300, 250))
+        else:
+            player_count = update['lobby']['player_count']
+            players = update['lobby']['players']
+
+            view.text("code", large_font, f"Lobby Code: {lobby_code}", WHITE, (250, 100))
+            view.text("count", font, f"Players: {player_count}", WHITE, (350, 150))
 
             for i, player in enumerate(players):
-                player_surface = font.render(player, True, WHITE)
-                screen.blit(player_surface, (350, 200 + i * 30))
+                view.text(("player", i), font, player, WHITE, (350, 200 + i * 30))
 
             if player_count >= 2:
-                start_button.draw(screen)
+                view.button(start_button)
             else:
-                waiting_surface = font.render("Waiting for more players...", True, WHITE)
-                screen.blit(waiting_surface, (250, 400))
+                view.text("waiting", font, "Waiting for more players...", WHITE, (250, 400))
+            view.button(computer_button)
 
-        pygame.display.flip()
-        clock.tick(30)
+        view.present()
 
 def join_lobby():
-    lobby_code = ""
     player_name = get_player_name()
+    lobby_code = enter_lobby_code(
+        lambda lobby_code: client.request({'action': 'join_lobby', 'lobby_code': lobby_code, 'name': player_name}))
+    player_waiting_room(lobby_code, player_name)
+
+def watch_lobby():
+    # Spectators see the same screens as players, without a name or a turn
+    lobby_code = enter_lobby_code(client.spectate)
+    player_waiting_room(lobby_code, None)
+
+def quick_match():
+    # The server seats matched players and starts the game, so this goes straight to it
+    player_name = get_player_name()
+    category = choose_category()
+    match = client.quick_match(category, player_name)
+    cancel_button = Button(300, 400, 200, 50, "Cancel", WHITE, BLACK)
+    view = View(screen, BLACK)
+
+    while True:
+        for event in view.events():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.MOUSEBUTTONDOWN and cancel_button.is_clicked(event.pos):
+                client.leave_queue()
+
+        if match.done():
+            if match.exception() is None and match.result()['status'] == 'success':
+                play_multiplayer_game(match.result()['lobby_code'], player_name)
+            return
+
+        view.text("waiting", font, f"Looking for players ({category})...", WHITE, (230, 250))
+        view.button(cancel_button)
+        view.present()
+
+def enter_lobby_code(send_request):
+    # Returns the entered code once the request made with it succeeds
+    lobby_code = ""
+    lobby_request = None
+    view = View(screen, BLACK)
     
     while True:
-        for event in pygame.event.get():
+        for event in view.events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
-            if event.type == pygame.KEYDOWN:
+            if event.type == pygame.KEYDOWN and lobby_request is None:
                 if event.key == pygame.K_RETURN and len(lobby_code) == 6:
-                    response = client.send({'action': 'join_lobby', 'lobby_code': lobby_code, 'name': player_name})
-                    if response['status'] == 'success':
-                        player_waiting_room(lobby_code, player_name)
-                        return
-                    else:
-                        lobby_code = ""
+                    lobby_request = send_request(lobby_code)
                 elif event.key == pygame.K_BACKSPACE:
                     lobby_code = lobby_code[:-1]
                 elif event.unicode.isalnum() and len(lobby_code) < 6:
                     lobby_code += event.unicode.upper()
 
-        screen.fill(BLACK)
-        prompt_surface = font.render("Enter Lobby Code:", True, WHITE)
-        screen.blit(prompt_surface, (300, 250))
-        code_surface = large_font.render(lobby_code, True, WHITE)
-        screen.blit(code_surface, (350, 300))
-        pygame.display.flip()
+        if lobby_request is not None and lobby_request.done():
+            if lobby_request.exception() is None and lobby_request.result()['status'] == 'success':
+                return lobby_code
+            lobby_code = ""
+            lobby_request = None
+
+        view.text("prompt", font, "Joining..." if lobby_request else "Enter Lobby Code:", WHITE, (300, 250))
+        view.text("code", large_font, lobby_code, WHITE, (350, 300))
+        view.present()
 
 def player_waiting_room(lobby_code, player_name):
-    clock = pygame.time.Clock()
+    client.subscribe(lobby_code)
+    view = View(screen, BLACK)
 
     while True:
-        for event in pygame.event.get():
+        for event in view.events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
 
-        response = client.send({'action': 'check_lobby_status', 'lobby_code': lobby_code})
-        if response['status'] == 'success':
-            if response['game_started']:
-                play_multiplayer_game(lobby_code, player_name)
-                return
+        if client.is_closed(lobby_code):
+            return
+        try:
+            update = client.poll(lobby_code)
+        except ConnectionError:
+            # The client has given up reconnecting; the menu says so
+            return
+        if update is not None and update['lobby']['game_started']:
+            play_multiplayer_game(lobby_code, player_name)
+            return
+
+        view.text("code", large_font, f"Lobby Code: {lobby_code}", WHITE, (250, 100))
 
-            screen.fill(BLACK)
-            code_surface = large_font.render(f"Lobby Code: {lobby_code}", True, WHITE)
-            screen.blit(code_surface, (250, 100))
-            count_surface = font.render(f"Players: {response['player_count']}", True, WHITE)
-            screen.blit(count_surface, (350, 150))
+        if update is not None:
+            lobby = update['lobby']
+            view.text("count", font, f"Players: {lobby['player_count']}", WHITE, (350, 150))
 
-            for i, player in enumerate(response['players']):
-                player_surface = font.render(player, True, WHITE)
-                screen.blit(player_surface, (350, 200 + i * 30))
+            for i, player in enumerate(lobby['players']):
+                view.text(("player", i), font, player, WHITE, (350, 200 + i * 30))
+            if lobby.get('spectators'):
+                view.text("spectators", font, f"Spectators: {lobby['spectators']}", WHITE, (550, 150))
 
-            waiting_surface = font.render("Waiting for host to start the game...", True, WHITE)
-            screen.blit(waiting_surface, (200, 400))
+        view.text("waiting", font, "Waiting for host to start the game...", WHITE, (200, 400))
 
-        pygame.display.flip()
-        clock.tick(30)
+        view.present()
 
 def play_multiplayer_game(lobby_code, player_name):
-    keyboard = create_keyboard()
+    keyboard = Keyboard()
+    client.subscribe(lobby_code)
+    guess_request = None
+    guessed_letter = None
+    view = View(screen, WHITE)
     
     while True:
-        response = client.send({'action': 'get_game_state', 'lobby_code': lobby_code})
-        game_state = response['game_state']
+        events = view.events()
+        # Render from the last state the server pushed; no request is made per frame
+        if client.is_closed(lobby_code):
+            return
+        try:
+            update = client.poll(lobby_code)
+        except ConnectionError:
+            # The client has given up reconnecting; the menu says so
+            return
+        game_state = update['game_state'] if update is not None else None
         
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if game_state['current_player_name'] == player_name:
-                    for key in keyboard:
-                        if key.is_clicked(event.pos) and key.text not in game_state['guessed_letters']:
-                            response = client.send({'action': 'guess', 'lobby_code': lobby_code, 'letter': key.text})
-                            if response['status'] == 'success':
-                                game_state = response['game_state']
-                                if key.text in game_state['word']:
-                                    correct_sound.play()
-                                else:
-                                    wrong_sound.play()
-
-        screen.fill(WHITE)
+            if event.type == pygame.MOUSEBUTTONDOWN and game_state is not None and guess_request is None:
+                letter = keyboard.letter_at(event.pos)
+                if player_name is not None and game_state['current_player_name'] == player_name \
+                        and letter is not None and letter not in game_state['guessed_letters']:
+                    guess_request = client.request({'action': 'guess', 'lobby_code': lobby_code, 'letter': letter})
+                    guessed_letter = letter
+
+        if guess_request is not None and guess_request.done():
+            # A guess cut off by a reconnect fails; the player can simply guess again
+            if guess_request.exception() is None and guess_request.result()['status'] == 'success':
+                game_state = guess_request.result()['game_state']
+                if guessed_letter in game_state['word']:
+                    assets.play("correct.wav")
+                else:
+                    assets.play("wrong.wav")
+            guess_request = None
+
+        if game_state is None:
+            # The game has not reached this client yet
+            view.present()
+            continue
         
         # Draw hangman
-        screen.blit(hangman_images[min(game_state['wrong_guesses'], len(hangman_images) - 1)], (50, 50))
+        view.image("hangman", assets.hangman(game_state['wrong_guesses']), (50, 50))
 
         # Draw word
-        word_surface = large_font.render(" ".join(game_state['word']), True, BLACK)
-        screen.blit(word_surface, (300, 300))
+        view.text("word", large_font, " ".join(game_state['word']), BLACK, (300, 300))
 
         # Draw keyboard
-        for key in keyboard:
-            if key.text in game_state['guessed_letters']:
-                key.color = GRAY
-            else:
-                key.color = WHITE
-            key.draw(screen)
+        keyboard.update(game_state['guessed_letters'])
+        view.item("keyboard", keyboard.guessed, keyboard.rect, keyboard.draw)
 
         # Draw current player and category
-        current_player_surface = font.render(f"Current player: {game_state['current_player_name']}", True, BLUE)
-        screen.blit(current_player_surface, (50, 20))
-        category_surface = font.render(f"Category: {game_state['category']}", True, BLACK)
-        screen.blit(category_surface, (50, 60))
+        view.text("current_player", font, f"Current player: {game_state['current_player_name']}", BLUE, (50, 20))
+        view.text("category", font, f"Category: {game_state['category']}", BLACK, (50, 60))
+        if player_name is None:
+            view.text("spectating", font, "Spectating", GRAY, (650, 20))
 
         # Draw game over message
         if game_state['game_over']:
             if game_state['winner']:
-                win_surface = large_font.render(f"{game_state['winner']} Wins!", True, GREEN)
-                screen.blit(win_surface, (300, 200))
-                win_sound.play()
+                view.text("result", large_font, f"{game_state['winner']} Wins!", GREEN, (300, 200))
+                assets.play("win.wav")
             else:
-                lose_surface = large_font.render("Game Over! No one guessed the word.", True, RED)
-                screen.blit(lose_surface, (200, 200))
-                lose_sound.play()
+                view.text("result", large_font, "Game Over! No one guessed the word.", RED, (200, 200))
+                assets.play("lose.wav")
 
-        pygame.display.flip()
+        view.present()
 
         if game_state['game_over']:
             pygame.time.wait(3000)
+            client.unsubscribe(lobby_code)
             break
 
-def create_keyboard():
-    keyboard = []
-    for i, letter in enumerate(string.ascii_uppercase):
-        x = 100 + (i % 13) * 50
-        y = 400 + (i // 13) * 50
-        keyboard.append(Button(x, y, 40, 40, letter, WHITE, BLACK))
-    return keyboard
-
 def get_player_name():
     name = ""
+    view = View(screen, BLACK)
     while True:
-        for event in pygame.event.get():
+        for event in view.events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -374,12 +395,11 @@ def get_player_name():
                 elif event.unicode.isalnum() and len(name) < 15:
                     name += event.unicode
 
-        screen.fill(BLACK)
-        prompt_surface = font.render("Enter your name:", True, WHITE)
-        screen.blit(prompt_surface, (300, 250))
-        name_surface = large_font.render(name, True, WHITE)
-        screen.blit(name_surface, (300, 300))
-        pygame.display.flip()
+        view.text("prompt", font, "Enter your name:", WHITE, (300, 250))
+        view.text("name", large_font, name, WHITE, (300, 300))
+        view.present()
 
 if __name__ == "__main__":
+    words = load_words(parse_args().words)
+    screen = assets.open_display("Multiplayer Hangman")
     main_menu()
@@ -0,0 +1,322 @@
+import json
+import struct
+
+# Names offered in the hello handshake, in order of preference
+JSON_FORMAT = 'json'
+BINARY_FORMAT = 'binary'
+
+# Value tags of the binary format
+NONE, TRUE, FALSE, INT, FLOAT, STR, LIST, DICT, ENUM, LETTERS, GAME_STATE, REVEALED = range(12)
+
+# Dict keys are sent as their index + 1 in this table (0 is followed by the key itself).
+# Both tables are part of the format: new entries go at the end, nothing is ever removed.
+KEYS = (
+    'action', 'lobby_code', 'name', 'category', 'letter', 'since', 'id', 'status', 'message', 'event',
+    'lobby', 'game_state', 'game_delta', 'version', 'word', 'guessed_letters', 'wrong_guesses',
+    'current_player', 'game_over', 'winner', 'current_player_name', 'base_version', 'revealed',
+    'new_letters', 'player_count', 'players', 'ready_to_start', 'game_started', 'update', 'unchanged',
+    'formats', 'format', 'lobbies', 'metrics', 'spectators', 'session', 'resumed', 'sessions',
+    'retry_after', 'requests', 'results', 'player', 'queued', 'matchmaking'
+)
+# Values of these keys are sent as their index in the key's table
+ENUMS = {
+    'action': ('hello', 'create_lobby', 'join_lobby', 'check_lobby_status', 'start_game', 'set_category',
+               'guess', 'get_game_state', 'subscribe', 'unsubscribe', 'stats', 'add_computer', 'spectate',
+               'batch', 'quick_match', 'leave_queue'),
+    'status': ('success', 'error'),
+    'event': ('lobby_update', 'lobby_closed', 'session_taken', 'match_found')
+}
+KEY_IDS = {key: i + 1 for i, key in enumerate(KEYS)}
+ENUM_IDS = {key: {value: i for i, value in enumerate(values)} for key, values in ENUMS.items()}
+LETTER_KEYS = {'guessed_letters', 'new_letters'}
+GAME_STATE_KEYS = {'word', 'guessed_letters', 'wrong_guesses', 'current_player', 'game_over', 'winner',
+                   'category', 'current_player_name', 'version'}
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+LETTER_BITS = {letter: 1 << i for i, letter in enumerate(ALPHABET)}
+
+FLOAT_FORMAT = struct.Struct('!d')
+MASK_FORMAT = struct.Struct('!I')
+# version, guessed-letter mask, wrong guesses, current player, game over
+GAME_STATE_FORMAT = struct.Struct('!IIBB?')
+
+class JsonCodec:
+    name = JSON_FORMAT
+
+    def encode(self, message):
+        return json.dumps(message, separators=(',', ':')).encode()
+
+    def decode(self, payload):
+        return json.loads(payload)
+
+    def add_id(self, payload, request_id):
+        # payload is an encoded dict without an id; the id goes first
+        encoded = b'{"id":' + json.dumps(request_id).encode()
+        return encoded + (b',' + payload[1:] if len(payload) > 2 else b'}')
+
+def put_varint(out, value):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+def get_varint(data, position):
+    value = data[position]
+    if value < 0x80:
+        return value, position + 1
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+def put_str(out, value):
+    encoded = value.encode()
+    put_varint(out, len(encoded))
+    out += encoded
+
+def get_str(data, position):
+    length, position = get_varint(data, position)
+    return str(data[position:position + length], 'utf-8'), position + length
+
+def put_optional_str(out, value):
+    # Length + 1, so 0 can stand for None
+    if value is None:
+        out.append(0)
+    else:
+        encoded = value.encode()
+        put_varint(out, len(encoded) + 1)
+        out += encoded
+
+def get_optional_str(data, position):
+    length, position = get_varint(data, position)
+    if not length:
+        return None, position
+    return str(data[position:position + length - 1], 'utf-8'), position + length - 1
+
+def letters_mask(letters):
+    # None unless every item is a single letter, in which case order is not kept (it is alphabetical)
+    mask = 0
+    for letter in letters:
+        bit = LETTER_BITS.get(letter)
+        if bit is None:
+            return None
+        mask |= bit
+    return mask if len(letters) == bin(mask).count('1') else None
+
+def mask_letters(mask):
+    letters = []
+    while mask:
+        lowest = mask & -mask
+        letters.append(ALPHABET[lowest.bit_length() - 1])
+        mask ^= lowest
+    return letters
+
+def put_value(out, value, key=None):
+    # key is the dict key the value belongs to; it selects the compact forms.
+    # Types are tested from most to least common, small values written in place.
+    kind = type(value)
+    if kind is str:
+        enum = ENUM_IDS.get(key)
+        if enum is not None and value in enum:
+            out.append(ENUM)
+            out.append(enum[value])
+        else:
+            out.append(STR)
+            put_str(out, value)
+    elif kind is int:
+        out.append(INT)
+        value = value << 1 if value >= 0 else (-value << 1) - 1
+        if value < 0x80:
+            out.append(value)
+        else:
+            put_varint(out, value)
+    elif kind is dict:
+        if key == 'game_state' and value.keys() == GAME_STATE_KEYS and put_game_state(out, value):
+            return
+        if key == 'revealed' and put_revealed(out, value):
+            return
+        out.append(DICT)
+        put_varint(out, len(value))
+        for item_key, item in value.items():
+            key_id = KEY_IDS.get(item_key)
+            if key_id is None:
+                out.append(0)
+                put_str(out, item_key)
+            elif key_id < 0x80:
+                out.append(key_id)
+            else:
+                put_varint(out, key_id)
+            put_value(out, item, item_key)
+    elif value is True:
+        out.append(TRUE)
+    elif value is False:
+        out.append(FALSE)
+    elif value is None:
+        out.append(NONE)
+    elif kind is list:
+        mask = letters_mask(value) if key in LETTER_KEYS else None
+        if mask is not None:
+            out.append(LETTERS)
+            out += MASK_FORMAT.pack(mask)
+            return
+        out.append(LIST)
+        put_varint(out, len(value))
+        for item in value:
+            put_value(out, item)
+    elif kind is float:
+        out.append(FLOAT)
+        out += FLOAT_FORMAT.pack(value)
+    else:
+        raise TypeError(f"Cannot encode {kind.__name__}")
+
+def put_revealed(out, revealed):
+    # Position and letter as one byte each; False unless every pair fits
+    pairs = bytearray()
+    for position, letter in revealed.items():
+        if letter not in LETTER_BITS or not (position.isascii() and position.isdigit()) or int(position) > 255:
+            return False
+        pairs.append(int(position))
+        pairs.append(ord(letter))
+    if len(revealed) > 255:
+        return False
+    out.append(REVEALED)
+    out.append(len(revealed))
+    out += pairs
+    return True
+
+def put_game_state(out, state):
+    # The fixed fields in one struct; False if the state does not fit it
+    mask = letters_mask(state['guessed_letters'])
+    if mask is None or not 0 <= state['wrong_guesses'] < 256 or not 0 <= state['current_player'] < 256:
+        return False
+    out.append(GAME_STATE)
+    out += GAME_STATE_FORMAT.pack(state['version'], mask, state['wrong_guesses'], state['current_player'],
+                                  state['game_over'])
+    put_str(out, state['word'])
+    put_optional_str(out, state['category'])
+    put_optional_str(out, state['winner'])
+    put_optional_str(out, state['current_player_name'])
+    return True
+
+def get_value(data, position, key=None):
+    # Tags are tested roughly from most to least common
+    tag = data[position]
+    position += 1
+    if tag == DICT:
+        count, position = get_varint(data, position)
+        value = {}
+        for _ in range(count):
+            key_id = data[position]
+            if 0 < key_id < 0x80:
+                item_key = KEYS[key_id - 1]
+                position += 1
+            elif key_id:
+                key_id, position = get_varint(data, position)
+                item_key = KEYS[key_id - 1]
+            else:
+                item_key, position = get_str(data, position + 1)
+            # Small scalars are read here, saving a call per field
+            tag = data[position]
+            if tag == ENUM:
+                value[item_key] = ENUMS[item_key][data[position + 1]]
+                position += 2
+            elif tag == INT and data[position + 1] < 0x80:
+                small = data[position + 1]
+                value[item_key] = (small >> 1) ^ -(small & 1)
+                position += 2
+            elif tag == TRUE:
+                value[item_key] = True
+                position += 1
+            elif tag == FALSE:
+                value[item_key] = False
+                position += 1
+            else:
+                value[item_key], position = get_value(data, position, item_key)
+        return value, position
+    if tag == ENUM:
+        return ENUMS[key][data[position]], position + 1
+    if tag == STR:
+        return get_str(data, position)
+    if tag == INT:
+        value, position = get_varint(data, position)
+        return (value >> 1) ^ -(value & 1), position
+    if tag == NONE:
+        return None, position
+    if tag == TRUE:
+        return True, position
+    if tag == FALSE:
+        return False, position
+    if tag == GAME_STATE:
+        version, mask, wrong_guesses, current_player, game_over = GAME_STATE_FORMAT.unpack_from(data, position)
+        position += GAME_STATE_FORMAT.size
+        word, position = get_str(data, position)
+        category, position = get_optional_str(data, position)
+        winner, position = get_optional_str(data, position)
+        current_player_name, position = get_optional_str(data, position)
+        return {
+            'word': word,
+            'guessed_letters': mask_letters(mask),
+            'wrong_guesses': wrong_guesses,
+            'current_player': current_player,
+            'game_over': game_over,
+            'winner': winner,
+            'category': category,
+            'current_player_name': current_player_name,
+            'version': version
+        }, position
+    if tag == LETTERS:
+        (mask,) = MASK_FORMAT.unpack_from(data, position)
+        return mask_letters(mask), position + MASK_FORMAT.size
+    if tag == REVEALED:
+        end = position + 1 + 2 * data[position]
+        return {str(data[i]): chr(data[i + 1]) for i in range(position + 1, end, 2)}, end
+    if tag == LIST:
+        count, position = get_varint(data, position)
+        value = []
+        for _ in range(count):
+            if data[position] == STR and data[position + 1] < 0x80:
+                end = position + 2 + data[position + 1]
+                value.append(str(data[position + 2:end], 'utf-8'))
+                position = end
+            else:
+                item, position = get_value(data, position)
+                value.append(item)
+        return value, position
+    if tag == FLOAT:
+        return FLOAT_FORMAT.unpack_from(data, position)[0], position + FLOAT_FORMAT.size
+    raise ValueError(f"Unknown tag {tag}")
+
+class BinaryCodec:
+    # Tagged binary values. Known dict keys and action, status and event names travel as
+    # small integers, guessed letters as a 26-bit mask and game states as fixed fields
+    # followed by the masked word and the few strings.
+    name = BINARY_FORMAT
+
+    def encode(self, message):
+        out = bytearray()
+        put_value(out, message)
+        return bytes(out)
+
+    def decode(self, payload):
+        value, position = get_value(payload, 0)
+        if position != len(payload):
+            raise ValueError("Trailing bytes after message")
+        return value
+
+    def add_id(self, payload, request_id):
+        # payload is an encoded dict without an id: its count goes up by one and the id
+        # is put in front of the other fields
+        count, position = get_varint(payload, 1)
+        out = bytearray((DICT,))
+        put_varint(out, count + 1)
+        out.append(KEY_IDS['id'])
+        put_value(out, request_id, 'id')
+        out += payload[position:]
+        return bytes(out)
+
+JSON = JsonCodec()
+BINARY = BinaryCodec()
+CODECS = {codec.name: codec for codec in (BINARY, JSON)}
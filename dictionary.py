@@ -0,0 +1,201 @@
+import argparse
+import bisect
+import io
+import mmap
+import os
+import random
+import shutil
+import struct
+import tempfile
+
+MAGIC = b'HMWD'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('!4sHH')
+CATEGORY = struct.Struct('!HH')
+BUCKET = struct.Struct('!HIQ')
+MAX_WORD_LENGTH = 64
+
+DEFAULT_WORDS = {
+    "Animals": ["ELEPHANT", "GIRAFFE", "PENGUIN", "TIGER", "DOLPHIN"],
+    "Countries": ["BRAZIL", "JAPAN", "AUSTRALIA", "FRANCE", "CANADA"],
+    "Fruits": ["APPLE", "BANANA", "ORANGE", "STRAWBERRY", "PINEAPPLE"],
+    "Sports": ["FOOTBALL", "TENNIS", "BASKETBALL", "SWIMMING", "VOLLEYBALL"]
+}
+
+class WordDictionary:
+    # Word lists stored as fixed-width records, grouped by category and then by word
+    # length. Opening parses only the small index; words are read straight out of the
+    # (usually memory-mapped) buffer, so a list never has to fit in memory and picking a
+    # word costs one bisect over the handful of lengths plus one slice.
+    #
+    # Layout: header (magic, version, category count), then per category its name and a
+    # (length, count, offset) entry per length bucket, then the bucket data. Offsets are
+    # from the start of the file.
+    def __init__(self, buffer):
+        self.buffer = buffer
+        magic, version, category_count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a word dictionary file")
+        self.categories = {}
+        position = HEADER.size
+        for _ in range(category_count):
+            name_length, bucket_count = CATEGORY.unpack_from(buffer, position)
+            position += CATEGORY.size
+            name = bytes(buffer[position:position + name_length]).decode()
+            position += name_length
+            buckets = [BUCKET.unpack_from(buffer, position + i * BUCKET.size) for i in range(bucket_count)]
+            position += bucket_count * BUCKET.size
+            # ends[i] is the number of words in buckets 0..i, for picking by overall index
+            ends = []
+            total = 0
+            for _, count, _ in buckets:
+                total += count
+                ends.append(total)
+            self.categories[name] = (buckets, ends)
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_lists(cls, categories):
+        return cls(build(categories))
+
+    def __contains__(self, category):
+        return category in self.categories
+
+    def names(self):
+        return list(self.categories)
+
+    def count(self, category, length=None):
+        if category not in self.categories:
+            return 0
+        buckets, ends = self.categories[category]
+        if length is None:
+            return ends[-1] if ends else 0
+        for word_length, count, _ in buckets:
+            if word_length == length:
+                return count
+        return 0
+
+    def lengths(self, category):
+        buckets, _ = self.categories.get(category, ((), ()))
+        return [length for length, _, _ in buckets]
+
+    def words_of_length(self, category, length):
+        # The raw bucket: count * length bytes of concatenated words, without copying
+        for word_length, count, offset in self.categories.get(category, ((), ()))[0]:
+            if word_length == length:
+                return memoryview(self.buffer)[offset:offset + count * length]
+        return memoryview(b'')
+
+    def word(self, category, index):
+        buckets, ends = self.categories[category]
+        bucket = bisect.bisect_right(ends, index)
+        length, count, offset = buckets[bucket]
+        start = offset + (index - (ends[bucket] - count)) * length
+        return bytes(self.buffer[start:start + length]).decode('ascii')
+
+    def random_index(self, category, rng=random):
+        # The same index names the same word for as long as the file is unchanged
+        return rng.randrange(self.count(category))
+
+    def random_word(self, category, rng=random, length=None):
+        if length is None:
+            return self.word(category, self.random_index(category, rng))
+        buckets, _ = self.categories[category]
+        for word_length, count, offset in buckets:
+            if word_length == length:
+                start = offset + rng.randrange(count) * length
+                return bytes(self.buffer[start:start + length]).decode('ascii')
+        raise KeyError(f"No {length}-letter words in {category}")
+
+def normalize(word):
+    word = word.strip().upper()
+    if 0 < len(word) <= MAX_WORD_LENGTH and word.isascii() and word.isalpha():
+        return word
+    return None
+
+def index_size(names, bucket_counts):
+    size = HEADER.size
+    for name, bucket_count in zip(names, bucket_counts):
+        size += CATEGORY.size + len(name.encode()) + bucket_count * BUCKET.size
+    return size
+
+def write_dictionary(out, categories, spill=tempfile.TemporaryFile):
+    # categories maps a name to an iterable of words. Words are spilled to one temporary
+    # file per (category, length) so a list of any size is written in bounded memory.
+    names = list(categories)
+    spilled = []
+    try:
+        for name in names:
+            buckets = {}
+            for word in categories[name]:
+                word = normalize(word)
+                if word is None:
+                    continue
+                bucket = buckets.get(len(word))
+                if bucket is None:
+                    bucket = buckets[len(word)] = [spill(), 0]
+                bucket[0].write(word.encode('ascii'))
+                bucket[1] += 1
+            spilled.append(sorted(buckets.items()))
+
+        offset = index_size(names, [len(buckets) for buckets in spilled])
+        out.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(names)))
+        for name, buckets in zip(names, spilled):
+            encoded = name.encode()
+            out.write(CATEGORY.pack(len(encoded), len(buckets)))
+            out.write(encoded)
+            for length, (_, count) in buckets:
+                out.write(BUCKET.pack(length, count, offset))
+                offset += length * count
+        for buckets in spilled:
+            for _, (f, _) in buckets:
+                f.seek(0)
+                shutil.copyfileobj(f, out)
+    finally:
+        for buckets in spilled:
+            for _, (f, _) in buckets:
+                f.close()
+
+def build(categories):
+    # For lists small enough to hold in memory, such as the built-in ones
+    out = io.BytesIO()
+    write_dictionary(out, categories, spill=io.BytesIO)
+    return out.getvalue()
+
+def read_words(path):
+    with open(path, encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            yield line
+
+def load(path=None):
+    # The built-in lists unless a dictionary file is given
+    if path is None:
+        return WordDictionary.from_lists(DEFAULT_WORDS)
+    return WordDictionary.open(path)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build a word dictionary file from plain word lists")
+    parser.add_argument('output', help="dictionary file to write")
+    parser.add_argument('lists', nargs='+', metavar='LIST',
+                        help="text file with one word per line; the category is the file name "
+                             "(Animals.txt -> Animals), or give it as CATEGORY=PATH")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    sources = {}
+    for spec in args.lists:
+        name, _, path = spec.partition('=') if '=' in spec else ('', '', spec)
+        sources[name or os.path.splitext(os.path.basename(path))[0]] = read_words(path)
+    with open(args.output, 'wb') as out:
+        write_dictionary(out, sources)
+    words = WordDictionary.open(args.output)
+    for name in words.names():
+        print(f"{name}: {words.count(name)} words")
+
+if __name__ == "__main__":
+    main()
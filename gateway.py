@@ -0,0 +1,382 @@
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+from collections import deque
+
+from codec import CODECS, JSON, JSON_FORMAT
+from protocol import (HEADER, MAX_BATCH_SIZE, MAX_SEND_BUFFER, SOCKET_SEND_BUFFER, FrameReader, encode_frame,
+                      within_send_buffer)
+from registry import lobby_owner
+from server import configure_logging
+from sessions import RESUME_TIMEOUT, Sessions
+
+HOST = '127.0.0.1'
+PORT = 65432
+WORKER_START_TIMEOUT = 10.0
+# Routed by category, so each category's queue is on one worker; leave_queue names it too
+MATCHMAKING_ACTIONS = {'quick_match', 'leave_queue'}
+
+log = logging.getLogger('hangman.gateway')
+
+class Upstream(asyncio.Protocol):
+    # One connection from a client's gateway session to one worker. Keeping it for the
+    # whole session means the worker sees a stable player identity for that client.
+    def __init__(self, session, worker):
+        self.session = session
+        self.worker = worker
+        self.transport = None
+        self.backlog = []
+        self.reader = FrameReader()
+        # The worker's replies to hellos sent on the client's behalf are not passed on;
+        # this holds the format each will arrive in
+        self.hello_codecs = deque()
+        # Frames sent while a hello is unanswered wait for its reply. The worker writes pushes
+        # as soon as they happen, so one caused by a request sent behind the hello (a batch
+        # that completes a match) could otherwise arrive before the hello reply.
+        self.held = []
+        self.codec = JSON
+        # Gateway request id -> (batch, indexes) for the parts of client batches sent here
+        self.batches = {}
+
+    def hello(self, codec):
+        # Sent in the format the worker is using, which it switches from after replying.
+        # The worker's own session token for this client lets it resume the client's seats.
+        message = {'action': 'hello', 'formats': [codec.name]}
+        token = self.session.worker_tokens.get(self.worker)
+        if token is not None:
+            message['session'] = token
+        self.hello_codecs.append(self.codec)
+        self.write(encode_frame(message, self.codec))
+        self.codec = codec
+
+    def send_batch(self, batch, indexes, requests):
+        request_id = f"gateway:{next(self.session.gateway.batch_ids)}"
+        self.batches[request_id] = (batch, indexes)
+        self.send(encode_frame({'action': 'batch', 'requests': requests, 'id': request_id}, self.codec))
+
+    def batch_reply(self, frame):
+        # True if the frame answers part of a batch; frames are only decoded while one is out
+        message = self.codec.decode(frame[HEADER.size:])
+        request_id = message.get('id')
+        if not isinstance(request_id, str) or request_id not in self.batches:
+            return False
+        batch, indexes = self.batches.pop(request_id)
+        batch.part_done(indexes, message)
+        return True
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if self.backlog:
+            transport.write(b''.join(self.backlog))
+            self.backlog = None
+
+    def send(self, frame):
+        if self.hello_codecs:
+            self.held.append(frame)
+        else:
+            self.write(frame)
+
+    def write(self, frame):
+        if self.transport is None:
+            self.backlog.append(frame)
+        else:
+            self.transport.write(frame)
+
+    def data_received(self, data):
+        # Worker frames are passed through undecoded; they are only split on frame
+        # boundaries so replies from several workers never interleave mid-frame
+        self.reader.feed(data)
+        frames = list(self.reader.frames())
+        while frames and self.hello_codecs:
+            reply = self.hello_codecs.popleft().decode(frames.pop(0)[HEADER.size:])
+            if reply.get('session') is not None:
+                self.session.worker_tokens[self.worker] = reply['session']
+            if not self.hello_codecs and self.held:
+                self.write(b''.join(self.held))
+                self.held = []
+        if self.batches:
+            frames = [frame for frame in frames if not self.batch_reply(frame)]
+        if frames:
+            self.session.write(b''.join(frames))
+
+    def connection_lost(self, exc):
+        self.session.close()
+
+class Batch:
+    # A client's batch, split by worker; answered once every part is back
+    def __init__(self, session, request_id, size, parts):
+        self.session = session
+        self.request_id = request_id
+        self.results = [None] * size
+        self.waiting = parts
+
+    def part_done(self, indexes, reply):
+        if reply.get('status') == 'success':
+            for index, result in zip(indexes, reply['results']):
+                self.results[index] = result
+        else:
+            # The worker refused the whole part, for instance over its rate limit
+            reply.pop('id', None)
+            for index in indexes:
+                self.results[index] = reply
+        self.waiting -= 1
+        if not self.waiting:
+            self.session.reply({'status': 'success', 'results': self.results}, self.request_id)
+
+class GatewaySession(asyncio.Protocol):
+    def __init__(self, gateway):
+        self.gateway = gateway
+        self.transport = None
+        self.reader = FrameReader()
+        self.upstreams = {}
+        # Set by the hello handshake; worker_tokens is shared with any later session
+        # that resumes this one
+        self.player_id = None
+        self.worker_tokens = {}
+        # Room over MAX_SEND_BUFFER taken by a large reply, see protocol.within_send_buffer
+        self.reply_room = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_SEND_BUFFER)
+
+    def data_received(self, data):
+        try:
+            self.reader.feed(data)
+            while True:
+                span = self.reader.next_span()
+                if span is None:
+                    break
+                start, payload_start, end = span
+                message = self.reader.codec.decode(self.reader.buffer[payload_start:end])
+                if message.get('action') == 'hello':
+                    self.hello(message)
+                    continue
+                if message.get('action') == 'batch':
+                    self.batch(message)
+                    continue
+                frame = self.reader.buffer[start:end]
+                self.upstream(self.gateway.route(message)).send(frame)
+        except Exception as e:
+            log.warning("Error routing client request: %s", e)
+            self.close()
+
+    def hello(self, message):
+        # The gateway answers the handshake itself and has every worker connection of this
+        # session switch too, so frames keep passing through without re-encoding
+        name = next((name for name in message.get('formats', ()) if name in CODECS), JSON_FORMAT)
+        token, resumed = self.gateway.start_session(self, message.get('session'))
+        reply = {'status': 'success', 'format': name, 'session': token, 'resumed': resumed}
+        if 'id' in message:
+            reply['id'] = message['id']
+        self.write(encode_frame(reply, self.reader.codec))
+        self.reader.codec = CODECS[name]
+        for upstream in self.upstreams.values():
+            upstream.hello(self.reader.codec)
+
+    def batch(self, message):
+        # A batch can span lobbies on several workers: each gets the requests for its own
+        # lobbies as a batch of their own, and the results are put back in order
+        requests = message.get('requests')
+        if not isinstance(requests, list) or len(requests) > MAX_BATCH_SIZE:
+            self.reply({'status': 'error', 'message': f'A batch holds a list of up to {MAX_BATCH_SIZE} requests'},
+                       message.get('id'))
+            return
+        parts = {}
+        for index, request in enumerate(requests):
+            worker = self.gateway.route(request) if isinstance(request, dict) else 0
+            parts.setdefault(worker, []).append(index)
+        if not parts:
+            self.reply({'status': 'success', 'results': []}, message.get('id'))
+            return
+        batch = Batch(self, message.get('id'), len(requests), len(parts))
+        for worker, indexes in parts.items():
+            self.upstream(worker).send_batch(batch, indexes, [requests[index] for index in indexes])
+
+    def reply(self, response, request_id):
+        if request_id is not None:
+            response['id'] = request_id
+        self.write(encode_frame(response, self.reader.codec), reply=True)
+
+    def upstream(self, worker):
+        upstream = self.upstreams.get(worker)
+        if upstream is None:
+            upstream = Upstream(self, worker)
+            if self.player_id is not None:
+                upstream.hello(self.reader.codec)
+            self.upstreams[worker] = upstream
+            host, port = self.gateway.workers[worker]
+            loop = asyncio.get_running_loop()
+            task = loop.create_task(loop.create_connection(lambda: upstream, host, port))
+            task.add_done_callback(self.upstream_connected)
+        return upstream
+
+    def upstream_connected(self, task):
+        if task.cancelled() or task.exception() is not None:
+            self.write(encode_frame({'status': 'error', 'message': 'Game server unavailable'}, self.reader.codec))
+            self.close()
+
+    def write(self, data, reply=False):
+        if self.transport is not None and not self.transport.is_closing():
+            # A client this far behind would otherwise buffer every push its workers send
+            buffered = self.transport.get_write_buffer_size()
+            if not buffered:
+                self.reply_room = 0
+            if not within_send_buffer(self, MAX_SEND_BUFFER, buffered, len(data), reply):
+                log.info("Dropping slow client %s", self.transport.get_extra_info('peername'))
+                self.transport.abort()
+                return
+            self.transport.write(data)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        # Closing the worker connections lets each worker run its normal disconnect handling
+        for upstream in self.upstreams.values():
+            if upstream.transport is not None:
+                upstream.transport.close()
+        self.upstreams.clear()
+        if self.player_id is not None:
+            self.gateway.end_session(self)
+
+class Gateway:
+    def __init__(self, workers):
+        self.workers = workers
+        self.next_worker = itertools.cycle(range(len(workers)))
+        # Clients get a gateway token standing for the tokens each worker issued them.
+        # The mapping outlives a dropped client for as long as the workers keep its seats.
+        self.sessions = Sessions()
+        self.worker_tokens = {}
+        self.batch_ids = itertools.count(1)
+        # player id -> the client session that holds it, or last held it
+        self.owners = {}
+
+    def start_session(self, session, token):
+        # Returns (token, whether an earlier session was resumed)
+        player_id = self.sessions.player(token) if token is not None else None
+        resumed = player_id in self.worker_tokens
+        if not resumed:
+            player_id = self.sessions.new_player()
+        previous = self.owners.get(player_id)
+        self.owners[player_id] = session
+        if previous is not None and previous is not session:
+            previous.write(encode_frame({'event': 'session_taken'}, previous.reader.codec))
+            previous.close()
+        session.player_id = player_id
+        session.worker_tokens = self.worker_tokens.setdefault(player_id, {})
+        return self.sessions.token(player_id), resumed
+
+    def end_session(self, session):
+        if self.owners.get(session.player_id) is session:
+            asyncio.get_running_loop().call_later(RESUME_TIMEOUT, self.expire_session, session)
+
+    def expire_session(self, session):
+        if self.owners.get(session.player_id) is session:
+            del self.owners[session.player_id]
+            del self.worker_tokens[session.player_id]
+
+    def route(self, message):
+        # Everything about a lobby goes to the worker that owns its code; requests without
+        # a code (such as create_lobby) are spread round-robin and the chosen worker
+        # generates a code that routes back to itself
+        lobby_code = message.get('lobby_code')
+        if lobby_code:
+            return lobby_owner(lobby_code, len(self.workers))
+        if message.get('action') in MATCHMAKING_ACTIONS and isinstance(message.get('category'), str):
+            return lobby_owner(message['category'], len(self.workers))
+        return next(self.next_worker)
+
+    async def serve(self, host=HOST, port=PORT):
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: GatewaySession(self), host, port, backlog=1024)
+        log.info("Gateway listening on %s:%d, routing to %d workers", host, port, len(self.workers))
+        async with server:
+            await server.serve_forever()
+
+def spawn_workers(count, host, base_port, mode='asyncio', words=None, data_dir=None, replay_dir=None):
+    server_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py')
+    processes = []
+    for index in range(count):
+        command = [
+            sys.executable, server_script, '--mode', mode, '--host', host, '--port', str(base_port + index),
+            '--worker-index', str(index), '--worker-count', str(count)
+        ]
+        if words:
+            command += ['--words', words]
+        if data_dir:
+            command += ['--data-dir', os.path.join(data_dir, f"worker-{index}")]
+        if replay_dir:
+            command += ['--replay-dir', os.path.join(replay_dir, f"worker-{index}")]
+        processes.append(subprocess.Popen(command))
+    return processes, [(host, base_port + index) for index in range(count)]
+
+async def wait_for_workers(workers):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + WORKER_START_TIMEOUT
+    for host, port in workers:
+        while True:
+            try:
+                _, writer = await asyncio.open_connection(host, port)
+                writer.close()
+                break
+            except OSError:
+                if loop.time() > deadline:
+                    raise RuntimeError(f"Worker {host}:{port} did not start")
+                await asyncio.sleep(0.05)
+
+def parse_worker(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Route Hangman clients to several server workers by lobby code")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="number of local workers to spawn")
+    parser.add_argument('--worker-port', type=int, default=PORT + 1,
+                        help="port of the first local worker; the others use the following ports")
+    parser.add_argument('--worker-mode', choices=['threaded', 'asyncio'], default='asyncio')
+    parser.add_argument('--words', help="word dictionary file passed to spawned workers")
+    parser.add_argument('--data-dir', help="spawned workers keep their lobby logs and snapshots in "
+                                           "DATA_DIR/worker-<index>")
+    parser.add_argument('--replay-dir', help="spawned workers record their games in REPLAY_DIR/worker-<index>")
+    parser.add_argument('--connect', nargs='+', metavar='HOST:PORT',
+                        help="route to already running workers (e.g. on other nodes) instead of spawning them; "
+                             "worker i must be started with --worker-index i --worker-count N")
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    listener = configure_logging(args.log_level)
+    # Exiting through sys.exit on SIGTERM runs the finally below, which stops spawned workers
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    processes = []
+    try:
+        if args.connect:
+            workers = [parse_worker(address) for address in args.connect]
+        else:
+            processes, workers = spawn_workers(args.workers, HOST, args.worker_port, args.worker_mode, args.words,
+                                             args.data_dir, args.replay_dir)
+        asyncio.run(wait_for_workers(workers))
+        asyncio.run(Gateway(workers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        listener.stop()
+
+if __name__ == "__main__":
+    main()
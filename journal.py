@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import threading
+
+SYNC_INTERVAL = 0.01
+SNAPSHOT_INTERVAL = 60.0
+SEGMENT = ('wal-', '.log')
+SNAPSHOT = ('snapshot-', '.json')
+
+log = logging.getLogger('hangman.journal')
+
+def file_name(kind, number):
+    prefix, suffix = kind
+    return f"{prefix}{number:08d}{suffix}"
+
+def numbered(directory, kind):
+    # {number: path} for the files of one kind
+    prefix, suffix = kind
+    files = {}
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(suffix):
+            number = name[len(prefix):-len(suffix)]
+            if number.isdigit():
+                files[int(number)] = os.path.join(directory, name)
+    return files
+
+def read_lines(path):
+    # A crash can leave the last line half written; everything from there on is dropped
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
+
+def fsync_directory(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class Journal:
+    # Write-ahead log of lobby changes plus compact snapshots, kept in one directory.
+    #
+    # The log is split into numbered segments of JSON lines. Records are queued by the
+    # request that made the change and written and fsynced in batches by a background
+    # thread, so no request waits on the disk; a crash loses at most the last
+    # sync_interval of changes, and close() writes everything out.
+    #
+    # snapshot-N holds every lobby as it was after the log segments before N and possibly
+    # some of segment N, so recovery loads the newest snapshot and replays segment N on.
+    def __init__(self, directory, sync_interval=SYNC_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.pending = []
+        self.closed = False
+        # Held while writing so a segment switch never splits a batch
+        self.io_lock = threading.Lock()
+        self.file = None
+        self.segment = None
+        self.written = 0
+        self.thread = None
+
+    def load(self):
+        # (snapshot rows, log records) to recover from, both read lazily
+        snapshots = numbered(self.directory, SNAPSHOT)
+        start = max(snapshots, default=0)
+        rows = read_lines(snapshots[start]) if snapshots else iter(())
+        segments = numbered(self.directory, SEGMENT)
+        records = (record for number in sorted(segments) if number >= start for record in read_lines(segments[number]))
+        return rows, records
+
+    def open(self):
+        # Appends go to a new segment, never to one a crash may have cut short
+        segments = numbered(self.directory, SEGMENT)
+        snapshots = numbered(self.directory, SNAPSHOT)
+        self.switch(max([*segments, *snapshots], default=0) + 1)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def switch(self, segment):
+        if self.file is not None:
+            self.file.close()
+        self.segment = segment
+        self.file = open(os.path.join(self.directory, file_name(SEGMENT, segment)), 'a', encoding='utf-8')
+        fsync_directory(self.directory)
+
+    def append(self, record):
+        # Records hold only strings and numbers, so encoding them can wait for the writer thread
+        with self.lock:
+            self.pending.append(record)
+            if len(self.pending) == 1:
+                self.ready.notify()
+
+    def run(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.closed:
+                    self.ready.wait()
+                if self.closed:
+                    return
+                # Lets the records of concurrent requests gather into one write and fsync
+                self.ready.wait(self.sync_interval)
+            self.sync()
+
+    def sync(self):
+        with self.io_lock:
+            self.write_pending()
+
+    def write_pending(self):
+        # Called with io_lock held
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            self.file.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in batch))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.written += len(batch)
+        except OSError as e:
+            log.error("Error writing journal: %s", e)
+
+    def snapshot(self, lobbies):
+        # lobbies is called once the log has moved to a new segment and returns an
+        # iterable of rows; the rows are written out and older files removed
+        with self.io_lock:
+            self.write_pending()
+            segment = self.segment + 1
+            self.switch(segment)
+            self.written = 0
+        path = os.path.join(self.directory, file_name(SNAPSHOT, segment))
+        temporary = path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            for row in lobbies():
+                f.write(json.dumps(row, separators=(',', ':')))
+                f.write('\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        fsync_directory(self.directory)
+        for kind in (SEGMENT, SNAPSHOT):
+            for number, old in numbered(self.directory, kind).items():
+                if number < segment:
+                    os.remove(old)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.ready.notify()
+        if self.thread is not None:
+            self.thread.join()
+        self.sync()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,75 @@
+import heapq
+import time
+
+LOBBY_IDLE_TIMEOUT = 30 * 60
+GAME_OVER_GRACE = 30
+REAP_INTERVAL = 1.0
+
+class LobbyLifecycle:
+    def __init__(self, idle_timeout=LOBBY_IDLE_TIMEOUT, game_over_grace=GAME_OVER_GRACE, clock=time.monotonic):
+        self.idle_timeout = idle_timeout
+        self.game_over_grace = game_over_grace
+        self.clock = clock
+        self.deadlines = {}
+        self.finished = set()
+        # Min-heap of (deadline, lobby_code). Entries are not updated in place: a deadline that
+        # moves later is re-queued when its old entry comes due, one that moves earlier is pushed again
+        self.heap = []
+        self.created = 0
+        self.expired = 0
+        self.reclaimed = 0
+
+    def add(self, lobby_code):
+        self.created += 1
+        self.schedule(lobby_code, self.clock() + self.idle_timeout)
+
+    def touch(self, lobby_code):
+        if lobby_code in self.deadlines and lobby_code not in self.finished:
+            self.deadlines[lobby_code] = self.clock() + self.idle_timeout
+
+    def finish(self, lobby_code):
+        if lobby_code in self.deadlines and lobby_code not in self.finished:
+            self.finished.add(lobby_code)
+            self.schedule(lobby_code, self.clock() + self.game_over_grace)
+
+    def restart(self, lobby_code):
+        # A new game in a finished lobby gets the idle timeout again instead of the grace
+        if lobby_code in self.finished:
+            self.finished.discard(lobby_code)
+            self.schedule(lobby_code, self.clock() + self.idle_timeout)
+
+    def schedule(self, lobby_code, deadline):
+        previous = self.deadlines.get(lobby_code)
+        self.deadlines[lobby_code] = deadline
+        if previous is None or deadline < previous:
+            heapq.heappush(self.heap, (deadline, lobby_code))
+
+    def remove(self, lobby_code):
+        if self.deadlines.pop(lobby_code, None) is not None:
+            self.finished.discard(lobby_code)
+            self.reclaimed += 1
+
+    def due(self):
+        # Expired lobbies are forgotten here; the caller reclaims the returned codes
+        now = self.clock()
+        expired = []
+        while self.heap and self.heap[0][0] <= now:
+            _, lobby_code = heapq.heappop(self.heap)
+            deadline = self.deadlines.get(lobby_code)
+            if deadline is None:
+                continue
+            if deadline > now:
+                heapq.heappush(self.heap, (deadline, lobby_code))
+                continue
+            self.remove(lobby_code)
+            self.expired += 1
+            expired.append(lobby_code)
+        return expired
+
+    def counters(self):
+        return {
+            'live': len(self.deadlines),
+            'created': self.created,
+            'expired': self.expired,
+            'reclaimed': self.reclaimed
+        }
@@ -0,0 +1,94 @@
+import time
+
+# Requests per second and burst allowed on one connection. The reads a polling client
+# repeats, and the requests that create state, have tighter limits of their own.
+CONNECTION_RATE = 200.0
+CONNECTION_BURST = 400
+ACTION_LIMITS = {
+    'get_game_state': (50.0, 100),
+    'check_lobby_status': (50.0, 100),
+    'create_lobby': (5.0, 20),
+    'quick_match': (5.0, 20),
+    'add_computer': (5.0, 10),
+    'stats': (5.0, 10),
+    # A batch counts once against the connection. The requests in it count against their
+    # own limits, except that each kind of read counts once per batch.
+    'batch': (10.0, 20)
+}
+# Never limited, so a client can always finish the handshake
+UNLIMITED_ACTIONS = {'hello'}
+
+class TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        # 0.0 if a token was taken, otherwise the seconds until one will be there
+        tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if tokens >= 1:
+            self.tokens = tokens - 1
+            return 0.0
+        self.tokens = tokens
+        return (1 - tokens) / self.rate
+
+class RateLimiter:
+    # Token buckets for one connection: one for everything it sends, plus one per limited
+    # action, made the first time the connection sends that action. Only the connection's
+    # own thread or the event loop uses it, so there is no lock.
+    def __init__(self, rate=CONNECTION_RATE, burst=CONNECTION_BURST, actions=ACTION_LIMITS, clock=time.monotonic):
+        self.clock = clock
+        self.actions = actions
+        self.buckets = {}
+        self.connection = TokenBucket(rate, burst, clock())
+        # The latest retry time handed out, and until when the connection should not be read
+        self.retry_at = 0.0
+        self.paused_until = 0.0
+
+    def check(self, action):
+        # Seconds the client should wait before sending this again, or 0.0 to go ahead
+        if action in UNLIMITED_ACTIONS:
+            return 0.0
+        now = self.clock()
+        retry_after = self.check_action(action, now)
+        if retry_after:
+            return retry_after
+        wait = self.connection.take(now)
+        if wait:
+            return self.refuse(now, wait, self.connection)
+        return 0.0
+
+    def check_action(self, action, now=None):
+        # Like check, but only against the action's own bucket: a request inside a batch,
+        # whose batch has already been counted against the connection
+        limit = self.actions.get(action)
+        if limit is None:
+            return 0.0
+        if now is None:
+            now = self.clock()
+        bucket = self.buckets.get(action)
+        if bucket is None:
+            bucket = self.buckets[action] = TokenBucket(*limit, now)
+        wait = bucket.take(now)
+        if wait:
+            return self.refuse(now, wait, bucket)
+        return 0.0
+
+    def refuse(self, now, wait, bucket):
+        # Requests refused close together get retry times a token apart, so a client that
+        # keeps to them is not refused again all at once. Reading stops until the last of
+        # them, but no longer than the bucket takes to fill, or the retries that pile up in
+        # the meantime would not all fit in it.
+        self.retry_at = max(now + wait, self.retry_at + 1 / bucket.rate)
+        self.paused_until = min(self.retry_at, now + bucket.burst / bucket.rate)
+        return self.retry_at - now
+
+    def backoff(self):
+        # Seconds to stop reading the connection for. A client that ignores retry_after is
+        # then held back by TCP instead of costing a reply per request.
+        return max(0.0, self.paused_until - self.clock())
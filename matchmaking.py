@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import deque
+
+from metrics import Histogram
+
+# Players per matched lobby, and how long the first of them waits for the rest before
+# computer players take the empty seats
+MATCH_SIZE = 2
+MATCH_WAIT = 10.0
+
+class Ticket:
+    # A queued player: who they are, and where to seat and tell them once matched
+    __slots__ = ('player_id', 'name', 'category', 'seat', 'queued_at')
+
+    def __init__(self, player_id, name, category, seat):
+        self.player_id = player_id
+        self.name = name
+        self.category = category
+        self.seat = seat
+        self.queued_at = None
+
+class Matchmaker:
+    # Quick-play queues, one per category. Players are matched in the order they queued, a
+    # lobby's worth at a time, as soon as that many wait for the same category, so a queue
+    # never holds a full lobby. Nobody waits much longer than `wait`: then everyone queued
+    # for the category is matched, and computer players fill the lobby.
+    #
+    # Queuing and leaving are O(1). A player who leaves is only dropped from the lookup
+    # table; their entry is skipped when it reaches the front of the queue.
+    def __init__(self, size=MATCH_SIZE, wait=MATCH_WAIT, clock=time.monotonic):
+        self.size = size
+        self.wait = wait
+        self.clock = clock
+        self.lock = threading.Lock()
+        # category -> tickets in queue order, including those of players who left
+        self.queues = {}
+        # category -> players still queued for it; categories nobody waits for are removed
+        self.waiting = {}
+        # player id -> ticket, for players still queued
+        self.tickets = {}
+        # Time from queuing to being matched, in microseconds
+        self.waits = Histogram()
+        self.lobbies = 0
+        self.filled = 0
+        self.cancelled = 0
+
+    def enqueue(self, ticket):
+        # Returns the tickets of a full lobby if this one completes it, or None
+        now = self.clock()
+        with self.lock:
+            if ticket.player_id in self.tickets:
+                self.discard(ticket.player_id)
+            ticket.queued_at = now
+            category = ticket.category
+            queue = self.queues.get(category)
+            if queue is None:
+                queue = self.queues[category] = deque()
+            queue.append(ticket)
+            self.tickets[ticket.player_id] = ticket
+            self.waiting[category] = self.waiting.get(category, 0) + 1
+            if self.waiting[category] < self.size:
+                return None
+            return self.take(category, self.size, now)
+
+    def cancel(self, player_id):
+        # True if the player was queued
+        with self.lock:
+            if player_id not in self.tickets:
+                return False
+            self.discard(player_id)
+            self.cancelled += 1
+            return True
+
+    def discard(self, player_id):
+        # Called with self.lock held
+        category = self.tickets.pop(player_id).category
+        self.waiting[category] -= 1
+        if not self.waiting[category]:
+            # Whatever is left in the queue is players who left
+            del self.waiting[category]
+            del self.queues[category]
+
+    def take(self, category, count, now):
+        # Called with self.lock held: the first count players still queued for the category
+        queue = self.queues[category]
+        tickets = []
+        while len(tickets) < count:
+            ticket = queue.popleft()
+            if self.tickets.get(ticket.player_id) is not ticket:
+                continue
+            del self.tickets[ticket.player_id]
+            self.waits.record(int((now - ticket.queued_at) * 1e6))
+            tickets.append(ticket)
+        self.waiting[category] -= count
+        if not self.waiting[category]:
+            del self.waiting[category]
+            del self.queues[category]
+        self.lobbies += 1
+        return tickets
+
+    def due(self):
+        # Lobbies for the categories whose first player has waited `wait`: everyone queued
+        # for it, fewer than a lobby's worth
+        now = self.clock()
+        matches = []
+        with self.lock:
+            for category in list(self.waiting):
+                queue = self.queues[category]
+                while self.tickets.get(queue[0].player_id) is not queue[0]:
+                    queue.popleft()
+                if queue[0].queued_at + self.wait <= now:
+                    matches.append(self.take(category, self.waiting[category], now))
+                    self.filled += 1
+        return matches
+
+    def counters(self):
+        with self.lock:
+            return {
+                'queued': len(self.tickets),
+                'matched': self.waits.count,
+                'lobbies': self.lobbies,
+                'filled': self.filled,
+                'cancelled': self.cancelled
+            }
+
+    def wait_summary(self):
+        # Time from queuing to being matched, in milliseconds
+        with self.lock:
+            waits = self.waits.copy()
+        return waits.summary()
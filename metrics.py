@@ -0,0 +1,174 @@
+import threading
+import time
+
+# Histogram buckets split every power of two into 2**SUB_BUCKET_BITS equal steps, so a
+# recorded value is known to within 1/16 (about 6%) at any magnitude, HDR histogram style
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+PERCENTILES = (50, 90, 99, 99.9)
+
+def bucket_index(value):
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (value >> shift)
+
+def bucket_bounds(index):
+    # The (lowest, highest) value that lands in a bucket
+    if index < 2 * SUB_BUCKETS:
+        return index, index
+    shift = index // SUB_BUCKETS - 1
+    low = (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+    return low, low + (1 << shift) - 1
+
+class Histogram:
+    # Non-negative integer values (nanoseconds here) in log-linear buckets: fixed memory,
+    # O(1) recording, and percentiles with bounded relative error
+    def __init__(self):
+        self.counts = [0] * (SUB_BUCKETS * (65 - SUB_BUCKET_BITS))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        self.counts[bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def copy(self):
+        histogram = Histogram.__new__(Histogram)
+        histogram.counts = list(self.counts)
+        histogram.count, histogram.total, histogram.max = self.count, self.total, self.max
+        return histogram
+
+    def percentiles(self, percents):
+        # One pass for all of them, in increasing order. Each is reported as the highest
+        # value of its bucket, so it never understates.
+        ranks = [max(1, round(percent / 100 * self.count)) for percent in percents]
+        values = []
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while len(values) < len(ranks) and seen >= ranks[len(values)]:
+                values.append(min(bucket_bounds(index)[1], self.max))
+        return values + [0] * (len(ranks) - len(values))
+
+    def summary(self, scale=1000):
+        # Values divided by scale; nanoseconds become microseconds
+        result = {'count': self.count, 'mean': self.total / self.count / scale if self.count else 0.0}
+        for percent, value in zip(PERCENTILES, self.percentiles(PERCENTILES)):
+            result[f'p{percent:g}'] = value / scale
+        result['max'] = self.max / scale
+        return result
+
+class Metrics:
+    # Counters and per-action latency histograms for the server. Every update takes one
+    # short lock, as threaded mode records from many connection threads at once.
+    def __init__(self, clock=time.monotonic):
+        self.lock = threading.Lock()
+        self.clock = clock
+        self.started = clock()
+        self.latencies = {}
+        self.errors = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.connections = 0
+        self.connections_total = 0
+        self.connections_dropped = 0
+        self.requests_limited = 0
+        self.requests_coalesced = 0
+
+    def record(self, action, nanoseconds, ok):
+        with self.lock:
+            histogram = self.latencies.get(action)
+            if histogram is None:
+                histogram = self.latencies[action] = Histogram()
+            histogram.record(nanoseconds)
+            if not ok:
+                self.errors[action] = self.errors.get(action, 0) + 1
+
+    def received(self, size):
+        with self.lock:
+            self.bytes_in += size
+
+    def sent(self, size):
+        with self.lock:
+            self.bytes_out += size
+
+    def connected(self):
+        with self.lock:
+            self.connections += 1
+            self.connections_total += 1
+
+    def disconnected(self):
+        with self.lock:
+            self.connections -= 1
+
+    def dropped(self):
+        # A connection closed by the server for reading too slowly
+        with self.lock:
+            self.connections_dropped += 1
+
+    def limited(self):
+        # A request turned away by the connection's rate limit
+        with self.lock:
+            self.requests_limited += 1
+
+    def coalesced(self):
+        # A read answered with a reply already built for an identical one
+        with self.lock:
+            self.requests_coalesced += 1
+
+    def snapshot(self):
+        # Histograms are copied under the lock and summarized outside it
+        with self.lock:
+            snapshot = {
+                'uptime': self.clock() - self.started,
+                'connections': self.connections,
+                'connections_total': self.connections_total,
+                'connections_dropped': self.connections_dropped,
+                'requests_limited': self.requests_limited,
+                'requests_coalesced': self.requests_coalesced,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out
+            }
+            latencies = [(action, histogram.copy(), self.errors.get(action, 0))
+                         for action, histogram in sorted(self.latencies.items())]
+        snapshot['actions'] = {action: {**histogram.summary(), 'errors': errors}
+                               for action, histogram, errors in latencies}
+        return snapshot
+
+def prometheus_text(snapshot, lobbies, sessions, matchmaking, match_waits):
+    # The text exposition format, for scraping with Prometheus or reading with curl
+    lines = [
+        f"hangman_uptime_seconds {snapshot['uptime']:.3f}",
+        f"hangman_connections {snapshot['connections']}",
+        f"hangman_connections_total {snapshot['connections_total']}",
+        f"hangman_connections_dropped_total {snapshot['connections_dropped']}",
+        f"hangman_requests_limited_total {snapshot['requests_limited']}",
+        f"hangman_requests_coalesced_total {snapshot['requests_coalesced']}",
+        f"hangman_bytes_received_total {snapshot['bytes_in']}",
+        f"hangman_bytes_sent_total {snapshot['bytes_out']}"
+    ]
+    for name, value in sorted(lobbies.items()):
+        lines.append(f"hangman_lobbies_{name} {value}")
+    for name, value in sorted(sessions.items()):
+        lines.append(f"hangman_sessions_{name} {value}")
+    for name, value in sorted(matchmaking.items()):
+        lines.append(f"hangman_matchmaking_{name} {value}")
+    for percent in PERCENTILES:
+        lines.append(f'hangman_match_wait_seconds{{quantile="{percent / 100:g}"}} '
+                     f"{match_waits[f'p{percent:g}'] / 1e3:.6f}")
+    for action, summary in snapshot['actions'].items():
+        labels = f'action="{action}"'
+        for percent in PERCENTILES:
+            lines.append(f'hangman_request_seconds{{{labels},quantile="{percent / 100:g}"}} '
+                         f"{summary[f'p{percent:g}'] / 1e6:.9f}")
+        lines.append(f"hangman_request_seconds_count{{{labels}}} {summary['count']}")
+        lines.append(f"hangman_request_seconds_sum{{{labels}}} {summary['mean'] * summary['count'] / 1e6:.9f}")
+        lines.append(f"hangman_request_errors_total{{{labels}}} {summary['errors']}")
+    return '\n'.join(lines) + '\n'
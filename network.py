@@ -0,0 +1,425 @@
+import heapq
+import queue
+import random
+import socket
+import threading
+import time
+from concurrent.futures import Future
+
+from codec import BINARY_FORMAT, CODECS, JSON, JSON_FORMAT
+from protocol import MessageStream, apply_game_delta
+
+HOST = '127.0.0.1'
+PORT = 65432
+REQUEST_TIMEOUT = 10.0
+CONNECT_TIMEOUT = 5.0
+# Reconnect attempts back off exponentially, with jitter, for about as long as the
+# server keeps a dropped player's seats
+RECONNECT_DELAY = 0.1
+RECONNECT_MAX_DELAY = 5.0
+RECONNECT_TIMEOUT = 30.0
+
+class NetworkClient:
+    # All socket I/O runs on two background threads: one writes queued requests, the other
+    # reads replies and pushed updates. The UI thread only queues requests and reads the
+    # latest known state, so a slow network never stalls a frame. Nothing connects until
+    # the first request, and the connection is opened by the writer thread.
+    #
+    # The server issues a session token in its hello reply. If the connection drops, the
+    # writer thread reconnects with the token and the server hands back the same player
+    # and seats; subscriptions are renewed and queued requests sent on the new connection.
+    # Requests that were already written fail, as the server may or may not have run them.
+    #
+    # A request the server turns away with retry_after was not run, and the writer sends
+    # it again once that time has passed, so callers only see it take longer. Requests
+    # queued behind it may overtake it.
+    def __init__(self, host=HOST, port=PORT, formats=(BINARY_FORMAT, JSON_FORMAT)):
+        self.host = host
+        self.port = port
+        # Wire formats to offer the server, most preferred first
+        self.formats = formats
+        self.socket = None
+        self.stream = None
+        self.started = False
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.pending = {}
+        self.lobby_updates = {}
+        self.stale_lobbies = set()
+        self.closed_lobbies = set()
+        # lobby code -> the action that subscribed to it, renewed after a reconnect
+        self.subscriptions = {}
+        # (category, name, future) while waiting for a quick match; queued again after a reconnect
+        self.match = None
+        self.session = None
+        # Requests written on the current connection and not answered yet, by id
+        self.in_flight = {}
+        # Heap of (time.monotonic(), id, request) for requests to send again after retry_after
+        self.retries = []
+        self.reconnects = 0
+        self.error = None
+        self.outgoing = queue.Queue()
+        # Called from the reader thread after replies or updates arrive
+        self.notify = None
+
+    def request(self, data):
+        # Queues a request and returns a Future for its reply without waiting
+        future = Future()
+        with self.lock:
+            if self.error is not None:
+                future.set_exception(self.error)
+                return future
+            self.next_id += 1
+            request_id = self.next_id
+            self.pending[request_id] = future
+            if not self.started:
+                self.started = True
+                threading.Thread(target=self.write_loop, daemon=True).start()
+        self.outgoing.put(dict(data, id=request_id))
+        return future
+
+    def send(self, data):
+        return self.request(data).result(REQUEST_TIMEOUT)
+
+    def send_many(self, messages):
+        # Every request is queued before waiting, so they are pipelined in one write
+        futures = [self.request(message) for message in messages]
+        return [future.result(REQUEST_TIMEOUT) for future in futures]
+
+    def batch(self, messages):
+        # Many requests in one, answered in one reply with a result per request; a request
+        # with a 'player' label acts as that player, one of many on this connection
+        return self.request({'action': 'batch', 'requests': list(messages)})
+
+    def connect(self):
+        sock = socket.create_connection((self.host, self.port), CONNECT_TIMEOUT)
+        try:
+            stream = MessageStream(sock)
+            # Nothing else is sent until the server has picked a format and bound the session.
+            # Servers without the handshake answer with an error and the connection stays on JSON.
+            hello = {'action': 'hello', 'formats': list(self.formats)}
+            if self.session is not None:
+                hello['session'] = self.session
+            stream.send(hello)
+            replies = stream.receive_all()
+            if not replies:
+                raise ConnectionError("Server closed the connection")
+            sock.settimeout(None)
+        except BaseException:
+            sock.close()
+            raise
+        reply = replies[0]
+        stream.use(CODECS.get(reply.get('format'), JSON))
+        with self.lock:
+            if self.session is not None and not reply.get('resumed'):
+                # The server no longer knows this player, so their seats are gone
+                self.closed_lobbies.update(self.subscriptions)
+                self.subscriptions.clear()
+                self.lobby_updates.clear()
+            self.session = reply.get('session')
+            self.socket = sock
+            self.stream = stream
+        threading.Thread(target=self.read_loop, args=(stream,), daemon=True).start()
+
+    def write_loop(self):
+        try:
+            self.connect()
+        except OSError as e:
+            self.fail(e)
+            return
+        unsent = []
+        while True:
+            if not unsent:
+                try:
+                    unsent = [self.outgoing.get(timeout=self.next_retry())]
+                except queue.Empty:
+                    pass
+                unsent += self.due_retries()
+                while True:
+                    try:
+                        unsent.append(self.outgoing.get_nowait())
+                    except queue.Empty:
+                        break
+            # The reader queues its stream when that connection is lost
+            lost = any(item is self.stream for item in unsent)
+            messages = [item for item in unsent if isinstance(item, dict)]
+            if not lost:
+                with self.lock:
+                    self.in_flight.update((message['id'], message) for message in messages)
+                try:
+                    if messages:
+                        self.stream.send_many(messages)
+                    unsent = []
+                    continue
+                except OSError:
+                    messages = []
+            if not self.reconnect():
+                return
+            unsent = messages
+
+    def next_retry(self):
+        # Seconds the writer may wait for new requests, or None for no limit
+        with self.lock:
+            if not self.retries:
+                return None
+            return max(0.0, self.retries[0][0] - time.monotonic())
+
+    def due_retries(self):
+        now = time.monotonic()
+        due = []
+        with self.lock:
+            while self.retries and self.retries[0][0] <= now:
+                due.append(heapq.heappop(self.retries)[2])
+        return due
+
+    def reconnect(self):
+        # Called on the writer thread; False once it has given up
+        self.socket.close()
+        error = ConnectionError("Connection to the server was lost")
+        with self.lock:
+            failed = [self.pending.pop(request_id) for request_id in self.in_flight if request_id in self.pending]
+            self.in_flight.clear()
+        for future in failed:
+            future.set_exception(error)
+        if self.session is None:
+            # Nothing to resume
+            self.fail(error)
+            return False
+        deadline = time.monotonic() + RECONNECT_TIMEOUT
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                self.connect()
+                break
+            except OSError as e:
+                if time.monotonic() + delay > deadline:
+                    self.fail(e)
+                    return False
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        self.reconnects += 1
+        with self.lock:
+            subscriptions = list(self.subscriptions.items())
+        for lobby_code, action in subscriptions:
+            self.follow(lobby_code, action)
+        with self.lock:
+            match = self.match
+        if match is not None:
+            # The server took the player out of the queue when the connection dropped
+            self.queue_match(match)
+        return True
+
+    def read_loop(self, stream):
+        while True:
+            try:
+                messages = stream.receive_all()
+            except OSError:
+                messages = []
+            if not messages:
+                # The writer thread reconnects, or gives up and fails everything
+                self.outgoing.put(stream)
+                return
+            for message in messages:
+                self.dispatch(message)
+            if self.notify is not None:
+                self.notify()
+
+    def fail(self, error):
+        with self.lock:
+            if self.error is None:
+                self.error = error
+            pending = list(self.pending.values())
+            self.pending.clear()
+            match = self.match
+            self.match = None
+        for future in pending:
+            future.set_exception(error)
+        if match is not None:
+            match[2].set_exception(error)
+        if self.notify is not None:
+            self.notify()
+
+    def dispatch(self, message):
+        event = message.get('event')
+        if event == 'lobby_update':
+            with self.lock:
+                self.apply_update(message)
+        elif event == 'lobby_closed':
+            with self.lock:
+                self.lobby_updates.pop(message['lobby_code'], None)
+                self.subscriptions.pop(message['lobby_code'], None)
+                self.stale_lobbies.discard(message['lobby_code'])
+                self.closed_lobbies.add(message['lobby_code'])
+        elif event == 'match_found':
+            with self.lock:
+                self.seated(message)
+                match = self.match if 'player' not in message else None
+            if match is not None:
+                self.end_match(match, {'status': 'success', 'lobby_code': message['lobby_code']})
+        elif event == 'session_taken':
+            # Another connection resumed this session; reconnecting would only take it back
+            with self.lock:
+                self.session = None
+        else:
+            with self.lock:
+                request = self.in_flight.pop(message.get('id'), None)
+                retry_after = message.get('retry_after')
+                if retry_after is not None and request is not None:
+                    heapq.heappush(self.retries, (time.monotonic() + retry_after, request['id'], request))
+                    # Wakes the writer to wait for this retry too
+                    self.outgoing.put(None)
+                    return
+                future = self.pending.pop(message.get('id'), None)
+            if future is not None:
+                future.set_result(message)
+
+    def apply_update(self, update):
+        # Called with self.lock held
+        lobby_code = update['lobby_code']
+        previous = self.lobby_updates.get(lobby_code)
+        delta = update.pop('game_delta', None)
+        if delta is not None:
+            update['game_state'] = apply_game_delta(previous and previous['game_state'], delta)
+            if update['game_state'] is None:
+                # Missed the base version; keep showing the old state until a full one arrives
+                update['game_state'] = previous and previous['game_state']
+                self.refresh_game_state(lobby_code, update['game_state'])
+        self.lobby_updates[lobby_code] = update
+
+    def refresh_game_state(self, lobby_code, known):
+        # Called with self.lock held
+        if lobby_code in self.stale_lobbies:
+            return
+        self.stale_lobbies.add(lobby_code)
+        self.next_id += 1
+        future = Future()
+        self.pending[self.next_id] = future
+        future.add_done_callback(lambda done: self.refreshed(lobby_code, known, done))
+        self.outgoing.put({'action': 'get_game_state', 'lobby_code': lobby_code, 'id': self.next_id,
+                           'since': known['version'] if known else None})
+
+    def refreshed(self, lobby_code, known, future):
+        if future.exception() is not None:
+            return
+        response = future.result()
+        with self.lock:
+            self.stale_lobbies.discard(lobby_code)
+            update = self.lobby_updates.get(lobby_code)
+            if update is None:
+                return
+            if 'game_delta' in response:
+                state = apply_game_delta(known, response['game_delta'])
+            else:
+                state = response.get('game_state')
+            current = update['game_state']
+            if state is not None and (current is None or state['version'] >= current['version']):
+                update['game_state'] = state
+
+    def subscribe(self, lobby_code):
+        # A lobby already watched as a spectator is renewed that way, so the spectator is
+        # still counted after a reconnect
+        with self.lock:
+            action = self.subscriptions.get(lobby_code, 'subscribe')
+        return self.follow(lobby_code, action)
+
+    def spectate(self, lobby_code):
+        # Subscribes without taking a seat in the lobby
+        return self.follow(lobby_code, 'spectate')
+
+    def follow(self, lobby_code, action):
+        with self.lock:
+            self.subscriptions[lobby_code] = action
+        future = self.request({'action': action, 'lobby_code': lobby_code})
+        future.add_done_callback(lambda done: self.subscribed(lobby_code, done))
+        return future
+
+    def subscribed(self, lobby_code, future):
+        if future.exception() is not None:
+            return
+        response = future.result()
+        with self.lock:
+            if response['status'] != 'success':
+                self.closed_lobbies.add(lobby_code)
+                self.subscriptions.pop(lobby_code, None)
+                return
+            # A push sent right after the subscription can overtake this reply; keep the newer one
+            update = response['update']
+            current = self.lobby_updates.get(lobby_code)
+            if current is None or current['version'] <= update['version']:
+                self.lobby_updates[lobby_code] = update
+
+    def quick_match(self, category, name):
+        # Queues for a game in the category. The future resolves with a reply holding the
+        # lobby code once the server has seated the player, who is then subscribed to it.
+        match = (category, name, Future())
+        with self.lock:
+            self.match = match
+        self.queue_match(match)
+        return match[2]
+
+    def queue_match(self, match):
+        category, name, _ = match
+        request = self.request({'action': 'quick_match', 'category': category, 'name': name})
+        request.add_done_callback(lambda done: self.match_queued(match, done))
+
+    def match_queued(self, match, request):
+        if request.exception() is not None:
+            # Lost with the connection: a reconnect queues again, and giving up fails the match
+            return
+        response = request.result()
+        if response['status'] != 'success':
+            self.end_match(match, response)
+        elif not response['queued']:
+            with self.lock:
+                self.seated(response)
+            self.end_match(match, {'status': 'success', 'lobby_code': response['lobby_code']})
+
+    def seated(self, match):
+        # Called with self.lock held; the server has already subscribed the connection
+        lobby_code = match['lobby_code']
+        self.subscriptions[lobby_code] = 'subscribe'
+        current = self.lobby_updates.get(lobby_code)
+        if current is None or current['version'] <= match['update']['version']:
+            self.lobby_updates[lobby_code] = match['update']
+
+    def leave_queue(self):
+        # If the match was made first, its future resolves with it instead
+        with self.lock:
+            match = self.match
+        if match is None:
+            future = Future()
+            future.set_result({'status': 'error', 'message': 'Not in the queue'})
+            return future
+        request = self.request({'action': 'leave_queue', 'category': match[0]})
+        request.add_done_callback(lambda done: self.left_queue(match, done))
+        return request
+
+    def left_queue(self, match, request):
+        if request.exception() is None and request.result()['status'] == 'success':
+            self.end_match(match, {'status': 'error', 'message': 'Left the queue'})
+
+    def end_match(self, match, response):
+        # Whichever of the reply, the push and leaving comes first resolves the match
+        with self.lock:
+            if self.match is not match:
+                return
+            self.match = None
+        match[2].set_result(response)
+
+    def unsubscribe(self, lobby_code):
+        with self.lock:
+            self.lobby_updates.pop(lobby_code, None)
+            self.subscriptions.pop(lobby_code, None)
+        return self.request({'action': 'unsubscribe', 'lobby_code': lobby_code})
+
+    def poll(self, lobby_code):
+        # Returns the latest known update for the lobby without any I/O, or None if
+        # nothing has arrived yet
+        with self.lock:
+            if self.error is not None:
+                raise ConnectionError("Lost connection to the server") from self.error
+            return self.lobby_updates.get(lobby_code)
+
+    def is_closed(self, lobby_code):
+        with self.lock:
+            return lobby_code in self.closed_lobbies
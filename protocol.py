@@ -0,0 +1,175 @@
+import struct
+
+from codec import JSON
+
+# Every message on the wire is a 4-byte big-endian payload length followed by the payload,
+# JSON unless a hello handshake switched the connection to another codec (see codec.py)
+HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 1 << 20
+RECV_SIZE = 65536
+# Bytes a server may hold for a connection that is not reading before dropping it
+MAX_SEND_BUFFER = 64 * 1024
+# Kernel send buffer for server-side sockets. Left alone, Linux grows it to megabytes for a
+# peer that stops reading, which would hide that peer from the limit above.
+SOCKET_SEND_BUFFER = 16 * 1024
+# Requests one batch request may hold
+MAX_BATCH_SIZE = 1000
+
+class FrameError(Exception):
+    pass
+
+def encode_message(message):
+    return JSON.encode(message)
+
+def encode_frame(message, codec=JSON):
+    payload = codec.encode(message)
+    return HEADER.pack(len(payload)) + payload
+
+def encode_frames(messages, codec=JSON):
+    return b''.join(encode_frame(message, codec) for message in messages)
+
+def within_send_buffer(connection, send_buffer, buffered, size, reply):
+    # Whether size more bytes may be queued behind the buffered ones. A reply to the
+    # connection's own requests is queued whatever its size unless the client has already
+    # fallen behind, so a large batch reply reaches a client that is reading. Until the
+    # buffer next empties, the largest such reply is room on top of the limit: pushes that
+    # follow it are not counted against a client keeping up, and a client that sends
+    # requests without reading their replies is still dropped.
+    limit = send_buffer + connection.reply_room
+    if reply:
+        if buffered > limit:
+            return False
+        connection.reply_room = max(connection.reply_room, size)
+        return True
+    return buffered + size <= limit
+
+def diff_game_state(base, state):
+    # Only fields that changed since base are sent; newly revealed letters are
+    # sent by position and new guesses as a list instead of the whole word and set.
+    # A restart clears the guesses, so the whole list is sent when any are gone.
+    delta = {'base_version': base['version'], 'version': state['version']}
+    for key, value in state.items():
+        old = base.get(key)
+        if key == 'version' or value == old:
+            continue
+        if key == 'word' and old is not None and len(old) == len(value):
+            delta['revealed'] = {str(i): letter for i, (letter, previous) in enumerate(zip(value, old)) if letter != previous}
+        elif key == 'guessed_letters' and old is not None and set(old) <= set(value):
+            seen = set(old)
+            delta['new_letters'] = [letter for letter in value if letter not in seen]
+        else:
+            delta[key] = value
+    return delta
+
+def apply_game_delta(state, delta):
+    if state is None or state.get('version') != delta['base_version']:
+        return None
+    state = dict(state)
+    for key, value in delta.items():
+        if key == 'revealed':
+            word = list(state['word'])
+            for position, letter in value.items():
+                word[int(position)] = letter
+            state['word'] = ''.join(word)
+        elif key == 'new_letters':
+            # The server lists guesses in alphabetical order
+            state['guessed_letters'] = sorted(state['guessed_letters'] + value)
+        elif key != 'base_version':
+            state[key] = value
+    return state
+
+class FrameReader:
+    def __init__(self, codec=JSON):
+        self.buffer = bytearray()
+        self.start = 0
+        self.codec = codec
+
+    def feed(self, data):
+        self.buffer += data
+
+    def next_span(self):
+        # Consumes the next complete frame and returns its (start, payload_start, end) offsets
+        end_of_header = self.start + HEADER.size
+        if len(self.buffer) >= end_of_header:
+            (length,) = HEADER.unpack_from(self.buffer, self.start)
+            if length > MAX_FRAME_SIZE:
+                raise FrameError(f"Frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+            end = end_of_header + length
+            if len(self.buffer) >= end:
+                start = self.start
+                self.start = end
+                return start, end_of_header, end
+        # Only drop consumed bytes once no complete frame is left, so a burst of
+        # pipelined frames is parsed without shifting the buffer for each one
+        if self.start:
+            del self.buffer[:self.start]
+            self.start = 0
+        return None
+
+    def next_frame(self):
+        # The raw frame, header included, for forwarding without re-encoding
+        span = self.next_span()
+        if span is None:
+            return None
+        return self.buffer[span[0]:span[2]]
+
+    def next_message(self):
+        span = self.next_span()
+        if span is None:
+            return None
+        return self.codec.decode(self.buffer[span[1]:span[2]])
+
+    def frames(self):
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def __iter__(self):
+        while True:
+            message = self.next_message()
+            if message is None:
+                return
+            yield message
+
+class MessageStream:
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = FrameReader()
+        self.recv_buffer = bytearray(RECV_SIZE)
+        self.recv_view = memoryview(self.recv_buffer)
+        self.closed = False
+        self.bytes_received = 0
+
+    @property
+    def codec(self):
+        return self.reader.codec
+
+    def use(self, codec):
+        # Frames already buffered are decoded with the new codec too
+        self.reader.codec = codec
+
+    def send(self, message):
+        self.sock.sendall(encode_frame(message, self.codec))
+
+    def send_many(self, messages):
+        self.sock.sendall(encode_frames(messages, self.codec))
+
+    def receive_all(self):
+        # Blocks until at least one complete message is available; an empty list means the peer closed
+        while True:
+            messages = list(self.reader)
+            if messages:
+                return messages
+            if not self.fill():
+                return []
+
+    def fill(self):
+        received = self.sock.recv_into(self.recv_buffer)
+        if not received:
+            self.closed = True
+            return False
+        self.bytes_received += received
+        self.reader.feed(self.recv_view[:received])
+        return True
@@ -0,0 +1,113 @@
+import random
+import threading
+import zlib
+
+from lifecycle import LobbyLifecycle
+
+LOBBY_CODE_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+LOBBY_CODE_LENGTH = 6
+SHARD_COUNT = 64
+
+def lobby_hash(lobby_code):
+    # Stable across processes, unlike hash(), so codes can also be routed between workers
+    return zlib.crc32(lobby_code.encode())
+
+def lobby_owner(lobby_code, worker_count):
+    # Uses the high bits of the hash; the low bits pick the shard inside the worker,
+    # so each worker still spreads its own lobbies over all of its shards
+    return (lobby_hash(lobby_code) >> 16) % worker_count
+
+def generate_lobby_code():
+    return ''.join(random.choices(LOBBY_CODE_ALPHABET, k=LOBBY_CODE_LENGTH))
+
+class Shard:
+    def __init__(self, lifecycle):
+        self.lock = threading.Lock()
+        self.lobbies = {}
+        self.lifecycle = lifecycle
+
+class LobbyRegistry:
+    def __init__(self, shard_count=SHARD_COUNT, lifecycle_factory=LobbyLifecycle):
+        # Each shard has its own lock and expiry bookkeeping, so registry operations
+        # on lobbies in different shards never contend
+        self.shards = [Shard(lifecycle_factory()) for _ in range(shard_count)]
+
+    def shard(self, lobby_code):
+        return self.shards[lobby_hash(lobby_code) % len(self.shards)]
+
+    def create(self, factory, generate_code=generate_lobby_code):
+        # The code is checked and claimed under the shard lock, so two lobbies never share one
+        while True:
+            lobby_code = generate_code()
+            shard = self.shard(lobby_code)
+            with shard.lock:
+                if lobby_code in shard.lobbies:
+                    continue
+                game = factory()
+                shard.lobbies[lobby_code] = game
+                shard.lifecycle.add(lobby_code)
+                return lobby_code, game
+
+    def get(self, lobby_code, default=None):
+        # A single dict lookup is atomic, so reads do not take the shard lock
+        return self.shard(lobby_code).lobbies.get(lobby_code, default)
+
+    def __getitem__(self, lobby_code):
+        return self.shard(lobby_code).lobbies[lobby_code]
+
+    def __contains__(self, lobby_code):
+        return lobby_code in self.shard(lobby_code).lobbies
+
+    def __len__(self):
+        return sum(len(shard.lobbies) for shard in self.shards)
+
+    def restore(self, lobby_code, game):
+        # Puts back a lobby recovered after a restart, with a fresh idle timeout
+        shard = self.shard(lobby_code)
+        with shard.lock:
+            shard.lobbies[lobby_code] = game
+            shard.lifecycle.add(lobby_code)
+
+    def items(self):
+        # A copy per shard, so lobbies can be walked while requests keep changing the registry
+        for shard in self.shards:
+            with shard.lock:
+                items = list(shard.lobbies.items())
+            yield from items
+
+    def pop(self, lobby_code, default=None):
+        shard = self.shard(lobby_code)
+        with shard.lock:
+            game = shard.lobbies.pop(lobby_code, default)
+            shard.lifecycle.remove(lobby_code)
+        return game
+
+    def touch(self, lobby_code):
+        shard = self.shard(lobby_code)
+        with shard.lock:
+            shard.lifecycle.touch(lobby_code)
+
+    def finish(self, lobby_code):
+        shard = self.shard(lobby_code)
+        with shard.lock:
+            shard.lifecycle.finish(lobby_code)
+
+    def restart(self, lobby_code):
+        shard = self.shard(lobby_code)
+        with shard.lock:
+            shard.lifecycle.restart(lobby_code)
+
+    def due(self):
+        expired = []
+        for shard in self.shards:
+            with shard.lock:
+                expired.extend(shard.lifecycle.due())
+        return expired
+
+    def counters(self):
+        totals = {}
+        for shard in self.shards:
+            with shard.lock:
+                for name, value in shard.lifecycle.counters().items():
+                    totals[name] = totals.get(name, 0) + value
+        return totals
@@ -0,0 +1,102 @@
+import pygame
+from assets import render_text
+
+FPS = 60
+# How long an unchanged screen waits for input before drawing again. Screens fed by the
+# network are woken earlier by wake().
+IDLE_TIMEOUT_MS = 250
+WAKE_EVENT = pygame.USEREVENT
+
+def wake():
+    # Safe to call from any thread once the display is open
+    if pygame.display.get_init():
+        pygame.event.post(pygame.event.Event(WAKE_EVENT))
+
+def without_covered(rects):
+    kept = []
+    for rect in sorted(rects, key=lambda rect: rect.width * rect.height, reverse=True):
+        if not any(other.contains(rect) for other in kept):
+            kept.append(rect)
+    return kept
+
+class View:
+    # Tracks what each screen element looked like last frame and only repaints the ones
+    # that changed, plus anything they overlap, then pushes just those rectangles to the
+    # display. A frame with no changes draws nothing, and the next frame sleeps until an
+    # event arrives.
+    active = None
+
+    def __init__(self, surface, background, fps=FPS):
+        self.surface = surface
+        self.background = background
+        self.fps = fps
+        self.clock = pygame.time.Clock()
+        self.items = {}
+        self.frame = []
+        self.cleared = [surface.get_rect()]
+        self.idle = False
+
+    def events(self):
+        if self.idle:
+            event = pygame.event.wait(IDLE_TIMEOUT_MS)
+            if event.type != pygame.NOEVENT:
+                return [event] + pygame.event.get()
+        return pygame.event.get()
+
+    def item(self, key, state, rect, draw):
+        # state is anything comparable that determines how the item looks
+        previous = self.items.get(key)
+        changed = previous is None or previous[0] != state
+        if changed and previous is not None:
+            self.cleared.append(previous[1])
+        if changed:
+            self.cleared.append(rect)
+        self.items[key] = (state, rect)
+        self.frame.append((key, rect, draw, changed))
+
+    def button(self, button):
+        self.item(id(button), (button.text, button.color, button.text_color), button.rect, button.draw)
+
+    def text(self, key, font, text, color, pos):
+        rendered = render_text(font, text, color)
+        self.item(key, (text, color, pos), rendered.get_rect(topleft=pos), lambda surface: surface.blit(rendered, pos))
+
+    def image(self, key, image, pos):
+        self.item(key, id(image), image.get_rect(topleft=pos), lambda surface: surface.blit(image, pos))
+
+    def present(self):
+        # Another screen may have drawn over this one since its last frame
+        if View.active is not self:
+            View.active = self
+            self.cleared.append(self.surface.get_rect())
+
+        drawn = {key for key, _, _, _ in self.frame}
+        for key in [key for key in self.items if key not in drawn]:
+            self.cleared.append(self.items.pop(key)[1])
+
+        redraw = [changed for _, _, _, changed in self.frame]
+        # Repainting an area wipes whatever else was drawn there, so anything overlapping
+        # it is repainted too, until no more items are affected
+        growing = bool(self.cleared)
+        while growing:
+            growing = False
+            for i, (_, rect, _, _) in enumerate(self.frame):
+                if not redraw[i] and rect.collidelist(self.cleared) != -1:
+                    redraw[i] = True
+                    self.cleared.append(rect)
+                    growing = True
+
+        # An item that changed in place clears the same rectangle twice; fill each area once
+        self.cleared = without_covered(self.cleared)
+        for rect in self.cleared:
+            self.surface.fill(self.background, rect)
+        for (_, _, draw, _), needed in zip(self.frame, redraw):
+            if needed:
+                draw(self.surface)
+
+        self.idle = not self.cleared
+        if self.cleared:
+            pygame.display.update(self.cleared)
+        self.cleared = []
+        self.frame = []
+        self.clock.tick(self.fps)
@@ -0,0 +1,296 @@
+import argparse
+import logging
+import os
+import struct
+import threading
+import time
+
+from codec import get_varint, put_str, put_varint
+from dictionary import load as load_words
+from journal import file_name, numbered
+from metrics import Histogram
+
+SEGMENT = ('games-', '.bin')
+# A segment is closed and the next one started once it grows past this
+SEGMENT_SIZE = 64 << 20
+BUFFER_SIZE = 1 << 20
+# Bytes read at a time by the analysis
+CHUNK_SIZE = 4 << 20
+
+SOLVED, HANGED, ABANDONED = range(3)
+
+# Start (Unix time), word id, outcome, seats, computer seats, guesses, misses, turns
+# taken by players and their total milliseconds. The counts are also in the moves; having
+# them up front lets a scan skip the moves.
+RECORD = struct.Struct('!dIBBBHHHI')
+# A move is a byte, the letter's place in the alphabet plus these flags, followed by the
+# milliseconds since the previous move (or the start) as a varint
+HIT = 0x20
+COMPUTER = 0x40
+MAX_BYTE = 0xff
+MAX_SHORT = 0xffff
+MAX_LONG = 0xffffffff
+
+log = logging.getLogger('hangman.replays')
+
+class GameRecord:
+    # The moves of a game in progress, encoded as they are made
+    __slots__ = ('started_at', 'moved_at', 'moves', 'guesses', 'misses', 'turns', 'turn_ms')
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.moved_at = time.monotonic()
+        self.moves = bytearray()
+        self.guesses = 0
+        self.misses = 0
+        self.turns = 0
+        self.turn_ms = 0
+
+    def move(self, letter, hit, computer):
+        now = time.monotonic()
+        elapsed = int((now - self.moved_at) * 1000)
+        self.moved_at = now
+        self.moves.append((ord(letter) - 65) | (HIT if hit else 0) | (COMPUTER if computer else 0))
+        put_varint(self.moves, elapsed)
+        self.guesses += 1
+        if not hit:
+            self.misses += 1
+        if not computer:
+            self.turns += 1
+            self.turn_ms += elapsed
+
+    def encode(self, category, word_id, outcome, seats, computers):
+        # The record with its length in front, as a varint
+        body = bytearray(RECORD.pack(self.started_at, word_id, outcome, min(seats, MAX_BYTE),
+                                     min(computers, MAX_BYTE), min(self.guesses, MAX_SHORT), min(self.misses, MAX_SHORT),
+                                     min(self.turns, MAX_SHORT), min(self.turn_ms, MAX_LONG)))
+        put_str(body, category)
+        body += self.moves
+        out = bytearray()
+        put_varint(out, len(body))
+        out += body
+        return bytes(out)
+
+class ReplayLog:
+    # Finished games, appended to numbered segment files through a large write buffer.
+    # Records are small and nothing depends on them, so there is no fsync: a crash loses
+    # the games still buffered, and readers stop at a record cut short. Each start opens a
+    # new segment, so nothing is ever appended after a cut.
+    def __init__(self, directory, segment_size=SEGMENT_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.lock = threading.Lock()
+        self.segment = max(numbered(directory, SEGMENT), default=0)
+        self.file = None
+        self.size = 0
+        self.written = 0
+        self.switch()
+
+    def switch(self):
+        if self.file is not None:
+            self.file.close()
+        self.segment += 1
+        self.file = open(os.path.join(self.directory, file_name(SEGMENT, self.segment)), 'ab',
+                         buffering=BUFFER_SIZE)
+        self.size = 0
+
+    def append(self, record):
+        with self.lock:
+            if self.file is None:
+                return
+            try:
+                self.file.write(record)
+                self.size += len(record)
+                self.written += 1
+                if self.size >= self.segment_size:
+                    self.switch()
+            except OSError as e:
+                log.error("Error writing game record: %s", e)
+
+    def flush(self):
+        with self.lock:
+            if self.file is None:
+                return
+            try:
+                self.file.flush()
+            except OSError as e:
+                log.error("Error writing game record: %s", e)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+def segment_paths(paths):
+    # Segment files named directly, and every segment under the directories named, oldest first
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        for directory, _, _ in os.walk(path):
+            found += [segment for _, segment in sorted(numbered(directory, SEGMENT).items())]
+    return found
+
+class Analysis:
+    # Totals per (category, word id), so memory grows with the dictionary and not with the
+    # number of games. Segments are read a chunk at a time.
+    def __init__(self, latency=False):
+        # category -> word id -> [games, solved, hanged, abandoned, guesses, misses, turns,
+        # turn ms]; guesses and misses only count finished games
+        self.words = {}
+        self.games = 0
+        self.bytes = 0
+        self.cut = 0
+        # Milliseconds per player turn, read from the moves
+        self.turns = Histogram() if latency else None
+
+    def add_file(self, path):
+        # Read in chunks; a record that runs past a chunk is finished with the next one
+        rest = b''
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                data = rest + chunk if rest else chunk
+                rest = data[self.add(data):]
+        if rest:
+            self.cut += 1
+
+    def add(self, data):
+        # Returns how far the whole records in data go
+        unpack = RECORD.unpack_from
+        words = self.words
+        turns = self.turns
+        header_end = RECORD.size
+        size = len(data)
+        position = 0
+        games = 0
+        last = category_words = None
+        while position < size:
+            # Lengths and names are almost always under 128 bytes, so one byte each
+            length = data[position]
+            if length < 0x80:
+                start = position + 1
+            else:
+                try:
+                    length, start = get_varint(data, position)
+                except IndexError:
+                    break
+            end = start + length
+            if end > size:
+                break
+            (_, word_id, outcome, _, _, guesses, misses, timed_turns, turn_ms) = unpack(data, start)
+            name_start = start + header_end
+            name_length = data[name_start]
+            if name_length < 0x80:
+                name_start += 1
+            else:
+                name_length, name_start = get_varint(data, name_start)
+            category = data[name_start:name_start + name_length]
+            if category != last:
+                last = category
+                category_words = words.get(category)
+                if category_words is None:
+                    category_words = words[category] = {}
+            totals = category_words.get(word_id)
+            if totals is None:
+                totals = category_words[word_id] = [0, 0, 0, 0, 0, 0, 0, 0]
+            totals[0] += 1
+            totals[1 + outcome] += 1
+            if outcome != ABANDONED:
+                totals[4] += guesses
+                totals[5] += misses
+            totals[6] += timed_turns
+            totals[7] += turn_ms
+            if turns is not None:
+                move = name_start + name_length
+                while move < end:
+                    flags = data[move]
+                    elapsed, move = get_varint(data, move + 1)
+                    if not flags & COMPUTER:
+                        turns.record(elapsed)
+            games += 1
+            position = end
+        self.games += games
+        self.bytes += position
+        return position
+
+    def categories(self):
+        # category -> totals, summed over its words
+        totals = {}
+        for category, category_words in self.words.items():
+            summed = totals[category.decode()] = [0] * 8
+            for counts in category_words.values():
+                for i, count in enumerate(counts):
+                    summed[i] += count
+        return totals
+
+def win_rate(totals):
+    finished = totals[1] + totals[2]
+    return totals[1] / finished if finished else 0.0
+
+def describe(totals):
+    games, solved, hanged, abandoned, guesses, misses, turns, turn_ms = totals
+    finished = solved + hanged
+    return (f"{games:>9,} {win_rate(totals):>7.1%} {abandoned / games:>9.1%} "
+            f"{guesses / finished if finished else 0:>8.1f} {misses / finished if finished else 0:>7.1f} "
+            f"{turn_ms / turns if turns else 0:>8.0f}")
+
+def word_name(words, category, word_id):
+    if word_id < words.count(category):
+        return words.word(category, word_id)
+    return f"#{word_id}"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Win rates, guesses and turn times from recorded games")
+    parser.add_argument('paths', nargs='+', metavar='PATH',
+                        help="segment files, or directories searched for them (such as a server's --replay-dir)")
+    parser.add_argument('--words', help="the dictionary file the server used, to name word ids "
+                                        "(default: built-in lists)")
+    parser.add_argument('--min-games', type=int, default=10, help="games a word needs to be ranked")
+    parser.add_argument('--top', type=int, default=10, help="hardest and easiest words to list")
+    parser.add_argument('--latency', action='store_true', help="read every move for turn time percentiles")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    words = load_words(args.words)
+    analysis = Analysis(args.latency)
+    paths = segment_paths(args.paths)
+    start = time.perf_counter()
+    for path in paths:
+        analysis.add_file(path)
+    elapsed = time.perf_counter() - start
+    files = f"{len(paths)} file" + ("s" if len(paths) != 1 else "")
+    print(f"{analysis.games:,} games in {files} ({analysis.bytes / 1e6:.1f} MB) read in {elapsed:.2f}s")
+    if analysis.cut:
+        print(f"{analysis.cut} files end in a record cut short, which was skipped")
+    if not analysis.games:
+        return
+
+    header = f"{'games':>9} {'win':>7} {'abandoned':>9} {'guesses':>8} {'misses':>7} {'turn ms':>8}"
+    print(f"\n{'category':<24} {header}")
+    for category, totals in sorted(analysis.categories().items()):
+        print(f"{category:<24} {describe(totals)}")
+
+    ranked = sorted((win_rate(totals), category.decode(), word_id, totals)
+                    for category, category_words in analysis.words.items()
+                    for word_id, totals in category_words.items() if totals[1] + totals[2] >= args.min_games)
+    for title, keys in (("hardest", ranked[:args.top]), ("easiest", ranked[:-args.top - 1:-1])):
+        if not keys:
+            continue
+        print(f"\n{title + ' words':<24} {'word':<16} {header}")
+        for _, category, word_id, totals in keys:
+            print(f"{category:<24} {word_name(words, category, word_id):<16} {describe(totals)}")
+
+    if analysis.turns is not None and analysis.turns.count:
+        summary = analysis.turns.summary(scale=1)
+        print(f"\nturn time: {summary['count']:,} turns, mean {summary['mean']:.0f} ms, "
+              f"p50 {summary['p50']:.0f} ms, p90 {summary['p90']:.0f} ms, p99 {summary['p99']:.0f} ms")
+
+if __name__ == "__main__":
+    main()
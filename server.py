@@ -1,180 +1,1299 @@
 import socket
 import threading
-import random
-import json
+import string
+import functools
+import asyncio
+import argparse
+import gc
+import http.server
+import logging
+import logging.handlers
+import queue
+import signal
+import sys
+import time
+from collections import deque
+from dictionary import load as load_words
+from solver import Solver
+from journal import Journal, SNAPSHOT_INTERVAL
+from lifecycle import REAP_INTERVAL
+from limits import CONNECTION_RATE, RateLimiter
+from matchmaking import MATCH_SIZE, MATCH_WAIT, Matchmaker, Ticket
+from metrics import Metrics, prometheus_text
+from registry import LobbyRegistry, generate_lobby_code, lobby_owner
+from replays import ABANDONED, HANGED, SOLVED, GameRecord, ReplayLog
+from sessions import Sessions, load_key
+from codec import CODECS, JSON_FORMAT
+from protocol import (HEADER, MAX_BATCH_SIZE, MAX_SEND_BUFFER, SOCKET_SEND_BUFFER, FrameReader, MessageStream,
+                      encode_frame, diff_game_state, within_send_buffer)
 
 HOST = '127.0.0.1'
 PORT = 65432
 MAX_WRONG_GUESSES = 7
-word_categories = {
-    "Animals": ["ELEPHANT", "GIRAFFE", "PENGUIN", "TIGER", "DOLPHIN"],
-    "Countries": ["BRAZIL", "JAPAN", "AUSTRALIA", "FRANCE", "CANADA"],
-    "Fruits": ["APPLE", "BANANA", "ORANGE", "STRAWBERRY", "PINEAPPLE"],
-    "Sports": ["FOOTBALL", "TENNIS", "BASKETBALL", "SWIMMING", "VOLLEYBALL"]
-}
+STATE_HISTORY = 32
+MAX_COMPUTERS = 3
+# Lets a blocking socket take what fits without waiting; platforms without it block as before
+SEND_FLAGS = getattr(socket, 'MSG_DONTWAIT', 0)
+# Actions that act on an existing lobby and fail cleanly when its code is unknown or expired
+LOBBY_ACTIONS = {'check_lobby_status', 'start_game', 'set_category', 'guess', 'get_game_state', 'subscribe',
+                 'add_computer', 'spectate'}
+# Metrics are kept per action; anything else a client sends is counted as 'invalid'
+ACTIONS = LOBBY_ACTIONS | {'hello', 'create_lobby', 'join_lobby', 'unsubscribe', 'stats', 'batch', 'quick_match',
+                           'leave_queue'}
+# In a batch these act on the connection itself, whichever player a batched request is
+# for, and the rest cannot be batched
+SUBSCRIPTION_ACTIONS = {'subscribe', 'spectate', 'unsubscribe'}
+UNBATCHED_ACTIONS = {'hello', 'batch'}
+# Players a connection can act as in batches, besides its own
+MAX_IDENTITIES = 1000
+# Reads whose reply depends only on the lobby and the request, so identical ones can share it
+COALESCED_ACTIONS = {'get_game_state', 'check_lobby_status'}
+COALESCE_WINDOW = 0.05
+MAX_COALESCED_REPLIES = 16
+# A connection is not read while this share of its send buffer waits to go out, so a client
+# that pipelines requests without reading the replies is held back instead of dropped
+READ_PAUSE_FRACTION = 4
+
+log = logging.getLogger('hangman.server')
+
+LETTER_BITS = {letter: 1 << i for i, letter in enumerate(string.ascii_uppercase)}
+
+@functools.lru_cache(maxsize=None)
+def index_word(word):
+    # Shared by every session playing the same word
+    positions = {}
+    for i, letter in enumerate(word):
+        positions.setdefault(letter, []).append(i)
+    return {letter: tuple(indexes) for letter, indexes in positions.items()}
 
 class GameSession:
+    __slots__ = ('players', 'player_names', 'host', 'game_started', 'category', 'word', 'word_id',
+                 'letter_positions', 'mask', 'guessed_mask', 'remaining_letters',
+                 'wrong_guesses', 'current_player', 'winner',
+                 'version', 'state', 'state_history', 'published_version',
+                 'lock', 'subscribers', 'spectators', 'replies', 'recording')
+
     def __init__(self, host):
-        self.players = [host]
+        self.players = []
         self.player_names = {}
         self.host = host
         self.game_started = False
         self.category = None
         self.word = None
-        self.guessed_letters = set()
+        self.word_id = None
+        self.letter_positions = None
+        self.mask = None
+        self.guessed_mask = 0
+        self.remaining_letters = 0
         self.wrong_guesses = 0
         self.current_player = 0
         self.winner = None
+        # Every mutation bumps the version; built states are cached per version
+        # and the recent ones kept so clients can be sent only what changed
+        self.version = 0
+        self.state = None
+        self.state_history = None
+        self.published_version = None
+        self.lock = threading.RLock()
+        self.subscribers = None
+        # The subscribers watching without a seat
+        self.spectators = None
+        # Encoded replies to recent identical reads, see Server.coalesced_reply
+        self.replies = None
+        # The moves so far when games are recorded, see Server.begin_game
+        self.recording = None
+
+    def mark_changed(self):
+        self.version += 1
 
     def add_player(self, player_id, name):
         self.players.append(player_id)
         self.player_names[player_id] = name
+        self.mark_changed()
+
+    def remove_player(self, player_id):
+        if player_id not in self.player_names:
+            return
+        index = self.players.index(player_id)
+        del self.players[index]
+        del self.player_names[player_id]
+        if self.players:
+            # Keep the turn with the same player, or pass it on if the leaver held it
+            if index < self.current_player:
+                self.current_player -= 1
+            self.current_player %= len(self.players)
+        else:
+            self.current_player = 0
+        self.mark_changed()
 
     def is_ready_to_start(self):
         return len(self.players) >= 2
 
-    def start_game(self, category):
+    def add_computer(self):
+        # Computer seats get negative ids, which never clash with the positive player ids
+        computers = sum(1 for player_id in self.players if player_id < 0)
+        self.add_player(-1 - computers, "Computer" if not computers else f"Computer {computers + 1}")
+
+    def is_computer_turn(self):
+        return self.game_started and not self.is_game_over() and self.players[self.current_player] < 0
+
+    def start_game(self, category, word, word_id=None):
         self.game_started = True
         self.category = category
-        self.word = random.choice(word_categories[category])
+        self.word = word
+        self.word_id = word_id
+        self.letter_positions = index_word(self.word)
+        self.mask = bytearray(b"_" * len(self.word))
+        self.guessed_mask = 0
+        self.remaining_letters = len(self.letter_positions)
+        # A restart begins a fresh game, whatever became of the last one
+        self.wrong_guesses = 0
+        self.current_player = 0
+        self.winner = None
+        self.mark_changed()
+
+    @property
+    def guessed_letters(self):
+        letters = []
+        mask = self.guessed_mask
+        while mask:
+            lowest = mask & -mask
+            letters.append(string.ascii_uppercase[lowest.bit_length() - 1])
+            mask ^= lowest
+        return letters
+
+    def play(self, letter):
+        # A guess by the player whose turn it is; whoever reveals the last letter wins
+        player_id = self.players[self.current_player]
+        is_correct = self.guess(letter)
+        if self.is_won():
+            self.winner = self.player_names[player_id]
+            self.mark_changed()
+        return is_correct
 
     def guess(self, letter):
-        self.guessed_letters.add(letter)
-        is_correct = letter in self.word
+        bit = LETTER_BITS[letter]
+        positions = self.letter_positions.get(letter)
+        is_correct = positions is not None
         if not is_correct:
             self.wrong_guesses = min(self.wrong_guesses + 1, MAX_WRONG_GUESSES)
+        elif not self.guessed_mask & bit:
+            code = ord(letter)
+            for position in positions:
+                self.mask[position] = code
+            self.remaining_letters -= 1
+        self.guessed_mask |= bit
         self.current_player = (self.current_player + 1) % len(self.players)
-        print(f"Turn passed to player {self.current_player}")  # Debug print
+        self.mark_changed()
         return is_correct
 
+    def is_won(self):
+        return self.game_started and self.remaining_letters == 0
 
     def is_game_over(self):
-        return self.wrong_guesses >= 7 or all(letter in self.guessed_letters for letter in self.word)
+        return self.wrong_guesses >= MAX_WRONG_GUESSES or self.is_won()
 
     def get_game_state(self):
-        return {
-            "word": "".join(letter if letter in self.guessed_letters else "_" for letter in self.word),
-            "guessed_letters": list(self.guessed_letters),
-            "wrong_guesses": self.wrong_guesses,
-            "current_player": self.current_player,
-            "game_over": self.is_game_over(),
-            "winner": self.winner,
-            "category": self.category,
-            "current_player_name": self.player_names[self.players[self.current_player]]
-        }
+        if self.state is None or self.state["version"] != self.version:
+            self.state = {
+                "word": self.mask.decode(),
+                "guessed_letters": self.guessed_letters,
+                "wrong_guesses": self.wrong_guesses,
+                "current_player": self.current_player,
+                "game_over": self.is_game_over(),
+                "winner": self.winner,
+                "category": self.category,
+                "current_player_name": self.player_names[self.players[self.current_player]],
+                "version": self.version
+            }
+            if self.state_history is None:
+                self.state_history = deque(maxlen=STATE_HISTORY)
+            self.state_history.append(self.state)
+        return self.state
+
+    def snapshot(self):
+        # Everything needed to rebuild the session; the rest is derived from the word
+        return [self.host, self.players, [self.player_names[player_id] for player_id in self.players],
+                self.category, self.word, self.guessed_mask, self.wrong_guesses, self.current_player,
+                self.winner, self.version, self.word_id]
+
+    @classmethod
+    def restore(cls, data):
+        host, players, names, category, word, guessed_mask, wrong_guesses, current_player, winner, version = data[:10]
+        game = cls(host)
+        game.players = players
+        game.player_names = dict(zip(players, names))
+        if word is not None:
+            game.game_started = True
+            game.category = category
+            game.word = word
+            # Snapshots written before word ids were kept have none
+            game.word_id = data[10] if len(data) > 10 else None
+            game.letter_positions = index_word(word)
+            revealed = {letter for letter in game.letter_positions if guessed_mask & LETTER_BITS[letter]}
+            game.mask = bytearray(''.join(letter if letter in revealed else '_' for letter in word), 'ascii')
+            game.guessed_mask = guessed_mask
+            game.remaining_letters = len(game.letter_positions) - len(revealed)
+        game.wrong_guesses = wrong_guesses
+        game.current_player = current_player
+        game.winner = winner
+        game.version = version
+        return game
+
+    def get_state_delta(self, since):
+        # Returns None when the client's version is too old (or unknown) to diff against
+        state = self.get_game_state()
+        for base in self.state_history:
+            if base["version"] == since:
+                return diff_game_state(base, state)
+        return None
+
+class SlowConsumer(ConnectionError):
+    pass
+
+class CachedReply:
+    # A read's reply for one lobby version, encoded without its id the first time each
+    # format asks for it
+    __slots__ = ('version', 'expires', 'response', 'payloads')
+
+    def __init__(self, version, expires, response):
+        self.version = version
+        self.expires = expires
+        self.response = response
+        self.payloads = {}
+
+    def payload(self, codec):
+        payload = self.payloads.get(codec)
+        if payload is None:
+            payload = self.payloads[codec] = codec.encode(self.response)
+        return payload
+
+class Identity:
+    # A player that batched requests act as, one of many multiplexed on a connection
+    __slots__ = ('player_id', 'lobbies', 'connection', 'label')
+
+    def __init__(self, player_id, connection, label):
+        self.player_id = player_id
+        self.lobbies = set()
+        self.connection = connection
+        self.label = label
+
+def seat_owner(seat):
+    # The connection a seat's pushes go to, and the label of the batched player it is, if any
+    if isinstance(seat, Identity):
+        return seat.connection, seat.label
+    return seat, None
+
+class ThreadedConnection:
+    def __init__(self, sock, addr, metrics, player_id, send_buffer=MAX_SEND_BUFFER, limiter=None):
+        self.sock = sock
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_SEND_BUFFER)
+        self.addr = addr
+        self.metrics = metrics
+        # Until a hello resumes a session, each connection is a new player
+        self.player_id = player_id
+        self.stream = MessageStream(sock)
+        self.write_lock = threading.Lock()
+        # What the socket would not take yet, sent by a writer thread that runs only
+        # while there is a backlog; unsent_bytes also counts the chunk it is sending
+        self.unsent = deque()
+        self.unsent_bytes = 0
+        self.send_buffer = send_buffer
+        self.drained = threading.Condition(self.write_lock)
+        self.writer = None
+        self.dropped = False
+        # Room over send_buffer taken by a large reply, see protocol.within_send_buffer
+        self.reply_room = 0
+        self.limiter = limiter
+        self.subscriptions = set()
+        self.lobbies = set()
+        # Label -> Identity for the players batched requests act as
+        self.identities = None
+
+    @property
+    def codec(self):
+        return self.stream.codec
+
+    def use(self, codec):
+        self.stream.use(codec)
+
+    def write(self, data, reply=False):
+        # Never blocks: pushes are written from other clients' threads while they hold a
+        # lobby's lock, so one stalled reader must not hold up the game or its other watchers
+        with self.write_lock:
+            if self.dropped:
+                raise SlowConsumer("Connection dropped")
+            size = len(data)
+            if not self.unsent_bytes:
+                self.reply_room = 0
+                try:
+                    sent = self.sock.send(data, SEND_FLAGS)
+                except BlockingIOError:
+                    sent = 0
+                if sent == size:
+                    self.metrics.sent(size)
+                    return
+                data = data[sent:]
+            if not within_send_buffer(self, self.send_buffer, self.unsent_bytes, len(data), reply):
+                self.drop()
+                raise SlowConsumer("Send buffer full")
+            self.metrics.sent(size)
+            self.unsent.append(data)
+            self.unsent_bytes += len(data)
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.write_backlog, daemon=True)
+                self.writer.start()
+
+    def write_backlog(self):
+        while True:
+            with self.write_lock:
+                if not self.unsent or self.dropped:
+                    self.writer = None
+                    return
+                data = b''.join(self.unsent)
+                self.unsent.clear()
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                with self.write_lock:
+                    self.writer = None
+                    self.dropped = True
+                    self.drained.notify_all()
+                return
+            with self.write_lock:
+                self.unsent_bytes -= len(data)
+                self.drained.notify_all()
+
+    def wait_writable(self):
+        # Called by the connection's reader before it takes more requests
+        with self.write_lock:
+            while self.unsent_bytes > self.send_buffer // READ_PAUSE_FRACTION and not self.dropped:
+                self.drained.wait()
+
+    def drop(self):
+        # Called with write_lock held. Shutting the socket down ends this connection's
+        # reader, which then unsubscribes it everywhere.
+        if self.dropped:
+            return
+        self.dropped = True
+        self.unsent.clear()
+        self.drained.notify_all()
+        self.metrics.dropped()
+        log.info("Dropping slow connection %s", self.addr)
+        self.disconnect()
+
+    def disconnect(self):
+        # Safe from any thread; the connection's own thread then cleans up
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        with self.write_lock:
+            self.dropped = True
+            self.unsent.clear()
+        self.sock.close()
+
+class AsyncClientProtocol(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.addr = None
+        self.player_id = None
+        self.reader = FrameReader()
+        self.limiter = None
+        # Why reading is paused: the client is not reading replies, or is over its rate limit
+        self.paused = set()
+        self.subscriptions = set()
+        self.lobbies = set()
+        self.identities = None
+        # Room over the send buffer limit taken by a large reply, see protocol.within_send_buffer
+        self.reply_room = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_SEND_BUFFER)
+        transport.set_write_buffer_limits(high=self.server.send_buffer // READ_PAUSE_FRACTION)
+        self.addr = transport.get_extra_info('peername')
+        self.player_id = self.server.sessions.new_player()
+        self.limiter = self.server.new_limiter()
+        self.server.metrics.connected()
+        log.debug("New connection from %s", self.addr)
+
+    def data_received(self, data):
+        self.server.metrics.received(len(data))
+        try:
+            self.reader.feed(data)
+            frames = self.server.handle_messages(self.reader, self)
+            if frames:
+                self.write(frames, reply=True)
+            backoff = self.limiter.backoff() if self.limiter is not None else 0.0
+            if backoff and 'limited' not in self.paused:
+                self.pause('limited')
+                asyncio.get_running_loop().call_later(backoff, self.resume, 'limited')
+        except Exception as e:
+            log.warning("Error handling client %s: %s", self.addr, e)
+            self.transport.close()
+
+    @property
+    def codec(self):
+        return self.reader.codec
+
+    def use(self, codec):
+        self.reader.codec = codec
+
+    def disconnect(self):
+        self.transport.abort()
+
+    def pause(self, reason):
+        if not self.paused:
+            self.transport.pause_reading()
+        self.paused.add(reason)
+
+    def resume(self, reason):
+        self.paused.discard(reason)
+        if not self.paused and not self.transport.is_closing():
+            self.transport.resume_reading()
+
+    def pause_writing(self):
+        # The client is not reading its replies, so it gets no more requests in until it does
+        self.pause('writing')
+
+    def resume_writing(self):
+        self.resume('writing')
+
+    def write(self, data, reply=False):
+        # The transport buffers whatever the socket will not take; a connection whose
+        # buffer outgrows the limit is reading too slowly and is dropped
+        if self.transport.is_closing():
+            raise SlowConsumer("Connection dropped")
+        buffered = self.transport.get_write_buffer_size()
+        if not buffered:
+            self.reply_room = 0
+        if not within_send_buffer(self, self.server.send_buffer, buffered, len(data), reply):
+            self.server.metrics.dropped()
+            log.info("Dropping slow connection %s", self.addr)
+            self.transport.abort()
+            raise SlowConsumer("Send buffer full")
+        self.transport.write(data)
+        self.server.metrics.sent(len(data))
+
+    def connection_lost(self, exc):
+        self.server.drop_connection(self)
+        self.server.metrics.disconnected()
+        log.debug("Connection from %s closed", self.addr)
+
+class FramesByCodec(dict):
+    # A message's frame per codec, encoded the first time a connection needs it
+    def __init__(self, message):
+        super().__init__()
+        self.message = message
+
+    def __missing__(self, codec):
+        frame = self[codec] = encode_frame(self.message, codec)
+        return frame
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    # Answers every GET with the metrics in Prometheus text format
+    def do_GET(self):
+        game_server = self.server.game_server
+        body = prometheus_text(game_server.metrics.snapshot(), game_server.lobbies.counters(),
+                               game_server.sessions.counters(), game_server.matchmaker.counters(),
+                               game_server.matchmaker.wait_summary()).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("Metrics request from %s", self.client_address)
 
 class Server:
-    def __init__(self):
-        self.lobbies = {}
+    def __init__(self, worker_index=0, worker_count=1, words=None, journal=None, send_buffer=MAX_SEND_BUFFER,
+                 rate_limit=CONNECTION_RATE, coalesce_window=COALESCE_WINDOW, match_size=MATCH_SIZE,
+                 match_wait=MATCH_WAIT, replays=None):
+        self.lobbies = LobbyRegistry()
+        self.words = words if words is not None else load_words()
+        # Plays the computer seats
+        self.solver = Solver(self.words)
+        # Behind a gateway each worker only hands out lobby codes that route to itself
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        self.metrics = Metrics()
+        self.send_buffer = send_buffer
+        # Requests per second allowed on each connection; 0 turns rate limiting off
+        self.rate_limit = rate_limit
+        self.coalesce_window = coalesce_window
+        self.matchmaker = Matchmaker(match_size, match_wait)
+        # Every game played from start to finish is recorded here, when given
+        self.replays = replays
+        self.sessions = Sessions(load_key(journal.directory) if journal is not None else None)
+        # Lobby changes are logged so a restarted server picks up every game where it was
+        self.journal = journal
+        if journal is not None:
+            self.recover()
+            journal.open()
+
+    def log(self, kind, lobby_code, version, *args):
+        # Called after the change, with the lobby's lock held; version is the one the change produced
+        if self.journal is not None:
+            self.journal.append([kind, lobby_code, version, *args])
+
+    def recover(self):
+        rows, records = self.journal.load()
+        # Recovery only allocates, so collections during it would find nothing to free
+        gc.disable()
+        try:
+            for lobby_code, *data in rows:
+                self.restore_lobby(lobby_code, GameSession.restore(data))
+            for record in records:
+                self.replay(record)
+        finally:
+            gc.enable()
+        # Every seated player gets the usual time to reconnect with their token
+        seats = {}
+        for lobby_code, game in self.lobbies.items():
+            for player_id in game.players:
+                if player_id > 0:
+                    seats.setdefault(player_id, []).append(lobby_code)
+        for player_id, lobby_codes in seats.items():
+            self.sessions.hold(player_id, lobby_codes)
+        log.info("Recovered %d lobbies", len(self.lobbies))
+
+    def restore_lobby(self, lobby_code, game):
+        self.lobbies.restore(lobby_code, game)
+        if game.is_game_over():
+            self.lobbies.finish(lobby_code)
+
+    def replay(self, record):
+        kind, lobby_code, version, *args = record
+        game = self.lobbies.get(lobby_code)
+        if kind == 'create' and game is None:
+            game = GameSession(args[0])
+            self.restore_lobby(lobby_code, game)
+        if game is None:
+            return
+        if kind == 'close':
+            self.lobbies.pop(lobby_code)
+            return
+        # The snapshot may already include changes logged after it was started; a lobby
+        # snapshotted while it was being created has no host yet
+        if game.version >= version:
+            return
+        if kind in ('create', 'join'):
+            game.add_player(*args)
+        elif kind == 'leave':
+            game.remove_player(*args)
+        elif kind == 'computer':
+            game.add_computer()
+        elif kind == 'start':
+            game.start_game(*args)
+            self.lobbies.restart(lobby_code)
+        elif kind == 'guess':
+            game.play(*args)
+            if game.is_game_over():
+                self.lobbies.finish(lobby_code)
+
+    def snapshot_rows(self):
+        for lobby_code, game in self.lobbies.items():
+            with game.lock:
+                yield [lobby_code, *game.snapshot()]
+
+    def snapshot_forever(self):
+        while True:
+            time.sleep(SNAPSHOT_INTERVAL)
+            if self.journal.written:
+                self.journal.snapshot(self.snapshot_rows)
+
+    def serve_metrics(self, host, port):
+        # A scrape endpoint on its own thread, so scrapes never wait behind game requests
+        httpd = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+        httpd.daemon_threads = True
+        httpd.game_server = self
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        log.info("Metrics on http://%s:%d/metrics", host, port)
+
+    def close(self):
+        # A snapshot on the way out makes the next start quick
+        if self.journal is not None:
+            self.journal.snapshot(self.snapshot_rows)
+            self.journal.close()
+        if self.replays is not None:
+            self.replays.close()
+
+    def generate_lobby_code(self):
+        while True:
+            lobby_code = generate_lobby_code()
+            if lobby_owner(lobby_code, self.worker_count) == self.worker_index:
+                return lobby_code
 
     def create_lobby(self, host, name):
-        lobby_code = ''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', k=6))
-        self.lobbies[lobby_code] = GameSession(host)
-        self.lobbies[lobby_code].add_player(host, name)
+        lobby_code, game = self.lobbies.create(lambda: GameSession(host), self.generate_lobby_code)
+        with game.lock:
+            game.add_player(host, name)
+            self.log('create', lobby_code, game.version, host, name)
         return lobby_code
 
-    def join_lobby(self, lobby_code, player, name):
+    def remove_lobby(self, lobby_code):
+        # Logged first: replay ignores records for lobbies it does not know
         if lobby_code in self.lobbies:
-            self.lobbies[lobby_code].add_player(player, name)
+            self.log('close', lobby_code, None)
+        game = self.lobbies.pop(lobby_code)
+        if game is None:
+            return
+        with game.lock:
+            subscribers = game.subscribers or ()
+            game.subscribers = None
+            self.record_game(game)
+        frames = FramesByCodec({'event': 'lobby_closed', 'lobby_code': lobby_code})
+        for connection in subscribers:
+            connection.subscriptions.discard(lobby_code)
+            try:
+                connection.write(frames[connection.codec])
+            except OSError:
+                pass
+        log.debug("Lobby %s closed", lobby_code)
+
+    def leave_lobby(self, lobby_code, player_id):
+        game = self.lobbies.get(lobby_code)
+        if game is None:
+            return
+        if player_id == game.host:
+            self.remove_lobby(lobby_code)
+        else:
+            with game.lock:
+                if player_id in game.player_names:
+                    game.remove_player(player_id)
+                    self.log('leave', lobby_code, game.version, player_id)
+                    # The turn may have passed to a computer seat
+                    self.play_computers(lobby_code, game)
+                self.publish(lobby_code, game)
+
+    def reap(self):
+        for lobby_code in self.lobbies.due():
+            self.remove_lobby(lobby_code)
+        for player_id, lobby_codes in self.sessions.due():
+            for lobby_code in lobby_codes:
+                self.leave_lobby(lobby_code, player_id)
+        for tickets in self.matchmaker.due():
+            self.form_match(tickets)
+        if self.replays is not None:
+            self.replays.flush()
+
+    def reap_forever(self):
+        while True:
+            time.sleep(REAP_INTERVAL)
+            self.reap()
+
+    async def reap_periodically(self):
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            self.reap()
+
+    def join_lobby(self, lobby_code, player, name):
+        # Joining a lobby the player already has a seat in keeps that seat
+        game = self.lobbies.get(lobby_code)
+        if game is not None:
+            if player in game.player_names:
+                return True
+            game.add_player(player, name)
+            self.log('join', lobby_code, game.version, player, name)
             return True
         return False
 
+    def form_match(self, tickets, requester=None):
+        # Seats matched players in a new lobby, the first to queue as its host, fills any
+        # seats left with computer players and starts the game in their category. Every
+        # player is subscribed and told with a match_found push, except the requester, whose
+        # reply carries the same. Returns (lobby code, its first update).
+        host = tickets[0]
+        category = host.category
+        lobby_code = self.create_lobby(host.player_id, host.name)
+        game = self.lobbies.get(lobby_code)
+        with game.lock:
+            for ticket in tickets[1:]:
+                self.join_lobby(lobby_code, ticket.player_id, ticket.name)
+            for _ in range(min(MAX_COMPUTERS, self.matchmaker.size - len(tickets))):
+                game.add_computer()
+                self.log('computer', lobby_code, game.version)
+            self.begin_game(lobby_code, game, category)
+            for ticket in tickets:
+                ticket.seat.lobbies.add(lobby_code)
+                self.subscribe(game, lobby_code, seat_owner(ticket.seat)[0])
+            update = self.lobby_update(lobby_code, game)
+            game.published_version = game.version
+            for ticket in tickets:
+                if ticket is requester:
+                    continue
+                connection, label = seat_owner(ticket.seat)
+                push = {'event': 'match_found', 'lobby_code': lobby_code, 'update': update}
+                if label is not None:
+                    push['player'] = label
+                try:
+                    connection.write(encode_frame(push, connection.codec))
+                except OSError:
+                    self.discard_subscriber(game, connection)
+                    connection.subscriptions.discard(lobby_code)
+        log.debug("Matched %d players in lobby %s", len(tickets), lobby_code)
+        return lobby_code, update
+
+    def subscribe(self, game, lobby_code, connection, spectator=False):
+        # Subscriber sets live on the session and are guarded by its lock
+        if game.subscribers is None:
+            game.subscribers = set()
+        game.subscribers.add(connection)
+        connection.subscriptions.add(lobby_code)
+        if spectator:
+            if game.spectators is None:
+                game.spectators = set()
+            game.spectators.add(connection)
+
+    def unsubscribe(self, lobby_code, connection):
+        connection.subscriptions.discard(lobby_code)
+        game = self.lobbies.get(lobby_code)
+        if game is None:
+            return
+        with game.lock:
+            self.discard_subscriber(game, connection)
+
+    def discard_subscriber(self, game, connection):
+        # Called with game.lock held
+        if game.subscribers is not None:
+            game.subscribers.discard(connection)
+        if game.spectators is not None:
+            game.spectators.discard(connection)
+
+    def drop_connection(self, connection):
+        # Matching needs players who can be told where to go
+        self.matchmaker.cancel(connection.player_id)
+        for lobby_code in list(connection.subscriptions):
+            self.unsubscribe(lobby_code, connection)
+        # A player with a session keeps their seats for a while, so a dropped connection
+        # can come back with its token; anyone else leaves straight away
+        if not self.sessions.detach(connection, connection.lobbies):
+            for lobby_code in list(connection.lobbies):
+                self.leave_lobby(lobby_code, connection.player_id)
+        connection.lobbies.clear()
+        # Players multiplexed on the connection have no session and leave with it
+        if connection.identities:
+            for identity in connection.identities.values():
+                self.matchmaker.cancel(identity.player_id)
+                for lobby_code in identity.lobbies:
+                    self.leave_lobby(lobby_code, identity.player_id)
+            connection.identities = None
+
+    def start_session(self, connection, token):
+        # Binds the connection to the player its token was issued for, or keeps the new
+        # identity it was given. Returns (token, whether seats were taken over).
+        player_id = self.sessions.player(token) if token is not None else None
+        if player_id is None:
+            player_id = connection.player_id
+        elif player_id != connection.player_id:
+            # Hello comes first, but seats taken under the temporary identity are given up
+            for lobby_code in list(connection.lobbies):
+                self.leave_lobby(lobby_code, connection.player_id)
+            connection.lobbies.clear()
+            connection.player_id = player_id
+        previous, lobby_codes = self.sessions.attach(player_id, connection)
+        resumed = lobby_codes is not None
+        if lobby_codes:
+            connection.lobbies.update(lobby_codes)
+        if previous is not None and previous is not connection:
+            # The client gave up on its old connection before the server noticed it was gone,
+            # or another client holds the token; either way the old one should not come back
+            connection.lobbies.update(previous.lobbies)
+            previous.lobbies.clear()
+            try:
+                previous.write(encode_frame({'event': 'session_taken'}, previous.codec))
+            except OSError:
+                pass
+            previous.disconnect()
+            resumed = True
+        return self.sessions.token(player_id), resumed
+
+    def lobby_status(self, game):
+        return {
+            'player_count': len(game.players),
+            'players': list(game.player_names.values()),
+            'ready_to_start': game.is_ready_to_start(),
+            'game_started': game.game_started,
+            'spectators': len(game.spectators) if game.spectators else 0
+        }
+
+    def lobby_update(self, lobby_code, game, since=None):
+        update = {
+            'event': 'lobby_update',
+            'lobby_code': lobby_code,
+            'lobby': self.lobby_status(game),
+            'game_state': None,
+            'version': game.version
+        }
+        if game.game_started:
+            delta = game.get_state_delta(since) if since is not None else None
+            if delta is not None:
+                update['game_delta'] = delta
+            else:
+                update['game_state'] = game.get_game_state()
+        return update
+
+    def publish(self, lobby_code, game):
+        # Called with game.lock held
+        if not game.subscribers:
+            return
+        # The update is encoded once per wire format and the same bytes are written to every
+        # subscriber, so the game part is a delta against the previously published version
+        frames = FramesByCodec(self.lobby_update(lobby_code, game, game.published_version))
+        if game.game_started:
+            game.published_version = game.version
+        for connection in list(game.subscribers):
+            try:
+                connection.write(frames[connection.codec])
+            except OSError:
+                # Includes connections dropped for falling too far behind
+                self.discard_subscriber(game, connection)
+                connection.subscriptions.discard(lobby_code)
+
+    def begin_game(self, lobby_code, game, category):
+        # Called with game.lock held. A game still in progress is recorded as abandoned.
+        self.record_game(game)
+        word_id = self.words.random_index(category)
+        game.start_game(category, self.words.word(category, word_id), word_id)
+        self.lobbies.restart(lobby_code)
+        self.log('start', lobby_code, game.version, category, game.word, word_id)
+        if self.replays is not None and not game.is_game_over():
+            game.recording = GameRecord()
+        self.play_computers(lobby_code, game)
+
+    def play_guess(self, lobby_code, game, letter):
+        # Called with game.lock held, for a turn that has already been validated
+        computer = game.players[game.current_player] < 0
+        is_correct = game.play(letter)
+        if game.recording is not None:
+            game.recording.move(letter, is_correct, computer)
+        self.log('guess', lobby_code, game.version, letter)
+        if game.is_game_over():
+            self.lobbies.finish(lobby_code)
+            self.record_game(game)
+
+    def record_game(self, game):
+        # Called with game.lock held. Games restored after a restart are not recorded,
+        # since their moves before it are gone.
+        recording = game.recording
+        if recording is None:
+            return
+        game.recording = None
+        outcome = SOLVED if game.is_won() else HANGED if game.is_game_over() else ABANDONED
+        computers = sum(1 for player_id in game.players if player_id < 0)
+        self.replays.append(recording.encode(game.category, game.word_id, outcome, len(game.players), computers))
+
+    def play_computers(self, lobby_code, game):
+        # Computer seats move as soon as the turn reaches them
+        while game.is_computer_turn():
+            letter = self.solver.best_letter(game.category, game.mask.decode(), game.guessed_letters)
+            self.play_guess(lobby_code, game, letter)
+
     def handle_client(self, conn, addr):
-        print(f"New connection from {addr}")
-        player_id = addr[1]
+        log.debug("New connection from %s", addr)
+        connection = ThreadedConnection(conn, addr, self.metrics, self.sessions.new_player(), self.send_buffer,
+                                        self.new_limiter())
+        self.metrics.connected()
 
         while True:
             try:
-                data = conn.recv(1024).decode()
-                if not data:
+                received = connection.stream.bytes_received
+                messages = connection.stream.receive_all()
+                self.metrics.received(connection.stream.bytes_received - received)
+                if not messages:
                     break
 
-                message = json.loads(data)
-                response = self.process_message(message, player_id)
-                conn.sendall(json.dumps(response).encode())
+                # Pipelined requests are answered in order with a single write
+                connection.write(self.handle_messages(messages, connection), reply=True)
+                connection.wait_writable()
+                if connection.limiter is not None:
+                    backoff = connection.limiter.backoff()
+                    if backoff:
+                        time.sleep(backoff)
 
             except Exception as e:
-                print(f"Error handling client {addr}: {e}")
+                log.warning("Error handling client %s: %s", addr, e)
                 break
 
-        print(f"Connection from {addr} closed")
-        conn.close()
+        self.drop_connection(connection)
+        self.metrics.disconnected()
+        log.debug("Connection from %s closed", addr)
+        connection.close()
 
-    def process_message(self, message, player_id):
+    def new_limiter(self):
+        if not self.rate_limit:
+            return None
+        return RateLimiter(self.rate_limit, 2 * self.rate_limit)
+
+    def handle_messages(self, messages, connection):
+        # Each reply is encoded in the format its request arrived in, so the reply to a
+        # hello that switches formats still uses the old one
+        frames = []
+        for message in messages:
+            codec = connection.codec
+            action = message.get('action')
+            if connection.limiter is not None:
+                retry_after = connection.limiter.check(action)
+                if retry_after:
+                    # The request is not run, so the client can safely send it again
+                    self.metrics.limited()
+                    response = {'status': 'error', 'message': 'Too many requests', 'retry_after': round(retry_after, 3)}
+                    if 'id' in message:
+                        response['id'] = message['id']
+                    frames.append(encode_frame(response, codec))
+                    continue
+            if action in COALESCED_ACTIONS and self.coalesce_window:
+                frame = self.coalesced_reply(message, connection, codec)
+                if frame is not None:
+                    frames.append(frame)
+                    continue
+            frames.append(encode_frame(self.handle_message(message, connection), codec))
+        return b''.join(frames)
+
+    def coalesced_reply(self, message, connection, codec):
+        # Identical reads of a lobby within coalesce_window, while its version stays the same,
+        # share one computed and encoded reply; only the request id is added to each. None if
+        # the lobby is unknown, for the normal path to answer. A failed read is not shared.
+        start = time.perf_counter_ns()
+        lobby_code = message.get('lobby_code')
+        game = self.lobbies.get(lobby_code) if lobby_code is not None else None
+        if game is None:
+            return None
+        action = message['action']
+        key = (action, message.get('since'))
+        now = time.monotonic()
+        # Read before the reply is built, so a change made meanwhile only makes the entry stale
+        version = game.version
+        replies = game.replies
+        cached = replies.get(key) if replies is not None else None
+        if cached is None or cached.version != version or cached.expires <= now:
+            response = self.process_message(message, connection.player_id, connection)
+            if response.get('status') != 'success':
+                self.metrics.record(action, time.perf_counter_ns() - start, False)
+                if 'id' in message:
+                    response['id'] = message['id']
+                return encode_frame(response, codec)
+            cached = CachedReply(version, now + self.coalesce_window, response)
+            if replies is None or len(replies) >= MAX_COALESCED_REPLIES:
+                replies = game.replies = {}
+            replies[key] = cached
+        else:
+            self.lobbies.touch(lobby_code)
+            self.metrics.coalesced()
+        payload = cached.payload(codec)
+        if 'id' in message:
+            payload = codec.add_id(payload, message['id'])
+        self.metrics.record(action, time.perf_counter_ns() - start, True)
+        return HEADER.pack(len(payload)) + payload
+
+    def handle_message(self, message, connection):
+        start = time.perf_counter_ns()
+        response = self.process_message(message, connection.player_id, connection)
+        action = message.get('action')
+        self.metrics.record(action if action in ACTIONS else 'invalid', time.perf_counter_ns() - start,
+                            response.get('status') == 'success')
+        if 'id' in message:
+            response['id'] = message['id']
+        return response
+
+    def process_message(self, message, player_id, connection=None):
         action = message.get('action')
+        lobby_code = message.get('lobby_code')
+        game = self.lobbies.get(lobby_code) if lobby_code is not None else None
+        if game is None:
+            if action in LOBBY_ACTIONS:
+                return {'status': 'error', 'message': 'Invalid lobby code'}
+            return self.apply_action(action, message, player_id, connection, lobby_code, None)
 
+        self.lobbies.touch(lobby_code)
+        # Everything that reads or changes a lobby runs under that lobby's own lock,
+        # so requests for different lobbies never wait on each other
+        with game.lock:
+            return self.apply_action(action, message, player_id, connection, lobby_code, game)
+
+    def apply_action(self, action, message, player_id, connection, lobby_code, game):
         if action == 'create_lobby':
             lobby_code = self.create_lobby(player_id, message['name'])
+            if connection is not None:
+                connection.lobbies.add(lobby_code)
             return {'status': 'success', 'lobby_code': lobby_code}
 
         elif action == 'join_lobby':
-            lobby_code = message['lobby_code']
             if self.join_lobby(lobby_code, player_id, message['name']):
+                if connection is not None:
+                    connection.lobbies.add(lobby_code)
+                self.publish(lobby_code, game)
                 return {'status': 'success', 'lobby_code': lobby_code}
             else:
                 return {'status': 'error', 'message': 'Invalid lobby code'}
 
         elif action == 'check_lobby_status':
-            lobby_code = message['lobby_code']
-            game = self.lobbies[lobby_code]
-            return {
-                'status': 'success',
-                'player_count': len(game.players),
-                'players': list(game.player_names.values()),
-                'ready_to_start': game.is_ready_to_start(),
-                'game_started': game.game_started
-            }
+            return {'status': 'success', **self.lobby_status(game)}
 
         elif action == 'start_game':
-            lobby_code = message['lobby_code']
-            game = self.lobbies[lobby_code]
             if player_id == game.host and game.is_ready_to_start():
                 return {'status': 'success'}
             else:
                 return {'status': 'error', 'message': 'Not authorized to start the game'}
 
+        elif action == 'add_computer':
+            if player_id != game.host or game.game_started:
+                return {'status': 'error', 'message': 'Not authorized to add a computer'}
+            if sum(1 for player in game.players if player < 0) >= MAX_COMPUTERS:
+                return {'status': 'error', 'message': 'Too many computer players'}
+            game.add_computer()
+            self.log('computer', lobby_code, game.version)
+            self.publish(lobby_code, game)
+            return {'status': 'success'}
+
         elif action == 'set_category':
-            lobby_code = message['lobby_code']
             category = message['category']
-            game = self.lobbies[lobby_code]
-            game.start_game(category)
+            if not self.words.count(category):
+                return {'status': 'error', 'message': 'Unknown category'}
+            self.begin_game(lobby_code, game, category)
+            self.publish(lobby_code, game)
             return {'status': 'success'}
 
         elif action == 'guess':
-            lobby_code = message['lobby_code']
             letter = message['letter']
-            game = self.lobbies[lobby_code]
             
             if game.players[game.current_player] != player_id:
                 return {'status': 'error', 'message': 'Not your turn'}
+            if letter not in LETTER_BITS:
+                return {'status': 'error', 'message': 'Invalid letter'}
+            if not game.game_started or game.is_game_over():
+                return {'status': 'error', 'message': 'Game is not in progress'}
 
-            is_correct = game.guess(letter)
-            game.current_player = (game.current_player + 1) % len(game.players)
-            
-            if all(letter in game.guessed_letters for letter in game.word):
-                game.winner = game.player_names[player_id]
-            
+            self.play_guess(lobby_code, game, letter)
+            self.play_computers(lobby_code, game)
+
+            self.publish(lobby_code, game)
             return {'status': 'success', 'game_state': game.get_game_state()}
 
 
         elif action == 'get_game_state':
-            lobby_code = message['lobby_code']
-            game = self.lobbies[lobby_code]
+            since = message.get('since')
+            if since is not None:
+                if since == game.version:
+                    return {'status': 'success', 'unchanged': True, 'version': since}
+                delta = game.get_state_delta(since)
+                if delta is not None:
+                    return {'status': 'success', 'game_delta': delta}
             return {'status': 'success', 'game_state': game.get_game_state()}
 
+        elif action == 'subscribe':
+            if connection is None:
+                return {'status': 'error', 'message': 'Subscriptions need a connection'}
+            self.subscribe(game, lobby_code, connection)
+            return {'status': 'success', 'update': self.lobby_update(lobby_code, game)}
+
+        elif action == 'spectate':
+            # Watching needs no seat and changes nothing, so nothing is published; the
+            # spectator count reaches the others with the next update
+            if connection is None:
+                return {'status': 'error', 'message': 'Subscriptions need a connection'}
+            self.subscribe(game, lobby_code, connection, spectator=True)
+            return {'status': 'success', 'update': self.lobby_update(lobby_code, game)}
+
+        elif action == 'unsubscribe':
+            if connection is not None:
+                self.unsubscribe(lobby_code, connection)
+            return {'status': 'success'}
+
+        elif action == 'hello':
+            # Picks the first wire format the client offers that the server knows; clients
+            # wait for this reply before sending anything else
+            name = next((name for name in message.get('formats', ()) if name in CODECS), JSON_FORMAT)
+            if connection is None:
+                return {'status': 'success', 'format': name}
+            connection.use(CODECS[name])
+            token, resumed = self.start_session(connection, message.get('session'))
+            return {'status': 'success', 'format': name, 'session': token, 'resumed': resumed}
+
+        elif action == 'quick_match':
+            # Queues the player for the category. If that fills a lobby the reply carries it;
+            # otherwise a match_found push follows once the player is matched.
+            category = message['category']
+            name = message['name']
+            if connection is None:
+                return {'status': 'error', 'message': 'Matchmaking needs a connection'}
+            if not isinstance(name, str) or not self.words.count(category):
+                return {'status': 'error', 'message': 'Unknown category'}
+            ticket = Ticket(player_id, name, category, connection)
+            tickets = self.matchmaker.enqueue(ticket)
+            if tickets is None:
+                return {'status': 'success', 'queued': True}
+            lobby_code, update = self.form_match(tickets, ticket)
+            return {'status': 'success', 'queued': False, 'lobby_code': lobby_code, 'update': update}
+
+        elif action == 'leave_queue':
+            if not self.matchmaker.cancel(player_id):
+                return {'status': 'error', 'message': 'Not in the queue'}
+            return {'status': 'success'}
+
+        elif action == 'stats':
+            return {'status': 'success', 'lobbies': self.lobbies.counters(), 'sessions': self.sessions.counters(),
+                    'matchmaking': {**self.matchmaker.counters(), 'wait_ms': self.matchmaker.wait_summary()},
+                    'metrics': self.metrics.snapshot()}
+
+        elif action == 'batch':
+            requests = message.get('requests')
+            if not isinstance(requests, list) or len(requests) > MAX_BATCH_SIZE:
+                return {'status': 'error', 'message': f'A batch holds a list of up to {MAX_BATCH_SIZE} requests'}
+            checked = {}
+            return {'status': 'success',
+                    'results': [self.run_batched(request, player_id, connection, checked) for request in requests]}
+
         return {'status': 'error', 'message': 'Invalid action'}
 
-    def start(self):
+    def run_batched(self, request, player_id, connection, checked):
+        # One request of a batch, answered as if it had come on its own. With a 'player'
+        # label it acts as that player instead of the connection's own. checked holds the
+        # rate limit outcome of each read already charged in this batch.
+        if not isinstance(request, dict) or request.get('action') in UNBATCHED_ACTIONS:
+            return {'status': 'error', 'message': 'Invalid request'}
+        seat = connection
+        label = request.get('player')
+        if label is not None:
+            seat = self.identity(connection, label)
+            if seat is None:
+                return {'status': 'error', 'message': 'Invalid player'}
+            player_id = seat.player_id
+            if request.get('action') in SUBSCRIPTION_ACTIONS:
+                seat = connection
+        if connection is not None and connection.limiter is not None:
+            # Reads count once per batch against their action's limit: the batch is limited
+            # itself and holds at most MAX_BATCH_SIZE of them. Anything else counts each time.
+            action = request.get('action')
+            retry_after = checked.get(action)
+            if retry_after is None:
+                retry_after = connection.limiter.check_action(action)
+                if action in COALESCED_ACTIONS:
+                    checked[action] = retry_after
+            if retry_after:
+                self.metrics.limited()
+                return {'status': 'error', 'message': 'Too many requests', 'retry_after': round(retry_after, 3)}
+        try:
+            return self.process_message(request, player_id, seat)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return {'status': 'error', 'message': 'Invalid request'}
+
+    def identity(self, connection, label):
+        if connection is None or not isinstance(label, str):
+            return None
+        if connection.identities is None:
+            connection.identities = {}
+        identity = connection.identities.get(label)
+        if identity is None:
+            if len(connection.identities) >= MAX_IDENTITIES:
+                return None
+            identity = connection.identities[label] = Identity(self.sessions.new_player(), connection, label)
+        return identity
+
+    def start(self, host=HOST, port=PORT):
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.bind((HOST, PORT))
+            # A restarted server rebinds while its old connections are still in TIME_WAIT
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind((host, port))
             s.listen()
-            print(f"Server listening on {HOST}:{PORT}")
+            log.info("Server listening on %s:%d", host, port)
+            threading.Thread(target=self.reap_forever, daemon=True).start()
+            if self.journal is not None:
+                threading.Thread(target=self.snapshot_forever, daemon=True).start()
 
             while True:
                 conn, addr = s.accept()
-                thread = threading.Thread(target=self.handle_client, args=(conn, addr))
+                # Daemon threads, so open connections do not keep a stopping server alive
+                thread = threading.Thread(target=self.handle_client, args=(conn, addr), daemon=True)
                 thread.start()
 
+    async def serve_async(self, host=HOST, port=PORT):
+        # One event loop serves every connection, so there is no per-client thread stack
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: AsyncClientProtocol(self), host, port, backlog=1024)
+        log.info("Server listening on %s:%d (asyncio)", host, port)
+        reaper = asyncio.create_task(self.reap_periodically())
+        if self.journal is not None:
+            # Snapshots are written off the event loop; each lobby is locked only while it is copied
+            threading.Thread(target=self.snapshot_forever, daemon=True).start()
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                reaper.cancel()
+
+    def start_async(self, host=HOST, port=PORT):
+        asyncio.run(self.serve_async(host, port))
+
+def configure_logging(level):
+    # Records are queued and written to stdout by a listener thread, so a slow terminal or
+    # pipe never holds up a request. Messages below the level are dropped before formatting.
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    listener = logging.handlers.QueueListener(records, handler)
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+    listener.start()
+    return listener
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Hangman game server")
+    parser.add_argument('--mode', choices=['threaded', 'asyncio'], default='threaded',
+                        help="threaded: one thread per connection, asyncio: single event loop")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--worker-index', type=int, default=0,
+                        help="index of this worker behind gateway.py")
+    parser.add_argument('--worker-count', type=int, default=1,
+                        help="number of workers behind gateway.py")
+    parser.add_argument('--words', help="word dictionary file built with dictionary.py (default: built-in lists)")
+    parser.add_argument('--data-dir',
+                        help="directory for the lobby log and snapshots; lobbies survive restarts when given")
+    parser.add_argument('--replay-dir',
+                        help="record every game (word, guesses with their times, outcome) in this directory; "
+                             "see replays.py")
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve metrics for Prometheus on this port (also available through the stats action)")
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                        help="DEBUG also logs every connection")
+    parser.add_argument('--send-buffer', type=int, default=MAX_SEND_BUFFER,
+                        help="bytes a connection may fall behind by before it is dropped")
+    parser.add_argument('--rate-limit', type=float, default=CONNECTION_RATE,
+                        help="requests per second allowed on each connection, with bursts of twice that "
+                             "(some actions have lower limits); 0 turns limiting off")
+    parser.add_argument('--coalesce-window', type=float, default=COALESCE_WINDOW,
+                        help="seconds during which identical lobby reads share one reply; 0 turns this off")
+    parser.add_argument('--match-size', type=int, choices=range(2, MAX_COMPUTERS + 2), default=MATCH_SIZE,
+                        metavar=f"2-{MAX_COMPUTERS + 1}", help="players in a lobby formed by quick_match")
+    parser.add_argument('--match-wait', type=float, default=MATCH_WAIT,
+                        help="seconds a quick_match player waits for others before computers fill the lobby")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    server = Server()
-    server.start()
+    args = parse_args()
+    listener = configure_logging(args.log_level)
+    journal = Journal(args.data_dir) if args.data_dir else None
+    replays = ReplayLog(args.replay_dir) if args.replay_dir else None
+    server = Server(args.worker_index, args.worker_count, load_words(args.words), journal, args.send_buffer,
+                    args.rate_limit, args.coalesce_window, args.match_size, args.match_wait, replays)
+    if args.metrics_port:
+        server.serve_metrics(args.host, args.metrics_port)
+    # Deploys stop the server with SIGTERM; exiting through sys.exit lets close() run
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if args.mode == 'asyncio':
+            server.start_async(args.host, args.port)
+        else:
+            server.start(args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        listener.stop()
@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import struct
+import threading
+import time
+from collections import deque
+
+RESUME_TIMEOUT = 30.0
+KEY_FILE = 'session.key'
+KEY_SIZE = 32
+MAC_SIZE = 16
+PLAYER_ID = struct.Struct('!Q')
+
+def load_key(directory):
+    # The key lives next to the lobby log, so tokens stay valid for lobbies recovered after a restart
+    path = os.path.join(directory, KEY_FILE)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    key = secrets.token_bytes(KEY_SIZE)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process created it first
+        with open(path, 'rb') as f:
+            return f.read()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+        f.flush()
+        os.fsync(f.fileno())
+    return key
+
+class Sessions:
+    # Server-issued player identities. A token is a player id plus an HMAC of it, so checking
+    # one needs no table and survives restarts that keep the key. Player ids are random, so
+    # a token never resolves to some later player.
+    #
+    # A player whose connection drops keeps their lobby seats for resume_timeout; a new
+    # connection presenting their token within that time takes the seats over.
+    def __init__(self, key=None, resume_timeout=RESUME_TIMEOUT, clock=time.monotonic):
+        self.key = key if key is not None else secrets.token_bytes(KEY_SIZE)
+        self.resume_timeout = resume_timeout
+        self.clock = clock
+        self.lock = threading.Lock()
+        # player id -> the connection currently holding the identity
+        self.connections = {}
+        # player id -> (deadline, lobby codes) for players waiting to resume
+        self.detached = {}
+        # (deadline, player id) in detach order; stale entries are skipped when they come due
+        self.expiry = deque()
+        self.resumed = 0
+        self.expired = 0
+
+    def new_player(self):
+        return secrets.randbits(62) + 1
+
+    def token(self, player_id):
+        data = PLAYER_ID.pack(player_id)
+        mac = hmac.new(self.key, data, hashlib.sha256).digest()[:MAC_SIZE]
+        return base64.urlsafe_b64encode(data + mac).decode()
+
+    def player(self, token):
+        # The player id a token was issued for, or None if it was not issued with this key
+        try:
+            raw = base64.urlsafe_b64decode(token.encode())
+        except (ValueError, AttributeError):
+            return None
+        if len(raw) != PLAYER_ID.size + MAC_SIZE:
+            return None
+        data, mac = raw[:PLAYER_ID.size], raw[PLAYER_ID.size:]
+        if not hmac.compare_digest(mac, hmac.new(self.key, data, hashlib.sha256).digest()[:MAC_SIZE]):
+            return None
+        return PLAYER_ID.unpack(data)[0]
+
+    def attach(self, player_id, connection):
+        # Returns (the connection that held the identity before, or None; the lobby codes
+        # the player keeps, or None)
+        with self.lock:
+            previous = self.connections.get(player_id)
+            self.connections[player_id] = connection
+            held = self.detached.pop(player_id, None)
+            if previous is not None or held is not None:
+                self.resumed += 1
+        return previous, held[1] if held is not None else None
+
+    def detach(self, connection, lobbies):
+        # True if the connection held its identity and the player's seats are now kept
+        with self.lock:
+            if self.connections.get(connection.player_id) is not connection:
+                return False
+            del self.connections[connection.player_id]
+            self.hold(connection.player_id, lobbies)
+        return True
+
+    def hold(self, player_id, lobbies):
+        # Called with self.lock held, or during recovery
+        deadline = self.clock() + self.resume_timeout
+        self.detached[player_id] = (deadline, set(lobbies))
+        self.expiry.append((deadline, player_id))
+
+    def due(self):
+        # (player id, lobby codes) for players whose time to resume has run out
+        now = self.clock()
+        expired = []
+        with self.lock:
+            while self.expiry and self.expiry[0][0] <= now:
+                deadline, player_id = self.expiry.popleft()
+                held = self.detached.get(player_id)
+                if held is None or held[0] != deadline:
+                    continue
+                del self.detached[player_id]
+                self.expired += 1
+                expired.append((player_id, held[1]))
+        return expired
+
+    def counters(self):
+        with self.lock:
+            return {
+                'connected': len(self.connections),
+                'detached': len(self.detached),
+                'resumed': self.resumed,
+                'expired': self.expired
+            }
@@ -0,0 +1,240 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import string
+import sys
+import time
+
+from dictionary import load as load_words
+from server import MAX_WRONG_GUESSES, GameSession
+from solver import Solver
+
+ALPHABET = string.ascii_uppercase
+# Wrong-guess limits reported by default, around the server's own
+LIMITS = tuple(range(MAX_WRONG_GUESSES - 2, MAX_WRONG_GUESSES + 3))
+GAMES_PER_WORD = 1000
+# Games in one task handed to a worker; enough to make the hand-off cost negligible
+TASK_GAMES = 5_000
+# Letter weights roughly matching English text
+FREQUENCIES = {
+    'E': 12.7, 'T': 9.1, 'A': 8.2, 'O': 7.5, 'I': 7.0, 'N': 6.7, 'S': 6.3, 'H': 6.1, 'R': 6.0,
+    'D': 4.3, 'L': 4.0, 'C': 2.8, 'U': 2.8, 'M': 2.4, 'W': 2.4, 'F': 2.2, 'G': 2.0, 'Y': 2.0,
+    'P': 1.9, 'B': 1.5, 'V': 1.0, 'K': 0.8, 'J': 0.2, 'X': 0.2, 'Q': 0.1, 'Z': 0.1
+}
+
+class RandomStrategy:
+    # Any letter not guessed yet, all equally likely
+    deterministic = False
+
+    def __init__(self, words):
+        pass
+
+    def letters(self, session, rng):
+        return rng.sample(ALPHABET, len(ALPHABET))
+
+class FrequencyStrategy:
+    # Letters not guessed yet, drawn with their frequency in English as weights, like a
+    # player who knows E is a better bet than Z but has no word list in mind
+    deterministic = False
+
+    def __init__(self, words):
+        self.exponents = {letter: 1 / weight for letter, weight in FREQUENCIES.items()}
+
+    def letters(self, session, rng):
+        # Weighted sampling without replacement in one sort: each letter's key is a uniform
+        # draw raised to 1 / weight
+        exponents = self.exponents
+        return sorted(ALPHABET, key=lambda letter: rng.random() ** exponents[letter], reverse=True)
+
+class SolverStrategy:
+    # The computer player's choices (solver.py), which depend only on the word, so each
+    # word is played once
+    deterministic = True
+
+    def __init__(self, words):
+        self.solver = Solver(words)
+
+    def letters(self, session, rng):
+        while True:
+            yield self.solver.best_letter(session.category, session.mask.decode(), session.guessed_letters)
+
+STRATEGIES = {'random': RandomStrategy, 'frequency': FrequencyStrategy, 'solver': SolverStrategy}
+
+def play(strategy, category, word, rng):
+    # One game on a real GameSession, played until the word is solved whatever the number
+    # of misses, so that one game answers for every wrong-guess limit: under a limit the
+    # game is won if fewer misses than that came first. Returns the number of guesses and
+    # the guess number of each miss.
+    session = GameSession(1)
+    session.add_player(1, "Simulator")
+    session.start_game(category, word)
+    guesses = 0
+    misses = []
+    for letter in strategy.letters(session, rng):
+        guesses += 1
+        if not session.guess(letter):
+            misses.append(guesses)
+        if session.is_won():
+            break
+    return guesses, misses
+
+def new_totals(limits):
+    # games, misses before solving, then per limit the wins and the guesses played
+    return [0, 0] + [0] * (2 * len(limits))
+
+def add_game(totals, limits, guesses, misses):
+    totals[0] += 1
+    totals[1] += len(misses)
+    for i, limit in enumerate(limits):
+        if len(misses) < limit:
+            totals[2 + i] += 1
+            totals[2 + len(limits) + i] += guesses
+        else:
+            totals[2 + len(limits) + i] += misses[limit - 1]
+
+def merge_totals(totals, other):
+    for i, value in enumerate(other):
+        totals[i] += value
+
+# Set in each worker process by start_worker
+worker = None
+
+def start_worker(words_path, strategy, limits):
+    global worker
+    words = load_words(words_path)
+    worker = (words, STRATEGIES[strategy](words), limits)
+
+def run_task(task):
+    # Plays games of a run of words in one category. Every task has its own seed, so the
+    # results do not depend on how many processes there are or which one ran the task.
+    category, first, last, games, seed = task
+    words, strategy, limits = worker
+    rng = random.Random(seed)
+    results = {}
+    for index in range(first, last):
+        word = words.word(category, index)
+        totals = results[index] = new_totals(limits)
+        for _ in range(games):
+            guesses, misses = play(strategy, category, word, rng)
+            add_game(totals, limits, guesses, misses)
+    return category, results
+
+def make_tasks(words, games_per_word, seed, categories=None):
+    # Splits the games into tasks of about TASK_GAMES: runs of words for small game counts,
+    # or rounds of one word's games for large ones
+    tasks = []
+    words_per_task = max(1, TASK_GAMES // games_per_word)
+    rounds = -(-games_per_word // TASK_GAMES)
+    for category in categories or words.names():
+        for first in range(0, words.count(category), words_per_task):
+            last = min(first + words_per_task, words.count(category))
+            for round_number in range(rounds):
+                games = min(TASK_GAMES, games_per_word - round_number * TASK_GAMES)
+                tasks.append((category, first, last, games, seed * 1_000_003 + len(tasks)))
+    return tasks
+
+def simulate(words_path=None, strategy='random', games_per_word=GAMES_PER_WORD, processes=1, seed=1,
+             limits=LIMITS, categories=None):
+    # Returns {category: {word index: totals}} and the number of games played
+    if STRATEGIES[strategy].deterministic:
+        games_per_word = 1
+    tasks = make_tasks(load_words(words_path), games_per_word, seed, categories)
+    results = {}
+    if processes == 1:
+        start_worker(words_path, strategy, limits)
+        outputs = map(run_task, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes, start_worker, (words_path, strategy, limits))
+        outputs = pool.imap_unordered(run_task, tasks)
+    try:
+        for category, task_results in outputs:
+            category_results = results.setdefault(category, {})
+            for index, totals in task_results.items():
+                if index in category_results:
+                    merge_totals(category_results[index], totals)
+                else:
+                    category_results[index] = totals
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    games = sum(totals[0] for category_results in results.values() for totals in category_results.values())
+    return results, games
+
+def difficulty(totals):
+    # Average misses before the word is solved; unlike a win rate it does not depend on the limit
+    return totals[1] / totals[0]
+
+def parse_limits(value):
+    limits = tuple(sorted({int(limit) for limit in value.split(',')}))
+    if not limits or limits[0] < 1 or limits[-1] > len(ALPHABET):
+        raise argparse.ArgumentTypeError("limits must be between 1 and 26")
+    return limits
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Play many simulated games to measure word difficulty")
+    parser.add_argument('--words', help="word dictionary file built with dictionary.py (default: built-in lists)")
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='frequency',
+                        help="how letters are guessed (solver plays each word once, as it never varies)")
+    parser.add_argument('--games', type=int, default=GAMES_PER_WORD, help="games per word")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--limits', type=parse_limits, default=LIMITS,
+                        help=f"comma-separated wrong-guess limits to report win rates for "
+                             f"(default: {','.join(map(str, LIMITS))}; the server uses {MAX_WRONG_GUESSES})")
+    parser.add_argument('--category', action='append', help="simulate only this category (may be repeated)")
+    parser.add_argument('--top', type=int, default=10, help="hardest and easiest words to list")
+    parser.add_argument('--csv', help="write every word's scores to this file")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    words = load_words(args.words)
+    for category in args.category or ():
+        if category not in words:
+            sys.exit(f"Unknown category: {category}")
+    start = time.perf_counter()
+    results, games = simulate(args.words, args.strategy, args.games, args.processes, args.seed, args.limits,
+                              args.category)
+    elapsed = time.perf_counter() - start
+    processes = f"{args.processes} process" + ("es" if args.processes != 1 else "")
+    print(f"{games:,} games ({args.strategy}) in {elapsed:.2f}s with {processes}: {games / elapsed:,.0f} games/s")
+
+    limits = args.limits
+    header = f"{'misses':>7} " + ' '.join(f"{f'win@{limit}':>7}" for limit in limits)
+
+    def describe(totals):
+        wins = totals[2:2 + len(limits)]
+        return f"{difficulty(totals):>7.2f} " + ' '.join(f"{won / totals[0]:>7.1%}" for won in wins)
+
+    print(f"\n{'category':<24} {'words':>7} {header}")
+    for category, category_results in sorted(results.items()):
+        summed = new_totals(limits)
+        for totals in category_results.values():
+            merge_totals(summed, totals)
+        print(f"{category:<24} {len(category_results):>7} {describe(summed)}")
+
+    ranked = sorted((difficulty(totals), category, index)
+                    for category, category_results in results.items() for index, totals in category_results.items())
+    for title, rows in (("hardest", ranked[:-args.top - 1:-1]), ("easiest", ranked[:args.top])):
+        print(f"\n{title + ' words':<24} {'word':<16} {header}")
+        for _, category, index in rows:
+            print(f"{category:<24} {words.word(category, index):<16} {describe(results[category][index])}")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['category', 'word', 'games', 'misses', *(f'win_{limit}' for limit in limits),
+                             *(f'guesses_{limit}' for limit in limits)])
+            for _, category, index in reversed(ranked):
+                totals = results[category][index]
+                games = totals[0]
+                writer.writerow([category, words.word(category, index), games, round(difficulty(totals), 4),
+                                 *(round(won / games, 4) for won in totals[2:2 + len(limits)]),
+                                 *(round(guesses / games, 3) for guesses in totals[2 + len(limits):])])
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,14 @@
 import pygame
+import argparse
 import sys
-import random
 import string
+from assets import assets, render_text, HANGMAN_STAGES
+from dictionary import load as load_words
+from render import View
+from solver import Solver, HIDDEN
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
-
-# Set up display
-WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Hangman")
+# The display is opened by whichever game is run; see __main__ below
+screen = None
 
 # Colors
 WHITE = (255, 255, 255)
@@ -20,27 +18,23 @@ RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 
 # Fonts
-font = pygame.font.Font(None, 36)
-large_font = pygame.font.Font(None, 48)
+font = assets.font(36)
+large_font = assets.font(48)
 
-# Load hangman images
-hangman_images = [pygame.image.load(f"hangman{i}.png") for i in range(7)]
+# Word categories; replaced by a dictionary file given with --words
+words = load_words()
 
-# Load sounds
-correct_sound = pygame.mixer.Sound("correct.wav")
-wrong_sound = pygame.mixer.Sound("wrong.wav")
-win_sound = pygame.mixer.Sound("win.wav")
-lose_sound = pygame.mixer.Sound("lose.wav")
+MAX_WRONG_GUESSES = HANGMAN_STAGES - 1
 
-# Word categories
-word_categories = {
-    "Animals": ["ELEPHANT", "GIRAFFE", "PENGUIN", "TIGER", "DOLPHIN"],
-    "Countries": ["BRAZIL", "JAPAN", "AUSTRALIA", "FRANCE", "CANADA"],
-    "Fruits": ["APPLE", "BANANA", "ORANGE", "STRAWBERRY", "PINEAPPLE"],
-    "Sports": ["FOOTBALL", "TENNIS", "BASKETBALL", "SWIMMING", "VOLLEYBALL"]
-}
+# Built on the first hint; indexes each category and word length as it is asked about
+solver = None
 
-MAX_WRONG_GUESSES = len(hangman_images) - 1
+def hint(words, category, word, guessed_letters):
+    global solver
+    if solver is None or solver.words is not words:
+        solver = Solver(words)
+    mask = "".join(letter if letter in guessed_letters else HIDDEN for letter in word)
+    return solver.best_letter(category, mask, guessed_letters)
 
 class Button:
     def __init__(self, x, y, width, height, text, color, text_color):
@@ -49,21 +43,58 @@ class Button:
         self.color = color
         self.text_color = text_color
 
-    def draw(self, surface):
-        pygame.draw.rect(surface, self.color, self.rect)
-        text_surface = font.render(self.text, True, self.text_color)
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        surface.blit(text_surface, text_rect)
+    def draw(self, surface, origin=(0, 0)):
+        rect = self.rect.move(-origin[0], -origin[1])
+        pygame.draw.rect(surface, self.color, rect)
+        text_surface = render_text(font, self.text, self.text_color)
+        surface.blit(text_surface, text_surface.get_rect(center=rect.center))
 
     def is_clicked(self, pos):
         return self.rect.collidepoint(pos)
 
+class Keyboard:
+    # The letter keys composited onto one surface. A key is repainted only when it is
+    # guessed or reset, and screens draw the whole board as a single item.
+    def __init__(self, background=WHITE):
+        self.keys = []
+        for i, letter in enumerate(string.ascii_uppercase):
+            x = 100 + (i % 13) * 50
+            y = 400 + (i // 13) * 50
+            self.keys.append(Button(x, y, 40, 40, letter, WHITE, BLACK))
+        self.rect = self.keys[0].rect.unionall([key.rect for key in self.keys])
+        self.surface = pygame.Surface(self.rect.size)
+        self.surface.fill(background)
+        self.guessed = frozenset()
+        for key in self.keys:
+            key.draw(self.surface, self.rect.topleft)
+
+    def update(self, guessed_letters):
+        guessed = frozenset(guessed_letters)
+        if guessed == self.guessed:
+            return
+        for key in self.keys:
+            color = GRAY if key.text in guessed else WHITE
+            if key.color != color:
+                key.color = color
+                key.draw(self.surface, self.rect.topleft)
+        self.guessed = guessed
+
+    def letter_at(self, pos):
+        for key in self.keys:
+            if key.is_clicked(pos):
+                return key.text
+        return None
+
+    def draw(self, surface):
+        surface.blit(self.surface, self.rect)
+
 def main_menu():
     play_button = Button(300, 150, 200, 50, "Play", WHITE, BLACK)
     exit_button = Button(300, 225, 200, 50, "Exit", WHITE, BLACK)
+    view = View(screen, BLACK)
 
     while True:
-        for event in pygame.event.get():
+        for event in view.events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -74,18 +105,18 @@ def main_menu():
                     pygame.quit()
                     sys.exit()
 
-        screen.fill(BLACK)
-        play_button.draw(screen)
-        exit_button.draw(screen)
-        pygame.display.flip()
+        view.button(play_button)
+        view.button(exit_button)
+        view.present()
 
 def category_menu():
     buttons = []
-    for i, category in enumerate(word_categories.keys()):
+    for i, category in enumerate(words.names()):
         buttons.append(Button(300, 150 + i * 75, 200, 50, category, WHITE, BLACK))
+    view = View(screen, BLACK)
 
     while True:
-        for event in pygame.event.get():
+        for event in view.events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -94,76 +125,75 @@ def category_menu():
                     if button.is_clicked(event.pos):
                         play_game(button.text)
 
-        screen.fill(BLACK)
         for button in buttons:
-            button.draw(screen)
-        pygame.display.flip()
+            view.button(button)
+        view.present()
 
 def play_game(category):
-    word = random.choice(word_categories[category])
+    word = words.random_word(category)
     guessed_letters = set()
     wrong_guesses = 0
+    hint_letter = None
 
-    keyboard = create_keyboard()
+    keyboard = Keyboard()
+    hint_button = Button(650, 20, 120, 40, "Hint", GRAY, BLACK)
+    view = View(screen, WHITE)
 
     while True:
-        for event in pygame.event.get():
+        for event in view.events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
-                for key in keyboard:
-                    if key.is_clicked(event.pos) and key.text not in guessed_letters:
-                        letter = key.text
-                        guessed_letters.add(letter)
-                        if letter not in word:
-                            wrong_guesses += 1
-                            wrong_sound.play()
-                        else:
-                            correct_sound.play()
-
-        screen.fill(WHITE)
-        
+                if hint_button.is_clicked(event.pos):
+                    hint_letter = hint(words, category, word, guessed_letters)
+                letter = keyboard.letter_at(event.pos)
+                if letter is not None and letter not in guessed_letters:
+                    guessed_letters.add(letter)
+                    hint_letter = None
+                    if letter not in word:
+                        wrong_guesses += 1
+                        assets.play("wrong.wav")
+                    else:
+                        assets.play("correct.wav")
+
         # Draw hangman
-        screen.blit(hangman_images[min(wrong_guesses, MAX_WRONG_GUESSES)], (50, 50))
+        view.image("hangman", assets.hangman(wrong_guesses), (50, 50))
 
         # Draw word
-        word_surface = large_font.render(" ".join(letter if letter in guessed_letters else "_" for letter in word), True, BLACK)
-        screen.blit(word_surface, (300, 300))
+        view.text("word", large_font, " ".join(letter if letter in guessed_letters else "_" for letter in word), BLACK, (300, 300))
 
         # Draw keyboard
-        for key in keyboard:
-            if key.text in guessed_letters:
-                key.color = GRAY
-            key.draw(screen)
+        keyboard.update(guessed_letters)
+        view.item("keyboard", keyboard.guessed, keyboard.rect, keyboard.draw)
 
         # Draw category
-        category_surface = font.render(f"Category: {category}", True, BLACK)
-        screen.blit(category_surface, (50, 20))
+        view.text("category", font, f"Category: {category}", BLACK, (50, 20))
+
+        view.button(hint_button)
+        if hint_letter is not None:
+            view.text("hint", font, f"Hint: {hint_letter}", BLACK, (650, 70))
 
         # Check win/lose conditions
         if all(letter in guessed_letters for letter in word):
-            win_surface = large_font.render("You Win!", True, GREEN)
-            screen.blit(win_surface, (300, 200))
-            win_sound.play()
+            view.text("result", large_font, "You Win!", GREEN, (300, 200))
+            assets.play("win.wav")
         elif wrong_guesses >= MAX_WRONG_GUESSES:
-            lose_surface = large_font.render(f"You Lose! The word was {word}", True, RED)
-            screen.blit(lose_surface, (200, 200))
-            lose_sound.play()
+            view.text("result", large_font, f"You Lose! The word was {word}", RED, (200, 200))
+            assets.play("lose.wav")
 
-        pygame.display.flip()
+        view.present()
 
         if all(letter in guessed_letters for letter in word) or wrong_guesses >= MAX_WRONG_GUESSES:
             pygame.time.wait(3000)
             break
 
-def create_keyboard():
-    keyboard = []
-    for i, letter in enumerate(string.ascii_uppercase):
-        x = 100 + (i % 13) * 50
-        y = 400 + (i // 13) * 50
-        keyboard.append(Button(x, y, 40, 40, letter, WHITE, BLACK))
-    return keyboard
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Hangman")
+    parser.add_argument('--words', help="word dictionary file built with dictionary.py (default: built-in lists)")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
+    words = load_words(parse_args().words)
+    screen = assets.open_display("Hangman")
     main_menu()
@@ -0,0 +1,140 @@
+import string
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HIDDEN = '_'
+# Used when no dictionary word fits the mask, e.g. a word from another dictionary
+FALLBACK_ORDER = "ETAOINSHRDLCUMWFGYPBVKJXQZ"
+LETTER_BITS = {letter: 1 << i for i, letter in enumerate(string.ascii_uppercase)}
+# Occurrence bitsets are kept for letters appearing up to this many times in a word;
+# masks showing a letter more often fall back to checking the hidden positions
+MAX_COUNTED = 4
+
+def popcounts(rows):
+    # Set bits per row of a 2-D uint8 array whose rows are a multiple of 8 bytes long
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(rows.view(np.uint64)).sum(axis=1, dtype=np.int64)
+    return POPCOUNT[rows].sum(axis=1, dtype=np.int64)
+
+if np is not None:
+    POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+class BucketIndex:
+    # Everything the solver needs about the words of one category and length:
+    #   matrix   (words x length) uint8 view straight over the dictionary buffer
+    #   columns  the same letters transposed, one contiguous row per position
+    #   occurs   occurs[n - 1] is one uint32 per word, bit i set if letter i occurs at least
+    #            n times; occurs[0] is plain presence
+    #   letters  26 packed bitsets over the words, row i marking the words containing letter i
+    def __init__(self, data, length):
+        self.count = len(data) // length
+        self.matrix = np.frombuffer(data, dtype=np.uint8).reshape(self.count, length)
+        self.columns = np.ascontiguousarray(self.matrix.T)
+        self.occurs = [np.zeros(self.count, dtype=np.uint32) for _ in range(min(length, MAX_COUNTED))]
+        for column in self.columns:
+            bits = np.left_shift(np.uint32(1), column.astype(np.uint32) - ord('A'))
+            for n in range(len(self.occurs) - 1, 0, -1):
+                self.occurs[n] |= self.occurs[n - 1] & bits
+            self.occurs[0] |= bits
+        # Bitsets are padded to whole 64-bit words so they can be popcounted as uint64
+        self.padded = self.count + -self.count % 64
+        letter_bits = np.uint32(1) << np.arange(26, dtype=np.uint32)
+        flags = np.zeros((26, self.padded), dtype=bool)
+        flags[:, :self.count] = (self.occurs[0][None, :] & letter_bits[:, None]) != 0
+        self.letters = np.packbits(flags, axis=1)
+        # Counts over the whole bucket answer every game's opening move
+        self.totals = popcounts(self.letters)
+
+    def consistent(self, mask, guessed_bits):
+        # Boolean vector of the words that fit the revealed letters and avoid every wrong guess.
+        # Every step is a whole-bucket pass over a contiguous array.
+        shown = {}
+        for letter in mask:
+            if letter != HIDDEN:
+                shown[letter] = shown.get(letter, 0) + 1
+        required = 0
+        for letter in shown:
+            required |= LETTER_BITS[letter]
+        wrong = guessed_bits & ~required
+        ok = (self.occurs[0] & np.uint32(required | wrong)) == np.uint32(required)
+        for position, letter in enumerate(mask):
+            if letter != HIDDEN:
+                ok &= self.columns[position] == ord(letter)
+        # A revealed letter shows at every position it occupies, so a word must contain it
+        # exactly as often as the mask does
+        too_many = {}
+        for letter, times in shown.items():
+            too_many[times] = too_many.get(times, 0) | LETTER_BITS[letter]
+        for times, bits in too_many.items():
+            if times < len(self.occurs):
+                ok &= (self.occurs[times] & np.uint32(bits)) == 0
+            else:
+                for position, letter in enumerate(mask):
+                    if letter == HIDDEN:
+                        for other in shown:
+                            if LETTER_BITS[other] & bits:
+                                ok &= self.columns[position] != ord(other)
+        return ok
+
+    def letter_counts(self, ok):
+        # For each letter, how many of the remaining words contain it
+        flags = np.zeros(self.padded, dtype=bool)
+        flags[:self.count] = ok
+        return popcounts(self.letters & np.packbits(flags)[None, :])
+
+class Solver:
+    # Suggests the letter found in the most dictionary words that are still possible
+    # given the masked word and the letters guessed so far. Uses NumPy when installed
+    # and a plain Python scan otherwise, which is fine for short lists.
+    def __init__(self, words):
+        self.words = words
+        self.indexes = {}
+
+    def index(self, category, length):
+        key = (category, length)
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = BucketIndex(self.words.words_of_length(category, length), length)
+        return index
+
+    def letter_counts(self, category, mask, guessed_letters):
+        guessed_bits = 0
+        for letter in guessed_letters:
+            guessed_bits |= LETTER_BITS[letter]
+        if np is not None:
+            index = self.index(category, len(mask))
+            if guessed_bits:
+                counts = index.letter_counts(index.consistent(mask, guessed_bits))
+            else:
+                counts = index.totals
+            return dict(zip(string.ascii_uppercase, counts.tolist()))
+        return self.letter_counts_python(category, mask, guessed_bits)
+
+    def letter_counts_python(self, category, mask, guessed_bits):
+        length = len(mask)
+        data = bytes(self.words.words_of_length(category, length))
+        counts = dict.fromkeys(string.ascii_uppercase, 0)
+        revealed = {letter for letter in mask if letter != HIDDEN}
+        for start in range(0, len(data), length):
+            word = data[start:start + length].decode('ascii')
+            fits = all(
+                letter == shown if shown != HIDDEN
+                else letter not in revealed and not guessed_bits & LETTER_BITS[letter]
+                for letter, shown in zip(word, mask)
+            )
+            if fits:
+                for letter in set(word):
+                    counts[letter] += 1
+        return counts
+
+    def best_letter(self, category, mask, guessed_letters):
+        guessed = set(guessed_letters)
+        counts = self.letter_counts(category, mask, guessed)
+        letters = [letter for letter in string.ascii_uppercase if letter not in guessed and counts[letter]]
+        if letters:
+            # Ties go to the earlier letter
+            return max(letters, key=counts.get)
+        return next((letter for letter in FALLBACK_ORDER if letter not in guessed), None)